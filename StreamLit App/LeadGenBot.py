@@ -1,646 +1,647 @@
+"""Streamlit page for the Company Intelligence Bot
+
+This is a thin client: collection, retrieval and LLM calls live in
+pipeline.py and friends, and this module only gathers input, reports
+progress and renders results. Importing it has no side effects; Streamlit
+runs main() when it executes the script.
+"""
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
-import json
 import os
 import time
-import re
-import pandas as pd
-import matplotlib.pyplot as plt
-import base64
-from io import BytesIO
-from PIL import Image
-from datetime import datetime
-from urllib.parse import urlparse, quote_plus
-import yfinance as yf
-import tweepy
-from openai import OpenAI
-
-# Initialize OpenAI client
-client = OpenAI(
-    base_url="https://router.huggingface.co/novita/v3/openai",
-    api_key="hf_**********************************" 
-    #get api_key from hugging face
-)
-
-# Streamlit UI setup
-st.set_page_config(page_title="Company Intelligence Bot", layout="wide")
-st.title("Company Intelligence Bot")
-
-# Initialize session state
-if "chat_history" not in st.session_state:
+import io
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from retrieval import get_index
+from batch import DEFAULT_WORKERS, read_companies, run_batch
+from company_store import get_company_store
+from comparison import (MAX_COMPANIES, MIN_COMPANIES, comparison_label, parse_companies, start_comparison,
+                        stream_comparison_answer)
+from jobs import get_job_store
+from logos import logo_bytes
+from metrics import get_metrics, start_metrics_server
+from views import get_comparison_view, get_company_view
+from pipeline import COLLECTION_SOURCES, llm_gateway_stats, source_label, stored_summary, stream_chat_answer
+
+RETRIEVAL_TOP_K = 24
+# Seconds between refreshes of a running research job's progress
+JOB_POLL_INTERVAL = 0.5
+JOB_PREVIEW_CHARS = 300
+JOB_STATUS_STATES = {"running": "running", "complete": "complete", "error": "error", "timeout": "error"}
+
+STREAM_RENDER_INTERVAL = 0.05
+
+def render_stream(stream, placeholder, render, prefix=""):
+    """Render a ChatStream into a placeholder as tokens arrive and return the text
+
+    Redraws are throttled so long answers do not re-render markdown for every
+    token. The text received so far is returned even if the stream fails.
+    """
+    last_render = 0.0
+    for _ in stream:
+        now = time.monotonic()
+        if now - last_render >= STREAM_RENDER_INTERVAL:
+            getattr(placeholder, render)(f"{prefix}{stream.text}▌")
+            last_render = now
+    getattr(placeholder, render)(f"{prefix}{stream.text}")
+    return stream.text
+
+def record_stream_stats(stats):
+    """Keep recent stream timings so latency can be tracked per session"""
+    st.session_state.llm_stats = (st.session_state.llm_stats + [stats])[-50:]
+    return stats
+
+def format_stream_stats(stats):
+    """One-line caption for a stream's latency figures"""
+    if stats.get("source") == "facts":
+        return f"answered from the fact table in {stats['total_time'] * 1000:.1f} ms"
+    if stats.get("cached"):
+        return "cached answer"
+    parts = []
+    if stats.get("prompt_tokens"):
+        parts.append(f"{stats['prompt_tokens']:,} prompt tokens")
+    if stats["time_to_first_token"] is not None:
+        parts.append(f"first token {stats['time_to_first_token']:.2f}s")
+    if stats["tokens_per_second"]:
+        parts.append(f"{stats['tokens_per_second']:.0f} tokens/s")
+    if stats["total_time"] is not None:
+        parts.append(f"total {stats['total_time']:.1f}s")
+    return " · ".join(parts)
+
+@contextmanager
+def render_timer(section):
+    """Time one part of the page; the last times are kept per session and exported as ui_render_seconds"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        st.session_state.render_timings[section] = elapsed
+        get_metrics().observe("ui_render_seconds", elapsed, section=section)
+
+def init_session_state():
+    """Create the per-session state slots on first run"""
+    if "chat_history" not in st.session_state:
+        st.session_state.chat_history = []
+    if "company_version" not in st.session_state:
+        # The researched company's data lives in the shared company store under this version
+        st.session_state.company_version = None
+    if "current_input" not in st.session_state:
+        st.session_state.current_input = ""
+    if "awaiting_response" not in st.session_state:
+        st.session_state.awaiting_response = False
+    if "llm_stats" not in st.session_state:
+        st.session_state.llm_stats = []
+    if "render_timings" not in st.session_state:
+        # Seconds each part of the page took on its last run
+        st.session_state.render_timings = {}
+    if "researched" not in st.session_state:
+        st.session_state.researched = None
+    if "job_id" not in st.session_state:
+        # A reloaded page picks its running job back up from the URL
+        st.session_state.job_id = st.query_params.get("job")
+    if "comparison" not in st.session_state:
+        # {"job_ids": [...], "companies": [(name, data version), ...] once every job has finished}
+        compare = st.query_params.get("compare")
+        st.session_state.comparison = {"job_ids": compare.split(","), "companies": None} if compare else None
+
+def render_sidebar():
+    """Sidebar for company selection and data fetching; returns the inputs"""
+    st.sidebar.header("Company Research")
+    company_name = st.sidebar.text_input("Company Name", "Tesla")
+    company_domain = st.sidebar.text_input("Company Domain (Optional)", "")
+    ticker_symbol = st.sidebar.text_input("Stock Ticker Symbol (Optional)", "")
+    use_cache = st.sidebar.checkbox("Use cached research", value=True, help="Reuse recent results for this company instead of fetching every source again")
+
+    col1, col2 = st.sidebar.columns([1, 1])
+    with col1:
+        fetch_button = st.button("Research Company", use_container_width=True)
+    with col2:
+        clear_button = st.button("Clear Data", use_container_width=True)
+    with st.sidebar.expander("Batch Research"):
+        batch_file = st.file_uploader("Company list (CSV)", type=["csv"], help="Columns: name, and optionally domain and ticker")
+        batch_workers = st.number_input("Parallel companies", min_value=1, max_value=16, value=DEFAULT_WORKERS)
+        batch_summaries = st.checkbox("Generate AI summaries", value=True)
+        batch_button = st.button("Run Batch", use_container_width=True, disabled=batch_file is None)
+    with st.sidebar.expander("Compare Companies"):
+        compare_text = st.text_area("Companies, one per line", help=f"name, domain, ticker; domain and ticker are optional (e.g. \"Ford,,F\"). {MIN_COMPANIES} to {MAX_COMPANIES} companies.")
+        compare_button = st.button("Compare", use_container_width=True, disabled=not compare_text.strip())
+
+    return {
+        "company_name": company_name,
+        "company_domain": company_domain,
+        "ticker_symbol": ticker_symbol,
+        "use_cache": use_cache,
+        "fetch": fetch_button,
+        "clear": clear_button,
+        "batch": batch_button,
+        "batch_file": batch_file,
+        "batch_workers": batch_workers,
+        "batch_summaries": batch_summaries,
+        "compare": compare_button,
+        "compare_text": compare_text,
+    }
+
+def forget_company_state():
+    """Drop the session state that belongs to the company on show: its chat, summary and raw source selection"""
     st.session_state.chat_history = []
-if "company_data" not in st.session_state:
-    st.session_state.company_data = {}
-if "vector_store" not in st.session_state:
-    st.session_state.vector_store = None
-if "current_input" not in st.session_state:
-    st.session_state.current_input = ""
-if "awaiting_response" not in st.session_state:
     st.session_state.awaiting_response = False
-if "summary" not in st.session_state:
-    st.session_state.summary = ""
-if "data_sources" not in st.session_state:
-    st.session_state.data_sources = []
-if "financial_data" not in st.session_state:
-    st.session_state.financial_data = None
-if "company_logo" not in st.session_state:
-    st.session_state.company_logo = None
-if "last_update" not in st.session_state:
-    st.session_state.last_update = None
-
-# Sidebar for company selection and data fetching
-st.sidebar.header("Company Research")
-company_name = st.sidebar.text_input("Company Name", "Tesla")
-company_domain = st.sidebar.text_input("Company Domain (Optional)", "")
-ticker_symbol = st.sidebar.text_input("Stock Ticker Symbol (Optional)", "")
-
-# Web scraping and data collection functions
-def fetch_company_website(company_name, domain=None):
-    """Find the official website for a company"""
-    if domain and (domain.startswith('http://') or domain.startswith('https://')):
-        return domain
-    
-    if domain:
-        if not domain.startswith('http'):
-            return f"https://{domain}"
-        return domain
-        
-    search_url = f"https://www.google.com/search?q={quote_plus(company_name)} official website"
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-    try:
-        response = requests.get(search_url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Look for the first organic result
-        for div in soup.find_all('div'):
-            for a in div.find_all('a'):
-                href = a.get('href', '')
-                if 'url=' in href and 'google' not in href:
-                    url_match = re.search(r'url\?q=([^&]+)', href)
-                    if url_match:
-                        url = url_match.group(1)
-                        if url.startswith('http') and 'google.com' not in url:
-                            return url
-    except Exception as e:
-        st.sidebar.error(f"Error fetching website: {e}")
-    return None
-
-def fetch_logo(company_name, website_url):
-    """Try to find company logo"""
-    try:
-        if website_url:
-            # Try to get favicon
-            parsed_url = urlparse(website_url)
-            base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-            favicon_url = f"{base_url}/favicon.ico"
-            
-            response = requests.get(favicon_url, stream=True, timeout=5)
-            if response.status_code == 200:
-                return favicon_url
-        
-        # If favicon not found, search for logo
-        search_url = f"https://www.google.com/search?q={quote_plus(company_name)} logo&tbm=isch"
-        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-        
-        response = requests.get(search_url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Find image tags
-        img_tags = soup.find_all('img')
-        for img in img_tags:
-            if img.get('src') and img.get('src').startswith('http') and 'gstatic' not in img.get('src'):
-                return img.get('src')
-    except:
-        pass
-    
-    return None
-
-def scrape_website_content(url, max_chars=100000):
-    """Extract content from a webpage"""
-    if not url:
-        return ""
-        
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-    try:
-        response = requests.get(url, headers=headers, timeout=15)
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.extract()
-            
-        # Extract text
-        text = soup.get_text(separator=' ', strip=True)
-        
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
-        
-        return text[:max_chars]
-    except Exception as e:
-        st.sidebar.warning(f"Error scraping {url}: {e}")
-        return ""
-
-def fetch_google_news(company):
-    """Fetch news about the company from Google"""
-    search_url = f"https://www.google.com/search?q={quote_plus(company)}+news&tbm=nws"
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-    
-    try:
-        response = requests.get(search_url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        news_items = []
-        results = soup.find_all("div", {"class": re.compile("^[a-zA-Z]")})
-        
-        for result in results:
-            headline_elem = result.find("h3")
-            if headline_elem:
-                headline = headline_elem.text
-                snippet_elem = result.find(["div", "span"], {"class": re.compile("^[a-zA-Z]")})
-                snippet = snippet_elem.text if snippet_elem else ""
-                if len(headline) > 10:  # Avoid empty or tiny headlines
-                    news_items.append(f"Headline: {headline}\nSnippet: {snippet}")
-                
-        return "\n\n".join(news_items[:10])
-    except Exception as e:
-        return f"Error fetching Google News: {str(e)}"
-
-def fetch_linkedin_info(company):
-    """Attempt to fetch information from LinkedIn via Google search"""
-    search_url = f"https://www.google.com/search?q=site:linkedin.com+{quote_plus(company)}+company"
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-    
-    try:
-        response = requests.get(search_url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        results = soup.find_all("div")
-        linkedin_info = []
-        linkedin_url = None
-        
-        for result in results:
-            links = result.find_all("a")
-            for link in links:
-                href = link.get("href", "")
-                if "linkedin.com/company" in href:
-                    url_match = re.search(r'url\?q=([^&]+)', href)
-                    if url_match:
-                        linkedin_url = url_match.group(1)
-                        break
-            
-            title_elem = result.find("h3")
-            if title_elem and "LinkedIn" in title_elem.text:
-                snippet_elem = result.find(["div", "span"], {"class": re.compile("^[a-zA-Z]")})
-                if snippet_elem and len(snippet_elem.text) > 30:
-                    linkedin_info.append(f"LinkedIn Info: {snippet_elem.text}")
-        
-        if linkedin_url:
-            linkedin_info.insert(0, f"LinkedIn Company URL: {linkedin_url}")
-                
-        return "\n\n".join(linkedin_info[:5])
-    except Exception as e:
-        return f"Error fetching LinkedIn information: {str(e)}"
-
-def fetch_twitter_info(company_name):
-    """Fetch Twitter information about the company using Google search"""
-    search_url = f"https://www.google.com/search?q=site:twitter.com+{quote_plus(company_name)}+official"
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-    
-    try:
-        response = requests.get(search_url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        results = soup.find_all("div")
-        twitter_info = []
-        twitter_handle = None
-        
-        for result in results:
-            links = result.find_all("a")
-            for link in links:
-                href = link.get("href", "")
-                if "twitter.com/" in href and not "search?" in href:
-                    url_match = re.search(r'url\?q=([^&]+)', href)
-                    if url_match:
-                        twitter_url = url_match.group(1)
-                        handle_match = re.search(r'twitter\.com/([^/]+)', twitter_url)
-                        if handle_match:
-                            twitter_handle = handle_match.group(1)
-                            break
-            
-            title_elem = result.find("h3")
-            if title_elem and "Twitter" in title_elem.text:
-                snippet_elem = result.find(["div", "span"], {"class": re.compile("^[a-zA-Z]")})
-                if snippet_elem and len(snippet_elem.text) > 20:
-                    twitter_info.append(f"Twitter Info: {snippet_elem.text}")
-        
-        if twitter_handle:
-            twitter_info.insert(0, f"Twitter Handle: @{twitter_handle}")
-                
-        return "\n\n".join(twitter_info[:5])
-    except Exception as e:
-        return f"Error fetching Twitter information: {str(e)}"
-
-def fetch_company_reviews(company):
-    """Fetch company reviews from Google"""
-    search_url = f"https://www.google.com/search?q={quote_plus(company)}+reviews+glassdoor+indeed"
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-    
-    try:
-        response = requests.get(search_url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        review_snippets = []
-        results = soup.find_all("div")
-        
-        for result in results:
-            snippet_elem = result.find(["div", "span"], {"class": re.compile("^[a-zA-Z]")})
-            if snippet_elem and "review" in snippet_elem.text.lower() and len(snippet_elem.text) > 50:
-                review_snippets.append(snippet_elem.text)
-                
-        return "\n\n".join(review_snippets[:5])
-    except Exception as e:
-        return f"Error fetching company reviews: {str(e)}"
-
-def fetch_financial_data(ticker):
-    """Fetch financial data if ticker symbol is provided"""
-    if not ticker:
-        return None
-        
-    try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        
-        if not info or len(info) < 5: 
-            return None
-            
-        hist = stock.history(period="1y")
-        
-        if hist.empty:
-            return None
-            
-        financial_data = {
-            "info": {k: v for k, v in info.items() if not isinstance(v, dict) and not isinstance(v, list)},
-            "history": hist
-        }
-        
-        return financial_data
-    except:
+    st.session_state.current_input = ""
+    for key in list(st.session_state):
+        if key == "ai_summary" or key.startswith("raw_source"):
+            del st.session_state[key]
+
+def clear_company():
+    """Forget the researched company for this session"""
+    forget_company_state()
+    st.session_state.company_version = None
+    st.session_state.researched = None
+    st.session_state.job_id = None
+    st.session_state.comparison = None
+    st.query_params.pop("job", None)
+    st.query_params.pop("compare", None)
+    st.rerun()
+
+def run_batch_research(batch_file, workers, summarize, use_cache):
+    """Research every company in an uploaded CSV, showing progress as rows finish"""
+    import pandas as pd
+
+    batch_csv = batch_file.getvalue()
+    batch_rows = read_companies(io.BytesIO(batch_csv))
+    # Same upload, same output file: a rerun resumes from its checkpoint
+    batch_output = os.path.join(tempfile.gettempdir(), f"companybot_batch_{hashlib.sha256(batch_csv).hexdigest()[:16]}.jsonl")
+
+    st.subheader(f"Batch research: {len(batch_rows)} companies")
+    batch_progress = st.progress(0.0)
+    batch_metrics = st.empty()
+    batch_table = st.empty()
+    batch_results = []
+
+    def show_batch_result(record, stats):
+        batch_results.append({"Company": record["name"], "Status": record["status"],
+                              "Website": record.get("website_url"), "Seconds": record["elapsed"]})
+        batch_progress.progress((stats.skipped + stats.done) / max(stats.total, 1))
+        batch_metrics.caption(
+            f"{stats.skipped + stats.done}/{stats.total} done · {stats.failed} failed · "
+            f"{stats.throughput:.1f} companies/min · ETA {stats.eta or 0:.0f}s"
+        )
+        batch_table.dataframe(pd.DataFrame(batch_results), use_container_width=True)
+
+    batch_stats = run_batch(batch_rows, batch_output, workers=workers, summarize=summarize,
+                            use_cache=use_cache, on_result=show_batch_result)
+    batch_progress.progress(1.0)
+    st.success(f"Batch complete: {batch_stats.done} researched, {batch_stats.skipped} resumed from checkpoint, {batch_stats.failed} failed.")
+    with open(batch_output, "rb") as f:
+        st.download_button("Download results (JSONL)", f.read(), file_name="company_research.jsonl", mime="application/jsonl")
+
+def research_company(company_name, company_domain, ticker_symbol, use_cache):
+    """Start (or join) a background research job and remember it in the session and URL"""
+    job = get_job_store().submit(company_name, company_domain, ticker_symbol, use_cache=use_cache)
+    st.session_state.job_id = job.id
+    st.session_state.comparison = None
+    st.query_params.pop("compare", None)
+    st.query_params["job"] = job.id
+
+def compare_companies(text, use_cache):
+    """Start researching every listed company for a side-by-side comparison"""
+    companies = parse_companies(text)
+    if not MIN_COMPANIES <= len(companies) <= MAX_COMPANIES:
+        st.sidebar.error(f"List {MIN_COMPANIES} to {MAX_COMPANIES} different companies to compare.")
+        return
+    jobs = start_comparison(companies, use_cache=use_cache)
+    st.session_state.comparison = {"job_ids": [job.id for job in jobs], "companies": None}
+    forget_company_state()
+    st.session_state.company_version = None
+    st.session_state.researched = None
+    st.session_state.job_id = None
+    st.query_params.pop("job", None)
+    st.query_params["compare"] = ",".join(job.id for job in jobs)
+
+def preview_result(value):
+    """Short text preview of a source's value for the progress panel"""
+    if isinstance(value, tuple):
+        value = value[0]
+    if isinstance(value, list):
+        value = "\n".join(page["url"] for page in value if isinstance(page, dict) and "url" in page)
+    if not isinstance(value, str) or not value:
         return None
+    return value[:JOB_PREVIEW_CHARS] + ("…" if len(value) > JOB_PREVIEW_CHARS else "")
 
-def collect_company_data(company_name, company_domain="", ticker_symbol=""):
-    """Collect data about a company from multiple sources"""
-    data = {}
-    data_sources = []
-    
-    with st.sidebar.status("Finding company website..."):
-        website_url = fetch_company_website(company_name, company_domain)
-        if website_url:
-            data["website_url"] = website_url
-            st.sidebar.write(f"Website: {website_url}")
-            
-            with st.sidebar.status("Extracting website content..."):
-                website_content = scrape_website_content(website_url)
-                if website_content:
-                    data["website_content"] = website_content
-                    data_sources.append(f"COMPANY WEBSITE CONTENT:\n{website_content[:2000]}...[truncated]")
-    
-    with st.sidebar.status("Finding company logo..."):
-        logo_url = fetch_logo(company_name, website_url if "website_url" in data else None)
-        if logo_url:
-            data["logo_url"] = logo_url
-    
-    with st.sidebar.status("Collecting news articles..."):
-        news_content = fetch_google_news(company_name)
-        if news_content:
-            data["news"] = news_content
-            data_sources.append(f"RECENT NEWS ABOUT {company_name.upper()}:\n{news_content}")
-    
-    with st.sidebar.status("Finding LinkedIn information..."):
-        linkedin_info = fetch_linkedin_info(company_name)
-        if linkedin_info:
-            data["linkedin"] = linkedin_info
-            data_sources.append(f"LINKEDIN INFORMATION ABOUT {company_name.upper()}:\n{linkedin_info}")
-    
-    with st.sidebar.status("Finding Twitter information..."):
-        twitter_info = fetch_twitter_info(company_name)
-        if twitter_info:
-            data["twitter"] = twitter_info
-            data_sources.append(f"TWITTER INFORMATION ABOUT {company_name.upper()}:\n{twitter_info}")
-    
-    with st.sidebar.status("Finding company reviews..."):
-        reviews = fetch_company_reviews(company_name)
-        if reviews:
-            data["reviews"] = reviews
-            data_sources.append(f"COMPANY REVIEWS FOR {company_name.upper()}:\n{reviews}")
-    
-    if ticker_symbol:
-        with st.sidebar.status(f"Fetching financial data for {ticker_symbol}..."):
-            financial_data = fetch_financial_data(ticker_symbol)
-            if financial_data:
-                data["financial"] = financial_data
-                financial_summary = f"Market Cap: ${financial_data['info'].get('marketCap', 'N/A')}\n"
-                financial_summary += f"Industry: {financial_data['info'].get('industry', 'N/A')}\n"
-                financial_summary += f"Employees: {financial_data['info'].get('fullTimeEmployees', 'N/A')}\n"
-                financial_summary += f"Revenue: ${financial_data['info'].get('totalRevenue', 'N/A')}"
-                data_sources.append(f"FINANCIAL DATA FOR {company_name.upper()} ({ticker_symbol}):\n{financial_summary}")
-    
-    summary = f"Data collected about {company_name}:\n"
-    if "website_content" in data:
-        summary += "✅ Company Website Content\n"
-    if "news" in data:
-        summary += "✅ Recent News Articles\n"
-    if "linkedin" in data:
-        summary += "✅ LinkedIn Information\n"
-    if "twitter" in data:
-        summary += "✅ Twitter Information\n"
-    if "reviews" in data:
-        summary += "✅ Company Reviews\n"
-    if "financial" in data:
-        summary += f"✅ Financial Data (Ticker: {ticker_symbol})\n"
-    
-    data["summary"] = summary
-    data["data_sources"] = data_sources
-    data["last_update"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def render_job(job_id):
+    """Progress of a running research job, redrawn on a timer without rerunning the page"""
+    job = get_job_store().get(job_id)
+    if job is None:
+        st.session_state.job_id = None
+        st.query_params.pop("job", None)
+        st.rerun()
+    snapshot = job.snapshot()
+    if snapshot["status"] not in ("queued", "running"):
+        # Hand the finished job to the full page
+        st.rerun()
+
+    st.subheader(f"Researching {snapshot['company_name']}...")
+    for source, info in snapshot["sources"].items():
+        label = source_label(source).rstrip(".")
+        state = info.get("state", "running")
+        if state == "complete":
+            label = f"{label} ({info['detail']})"
+        elif state == "error":
+            label = f"{label} failed: {info['detail']}"
+        elif state == "timeout":
+            label = f"{label} timed out"
+        with st.status(label, state=JOB_STATUS_STATES.get(state, "running")):
+            for line in info.get("info", []):
+                st.write(line)
+            preview = preview_result(snapshot["results"].get(source))
+            if preview:
+                st.text(preview)
+
+    if snapshot["summary"]:
+        st.subheader("Company Overview")
+        st.info(snapshot["summary"] + "▌")
+    st.caption(f"Running for {time.time() - snapshot['created']:.0f}s")
+
+def adopt_job(job):
+    """Point the session at a finished job's data in the company store"""
+    forget_company_state()
+    st.session_state.company_version = job.data_version
+    st.session_state.researched = {"company_name": job.company_name, "ticker_symbol": job.ticker_symbol}
+    if job.summary:
+        st.session_state.ai_summary = job.summary
+    if job.summary_stats:
+        record_stream_stats(job.summary_stats)
+
+def follow_job():
+    """Show the session's research job while it runs and adopt its results once it finishes"""
+    job = get_job_store().get(st.session_state.job_id)
+    if job is None:
+        st.session_state.job_id = None
+        st.query_params.pop("job", None)
+        return
+    if job.active:
+        render_job(job.id)
+        return
+
+    st.session_state.job_id = None
+    st.query_params.pop("job", None)
+    if job.status == "done":
+        adopt_job(job)
+        st.success(f"Research complete for {job.company_name}!")
+    else:
+        st.error(f"Research failed for {job.company_name}: {job.error}")
+
+def current_company():
+    """The researched company's data from the shared store, or None"""
+    if not st.session_state.company_version:
+        return None
+    data = get_company_store().get(st.session_state.company_version)
+    if data is None:
+        # Evicted to keep the store under its memory ceiling
+        st.session_state.company_version = None
+        st.warning("The research results for this company are no longer in memory. Please research it again.")
     return data
 
-def create_combined_text(company_data):
-    """Create combined text from all data sources"""
-    combined = []
-    
-    if "data_sources" in company_data:
-        combined = company_data["data_sources"]
-    
-    full_text = "\n\n" + "-"*50 + "\n\n".join(combined)
-    return full_text
-
-def generate_company_summary(company_name, company_data):
-    """Generate an AI summary of the company based on collected data"""
-    if not company_data:
-        return "No data available to generate summary."
-    
-    combined_text = create_combined_text(company_data)
-    
-    try:
-        system_message = f"""You are a business intelligence analyst. 
-        Create a concise but comprehensive summary of {company_name} based on the information provided.
-        Include what the company does, key products/services, market position, and any other notable information.
-        Keep your summary to 3-4 paragraphs maximum.
-        Only use information from the provided data.
-        """
-        
-        messages = [
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": f"Here is the collected data about {company_name}. Please summarize it:\n{combined_text[:30000]}"}
-        ]
-        
-        completion = client.chat.completions.create(
-            model="deepseek/deepseek-v3-turbo",
-            messages=messages,
-            max_tokens=500,
-            temperature=0.3,
-        )
-        
-        return completion.choices[0].message.content
-    except Exception as e:
-        return f"Error generating summary: {str(e)}"
-
-col1, col2 = st.sidebar.columns([1, 1])
-with col1:
-    fetch_button = st.button("Research Company", use_container_width=True)
-with col2:
-    clear_button = st.button("Clear Data", use_container_width=True)
-
-if clear_button:
-    st.session_state.company_data = {}
-    st.session_state.data_sources = []
-    st.session_state.summary = ""
-    st.session_state.chat_history = []
-    st.session_state.financial_data = None
-    st.session_state.company_logo = None
-    st.session_state.last_update = None
-    st.session_state.awaiting_response = False
-    st.experimental_rerun()
-
-if fetch_button:
-    with st.spinner(f"Researching {company_name}..."):
-        st.session_state.company_data = collect_company_data(company_name, company_domain, ticker_symbol)
-        
-        if "data_sources" in st.session_state.company_data:
-            st.session_state.data_sources = st.session_state.company_data["data_sources"]
-        
-        if "summary" in st.session_state.company_data:
-            st.session_state.summary = st.session_state.company_data["summary"]
-        
-        if "financial" in st.session_state.company_data:
-            st.session_state.financial_data = st.session_state.company_data["financial"]
-        
-        if "logo_url" in st.session_state.company_data:
-            st.session_state.company_logo = st.session_state.company_data["logo_url"]
-        
-        if "last_update" in st.session_state.company_data:
-            st.session_state.last_update = st.session_state.company_data["last_update"]
-        
-        ai_summary = generate_company_summary(company_name, st.session_state.company_data)
-        st.session_state.ai_summary = ai_summary
-        
-        st.success(f"Research complete for {company_name}!")
-
-if st.session_state.company_data:
+@render_timer("company")
+def render_company(data, company_name, ticker_symbol):
+    """Header, overview and information tabs for the researched company
+
+    Everything derived from the data comes from its cached view, so a rerun
+    only re-sends elements instead of rebuilding them.
+    """
+    view = get_company_view(data)
     col1, col2 = st.columns([1, 4])
-    
+
     with col1:
-        if st.session_state.company_logo:
-            try:
-                st.image(st.session_state.company_logo, width=100)
-            except:
-                st.image("https://via.placeholder.com/100x100?text=Logo", width=100)
+        logo = logo_bytes(data["logo"]["digest"]) if "logo" in data else None
+        if logo:
+            # Thumbnail bytes from the local logo cache, so nothing is fetched from elsewhere
+            st.image(logo, width=100)
         else:
-            st.image("https://via.placeholder.com/100x100?text=No+Logo", width=100)
-    
+            st.markdown("# 🏢")
+
     with col2:
         st.header(company_name)
-        if "website_url" in st.session_state.company_data:
-            st.write(f"🌐 [Company Website]({st.session_state.company_data['website_url']})")
-        
-        if st.session_state.last_update:
-            st.caption(f"Last updated: {st.session_state.last_update}")
-    
+        if "website_url" in data:
+            st.write(f"🌐 [Company Website]({data['website_url']})")
+
+        if data.get("last_update"):
+            st.caption(f"Last updated: {data['last_update']}")
+        changed = data.get("changed_sources")
+        if changed == []:
+            st.caption("Nothing changed since the last research; the overview and index were reused.")
+        elif changed:
+            st.caption(f"Changed since the last research: {', '.join(changed)}")
+
     if "ai_summary" in st.session_state:
         st.subheader("Company Overview")
         st.info(st.session_state.ai_summary)
     else:
-        st.info(st.session_state.summary)
-    
+        st.info(data.get("summary", ""))
+
     tabs = st.tabs(["Company Information", "News", "Financial Data", "Social Media"])
-    
+
     with tabs[0]:
-        if "website_content" in st.session_state.company_data:
+        if view["facts"] is not None:
+            with st.expander("Key Facts", expanded=True):
+                st.dataframe(view["facts"], use_container_width=True)
+
+        if view["website_preview"]:
             with st.expander("Website Content", expanded=False):
-                st.markdown(st.session_state.company_data["website_content"][:5000])
-                if len(st.session_state.company_data["website_content"]) > 5000:
+                st.markdown(view["website_preview"])
+                if view["website_truncated"]:
                     st.caption("Content truncated for display. Full content used for answering questions.")
-        
-        if "reviews" in st.session_state.company_data:
+
+        if "reviews" in data:
             with st.expander("Company Reviews", expanded=True):
-                st.markdown(st.session_state.company_data["reviews"])
-    
+                st.markdown(data["reviews"])
+
     with tabs[1]:
-        if "news" in st.session_state.company_data:
-            st.markdown(st.session_state.company_data["news"])
+        if "news" in data:
+            st.markdown(data["news"])
         else:
             st.write("No news information available.")
-    
+
     with tabs[2]:
-        if st.session_state.financial_data:
-            fin_info = st.session_state.financial_data["info"]
-            
-            metrics_col1, metrics_col2, metrics_col3 = st.columns(3)
-            
-            with metrics_col1:
-                if "marketCap" in fin_info:
-                    market_cap = fin_info["marketCap"]
-                    if market_cap > 1_000_000_000:
-                        market_cap_str = f"${market_cap/1_000_000_000:.2f}B"
-                    elif market_cap > 1_000_000:
-                        market_cap_str = f"${market_cap/1_000_000:.2f}M"
-                    else:
-                        market_cap_str = f"${market_cap:,.0f}"
-                    st.metric("Market Cap", market_cap_str)
-                
-                if "sector" in fin_info:
-                    st.metric("Sector", fin_info["sector"])
-            
-            with metrics_col2:
-                if "currentPrice" in fin_info:
-                    st.metric("Current Price", f"${fin_info['currentPrice']:.2f}")
-                
-                if "industry" in fin_info:
-                    st.metric("Industry", fin_info["industry"])
-            
-            with metrics_col3:
-                if "fullTimeEmployees" in fin_info:
-                    employees = fin_info["fullTimeEmployees"]
-                    if employees is not None:
-                        st.metric("Employees", f"{employees:,}")
-                
-                if "website" in fin_info:
+        financial = view["financial"]
+        if financial:
+            for column, metrics in zip(st.columns(3), financial["metrics"]):
+                with column:
+                    for label, value in metrics:
+                        st.metric(label, value)
+            if financial["yahoo_link"]:
+                with column:
                     st.write(f"🌐 [Yahoo Finance](https://finance.yahoo.com/quote/{ticker_symbol})")
-            
-            # Stock chart
-            if "history" in st.session_state.financial_data:
-                hist = st.session_state.financial_data["history"]
-                if not hist.empty:
-                    st.subheader("Stock Price - Last 12 Months")
-                    fig, ax = plt.subplots(figsize=(10, 6))
-                    ax.plot(hist.index, hist['Close'])
-                    ax.set_xlabel('Date')
-                    ax.set_ylabel('Price ($)')
-                    ax.grid(True)
-                    st.pyplot(fig)
+
+            # Stock chart, rendered once per history version
+            if financial["chart"]:
+                st.subheader("Stock Price - Last 12 Months")
+                st.image(financial["chart"], use_container_width=True)
         else:
             if ticker_symbol:
                 st.write(f"No financial data available for ticker: {ticker_symbol}")
             else:
                 st.write("No ticker symbol provided for financial data.")
-    
+
     with tabs[3]:
         social_col1, social_col2 = st.columns(2)
-        
+
         with social_col1:
             st.subheader("LinkedIn")
-            if "linkedin" in st.session_state.company_data:
-                st.markdown(st.session_state.company_data["linkedin"])
+            if "linkedin" in data:
+                st.markdown(data["linkedin"])
             else:
                 st.write("No LinkedIn information available.")
-        
+
         with social_col2:
             st.subheader("Twitter")
-            if "twitter" in st.session_state.company_data:
-                st.markdown(st.session_state.company_data["twitter"])
+            if "twitter" in data:
+                st.markdown(data["twitter"])
             else:
                 st.write("No Twitter information available.")
 
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def render_comparison_jobs(job_ids):
+    """Progress of every company in a running comparison, redrawn on a timer"""
+    jobs = [job for job in map(get_job_store().get, job_ids) if job is not None]
+    if not any(job.active for job in jobs):
+        st.rerun()
+
+    st.subheader(f"Researching {len(jobs)} companies...")
+    for job in jobs:
+        snapshot = job.snapshot()
+        finished = sum(1 for info in snapshot["sources"].values() if info.get("state") in ("complete", "error", "timeout"))
+        if snapshot["status"] == "done":
+            detail = "done"
+        elif finished == len(COLLECTION_SOURCES):
+            detail = "summarizing"
+        else:
+            detail = f"{finished}/{len(COLLECTION_SOURCES)} sources"
+        st.progress(finished / len(COLLECTION_SOURCES), text=f"{snapshot['company_name']}: {detail}")
+
+def follow_comparison():
+    """Show a running comparison and record its companies once every job has finished"""
+    comparison = st.session_state.comparison
+    jobs = [get_job_store().get(job_id) for job_id in comparison["job_ids"]]
+    if any(job is not None and job.active for job in jobs):
+        render_comparison_jobs(comparison["job_ids"])
+        return
+
+    companies = []
+    for job in jobs:
+        if job is None:
+            st.warning("A company's research expired before the comparison was opened; compare again to include it.")
+        elif job.status == "done":
+            companies.append((job.company_name, job.data_version))
+        else:
+            st.error(f"Research failed for {job.company_name}: {job.error}")
+    comparison["companies"] = companies
+    st.query_params.pop("compare", None)
+
+def current_comparison():
+    """[(company name, data), ...] of the finished comparison from the shared store, or None"""
+    comparison = st.session_state.comparison
+    if not comparison or comparison["companies"] is None:
+        return None
+    store = get_company_store()
+    companies = [(company_name, store.get(version)) for company_name, version in comparison["companies"]]
+    if any(data is None for _, data in companies):
+        st.session_state.comparison = None
+        st.warning("The research results for this comparison are no longer in memory. Please compare again.")
+        return None
+    return companies
+
+@render_timer("comparison")
+def render_comparison(companies):
+    """Each company side by side, then their financials on one table and chart"""
+    st.header(comparison_label(companies))
+    for column, (company_name, data) in zip(st.columns(len(companies)), companies):
+        with column:
+            logo = logo_bytes(data["logo"]["digest"]) if "logo" in data else None
+            if logo:
+                st.image(logo, width=64)
+            st.subheader(company_name)
+            if "website_url" in data:
+                st.write(f"🌐 [Website]({data['website_url']})")
+            overview = stored_summary(company_name, data.get("data_version"))
+            if overview:
+                st.info(overview)
+            else:
+                st.markdown(data.get("summary", "").replace("\n", "  \n"))
+
+    view = get_comparison_view(companies)
+    st.subheader("Financials")
+    st.dataframe(view["financials"], use_container_width=True)
+    if view["chart"]:
+        st.caption("Closing price over the last 12 months, rebased to 100 at the first date every company has")
+        st.image(view["chart"], use_container_width=True)
+    else:
+        st.write("No price history available. Add a ticker after the name and domain to compare prices.")
+
+@st.fragment
+@render_timer("chat")
+def render_chat(start_stream, title="Chat about the Company"):
+    """Chat history, the streamed answer to the pending question and the input box
+
+    start_stream(question) starts the answer; the chat history already ends
+    with the question when it is called. This is a fragment, so submitting a
+    question reruns only the chat, not the company panels above it.
+    """
     st.markdown("---")
-    st.subheader("Chat about the Company")
-    
+    st.subheader(title)
+
     for message in st.session_state.chat_history:
         if message["role"] == "user":
             st.markdown(f"**You:** {message['content']}")
         else:
             st.markdown(f"**AI:** {message['content']}")
-    
+
     def process_input():
-        if st.session_state.user_input and st.session_state.company_data:
+        if st.session_state.user_input and (st.session_state.company_version or st.session_state.comparison):
             user_question = st.session_state.user_input
             st.session_state.current_input = user_question
             st.session_state.awaiting_response = True
             st.session_state.user_input = ""
-            
+
             st.session_state.chat_history.append({"role": "user", "content": user_question})
-            
-            # Create combined text from all data sources
-            combined_text = create_combined_text(st.session_state.company_data)
-            
-            system_message = f"""You are a company intelligence assistant for {company_name}.
-            Use ONLY the following information to answer questions about {company_name}.
-            Be concise, factual, and only use the information provided.
-            If you don't know something, admit it rather than making up information.
-            
-            COMPANY INFORMATION:
-            {combined_text[:50000]}
-            """
-            
-            messages = [
-                {"role": "system", "content": system_message},
-            ]
-            
-            for msg in st.session_state.chat_history[-8:]: 
-                messages.append(msg)
-            
-            try:
-                completion = client.chat.completions.create(
-                    model="deepseek/deepseek-v3-turbo",
-                    messages=messages,
-                    max_tokens=800,
-                    temperature=0.5,
-                )
-                
-                ai_response = completion.choices[0].message.content
-                
-                st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-                
-                st.session_state.awaiting_response = False
-                st.session_state.current_input = ""
-                
-            except Exception as e:
-                st.error(f"Error generating response: {str(e)}")
-                st.session_state.awaiting_response = False
-                
+
         elif st.session_state.user_input:
             st.warning("Please research a company first by clicking the 'Research Company' button.")
             st.session_state.user_input = ""
 
-    user_input = st.text_input("Ask a question about the company:", key="user_input", on_change=process_input)
-    
-    if st.session_state.awaiting_response:
-        with st.spinner("Generating response..."):
-            time.sleep(0.1)  
-    with st.expander("View Raw Data Sources"):
-        if st.session_state.data_sources:
-            data_source_tabs = st.tabs([f"Source {i+1}" for i in range(len(st.session_state.data_sources))])
-            
-            for i, src in enumerate(st.session_state.data_sources):
-                with data_source_tabs[i]:
-                    st.text(src)
+    def stream_answer(user_question):
+        """Stream the assistant's answer below the chat history"""
+        stream = start_stream(user_question)
+        try:
+            render_stream(stream, st.empty(), "markdown", prefix="**AI:** ")
+        finally:
+            # Keep whatever arrived, even if the stream failed or the
+            # script was interrupted by another interaction.
+            ai_response = stream.text
+            if not stream.complete and ai_response:
+                ai_response += "\n\n_[response interrupted]_"
+            if ai_response:
+                st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
+            st.session_state.awaiting_response = False
+            st.session_state.current_input = ""
+            stats = record_stream_stats(stream.stats())
+
+        if stream.error:
+            st.error(f"Error generating response: {str(stream.error)}")
         else:
-            st.write("No data sources available.")
+            st.caption(format_stream_stats(stats))
 
-else:
+    if st.session_state.awaiting_response and st.session_state.current_input:
+        stream_answer(st.session_state.current_input)
+
+    user_input = st.text_input("Ask a question about the company:", key="user_input", on_change=process_input)
+
+@st.fragment
+@render_timer("raw_sources")
+def render_raw_sources(data):
+    """Raw text of every data source, one page of one source at a time
+
+    Sources can run to hundreds of kilobytes, so nothing is sent until the
+    toggle is on, and then only the selected page. A fragment, so paging
+    reruns only this panel.
+    """
+    if not st.toggle("View Raw Data Sources", key="show_raw_sources"):
+        return
+    sources = get_company_view(data)["raw_sources"]
+    if not sources:
+        st.write("No data sources available.")
+        return
+    labels = [label for label, _ in sources]
+    label = st.selectbox("Source", labels, key="raw_source")
+    pages = sources[labels.index(label)][1]
+    page = 1
+    if len(pages) > 1:
+        page = st.number_input("Page", min_value=1, max_value=len(pages), value=1, step=1,
+                               key=f"raw_source_page_{labels.index(label)}")
+    st.caption(f"Page {page} of {len(pages)}")
+    st.text(pages[page - 1])
+
+@st.fragment
+@render_timer("debug")
+def render_debug_panel(data):
+    """Per-source trace of the last run, this session's LLM calls and process-wide metrics
+
+    Built only while the toggle is on; the downloads are generated when clicked.
+    """
+    if not st.toggle("Debug: Instrumentation", key="show_debug"):
+        return
+    import pandas as pd
+
+    timings = st.session_state.render_timings
+    if timings:
+        st.caption("Last render: " + ", ".join(f"{section} {seconds * 1000:.0f} ms"
+                                               for section, seconds in timings.items()))
+    trace = data.get("trace") if data else None
+    if trace:
+        st.markdown(f"**Last run** ({trace['elapsed'] or 0:.1f}s)")
+        st.dataframe(pd.DataFrame([
+            {"Source": span["name"], "Outcome": span["outcome"], "Seconds": span["wall_time"],
+             "Requests": span["requests"], "Bytes": span["bytes"],
+             "Statuses": ", ".join(f"{status}×{count}" for status, count in span["statuses"].items()),
+             "Parse s": span["parse_time"], "Tokens": span["prompt_tokens"], "Error": span["error"]}
+            for span in trace["spans"]
+        ]), use_container_width=True)
+        for source, error in data.get("errors", {}).items():
+            st.caption(f"{source}: {error}")
+
+    if st.session_state.llm_stats:
+        st.markdown("**LLM calls this session**")
+        st.dataframe(pd.DataFrame([
+            {"Kind": stats["kind"], "Cached": stats["cached"], "Prompt tokens": stats["prompt_tokens"],
+             "Completion tokens": stats["completion_tokens"], "First token s": stats["time_to_first_token"],
+             "Total s": stats["total_time"], "Model": stats["model"], "Error": stats.get("error_type")}
+            for stats in st.session_state.llm_stats
+        ]), use_container_width=True)
+
+    gateway = llm_gateway_stats()
+    if gateway and gateway["calls"]:
+        st.markdown(f"**LLM gateway** ({gateway['calls']} calls, {gateway['retries']} retried, "
+                    f"{gateway['rerouted']} reroutes, {gateway['throttled']} throttled for "
+                    f"{gateway['throttled_seconds']:.1f}s, {gateway['deadline_exceeded']} past deadline)")
+        st.dataframe(pd.DataFrame([
+            {"Model": model, "Calls": health["calls"], "Error rate": health["error_rate"],
+             "p95 first token s": health["p95"], "Fallback for s": health["degraded_for"]}
+            for model, health in gateway["models"].items()
+        ]), use_container_width=True)
+
+    store = get_company_store()
+    store_stats = store.stats()
+    if store_stats["entries"]:
+        st.markdown(f"**Company store** ({store_stats['bytes'] / 2**20:.1f} of {store_stats['max_bytes'] / 2**20:.0f} MB, "
+                    f"{store_stats['evictions']} evicted)")
+        st.dataframe(pd.DataFrame([
+            {"Company": entry["company"], "Version": entry["version"], "KB": entry["bytes"] / 1e3,
+             "Unique KB": entry["unique_bytes"] / 1e3,
+             "Idle s": time.time() - entry["last_access"]}
+            for entry in store.entries()
+        ]), use_container_width=True)
+
+    metrics = get_metrics()
+    summary = metrics.source_summary()
+    if summary:
+        st.markdown("**All runs in this process**")
+        st.dataframe(pd.DataFrame([
+            {"Source": source, "Runs": row["runs"], "Success rate": row["success_rate"],
+             "p50 s ≤": row["p50_seconds"], "p95 s ≤": row["p95_seconds"], "Mean bytes": row["mean_bytes"]}
+            for source, row in sorted(summary.items())
+        ]), use_container_width=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Prometheus metrics", metrics.prometheus_text, file_name="companybot_metrics.prom",
+                           mime="text/plain", use_container_width=True)
+    with col2:
+        st.download_button("Metrics and traces (JSON)", metrics.to_json, file_name="companybot_metrics.json",
+                           mime="application/json", use_container_width=True)
+
+def render_welcome():
+    """Instructions shown before any company has been researched"""
     st.info("Enter a company name and click 'Research Company' to begin analyzing company information.")
-    
+
     with st.expander("How to use this tool"):
         st.markdown("""
         ### Instructions:
@@ -651,14 +652,15 @@ else:
            - Review the AI-generated summary
            - Explore different information tabs
            - Ask questions about the company in the chat interface
-        
+        5. To compare competitors, list them under 'Compare Companies' and ask questions across all of them
+
         ### What data is collected:
         - Company website content
         - Recent news articles
         - LinkedIn and Twitter information
         - Company reviews
         - Financial data (if ticker symbol provided)
-        
+
         ### Sample questions:
         - "What products does this company offer?"
         - "What is their business model?"
@@ -667,5 +669,57 @@ else:
         - "How many employees do they have?"
         """)
 
-st.markdown("---")
-st.caption("This tool collects publicly available information about companies to provide insights. Information may not be 100% accurate or complete.")
+@render_timer("page")
+def main():
+    # Streamlit UI setup
+    st.set_page_config(page_title="Company Intelligence Bot", layout="wide")
+    st.title("Company Intelligence Bot")
+
+    init_session_state()
+    start_metrics_server()
+    inputs = render_sidebar()
+
+    if inputs["clear"]:
+        clear_company()
+
+    if inputs["batch"] and inputs["batch_file"] is not None:
+        run_batch_research(inputs["batch_file"], int(inputs["batch_workers"]), inputs["batch_summaries"], inputs["use_cache"])
+
+    if inputs["fetch"]:
+        research_company(inputs["company_name"], inputs["company_domain"], inputs["ticker_symbol"], inputs["use_cache"])
+
+    if inputs["compare"]:
+        compare_companies(inputs["compare_text"], inputs["use_cache"])
+
+    if st.session_state.job_id:
+        follow_job()
+    if st.session_state.comparison and st.session_state.comparison["companies"] is None:
+        follow_comparison()
+
+    running = st.session_state.job_id or (st.session_state.comparison and st.session_state.comparison["companies"] is None)
+    companies = None if running else current_comparison()
+    data = None if running or companies else current_company()
+    if running:
+        # Still running; the job fragments redraw themselves until they finish
+        pass
+    elif companies:
+        render_comparison(companies)
+        render_chat(lambda question: stream_comparison_answer(companies, question, st.session_state.chat_history,
+                                                              top_k=RETRIEVAL_TOP_K),
+                    title="Compare the Companies")
+    elif data is not None:
+        researched = st.session_state.researched or inputs
+        render_company(data, researched["company_name"], researched["ticker_symbol"])
+        render_chat(lambda question: stream_chat_answer(researched["company_name"], question, get_index(data),
+                                                        st.session_state.chat_history, top_k=RETRIEVAL_TOP_K,
+                                                        data_version=data.get("data_version"), facts=data.get("facts")))
+        render_raw_sources(data)
+    else:
+        render_welcome()
+    render_debug_panel(data)
+
+    st.markdown("---")
+    st.caption("This tool collects publicly available information about companies to provide insights. Information may not be 100% accurate or complete.")
+
+if __name__ == "__main__":
+    main()
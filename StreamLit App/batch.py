@@ -0,0 +1,281 @@
+"""Batch research over a CSV of companies
+
+Reads rows of name/domain/ticker, researches each company with
+collect_company_data and generate_company_summary on a bounded worker pool,
+and streams one JSON record per company to the output file as it finishes.
+The JSONL output doubles as the checkpoint: rerunning with the same output
+skips companies that were already researched successfully and retries the
+ones that failed, including those whose summary failed. The latest record
+for a company supersedes earlier ones. A .parquet output is written from
+the JSONL checkpoint once the run completes.
+
+    python batch.py companies.csv -o results.jsonl --workers 4
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from pipeline import SUMMARY_ERROR, collect_company_data, format_financial_summary, generate_company_summary
+
+DEFAULT_WORKERS = 4
+NAME_COLUMNS = ("name", "company", "company_name", "company name")
+DOMAIN_COLUMNS = ("domain", "website", "company_domain", "company domain", "url")
+TICKER_COLUMNS = ("ticker", "symbol", "ticker_symbol", "stock ticker")
+TEXT_FIELDS = ("website_url", "logo_url", "news", "linkedin", "twitter", "reviews")
+
+
+def _pick(row, columns):
+    for column in columns:
+        value = row.get(column)
+        if value:
+            return value.strip()
+    return ""
+
+
+def read_companies(source):
+    """Read company rows from a CSV path or text file object
+
+    The name column is required; domain and ticker columns are optional.
+    Column names are matched case-insensitively against common spellings,
+    and a headerless single-column file is read as a list of names.
+    """
+    if isinstance(source, str):
+        with open(source, newline="", encoding="utf-8-sig") as f:
+            return read_companies(io.StringIO(f.read()))
+
+    text = source.read()
+    if isinstance(text, bytes):
+        text = text.decode("utf-8-sig")
+    reader = csv.DictReader(io.StringIO(text))
+    fields = [field.strip().lower() for field in (reader.fieldnames or [])]
+    if not any(field in NAME_COLUMNS for field in fields):
+        return [{"name": line.strip(), "domain": "", "ticker": ""}
+                for line in text.splitlines() if line.strip()]
+
+    rows = []
+    for raw in reader:
+        row = {(key or "").strip().lower(): value for key, value in raw.items()}
+        name = _pick(row, NAME_COLUMNS)
+        if name:
+            rows.append({"name": name, "domain": _pick(row, DOMAIN_COLUMNS), "ticker": _pick(row, TICKER_COLUMNS)})
+    return rows
+
+
+def row_key(row):
+    """Identity of a row for checkpointing"""
+    return "|".join([row["name"].strip().lower(), row["domain"].strip().lower(), row["ticker"].strip().upper()])
+
+
+def research_row(row, summarize=True, use_cache=True):
+    """Research one company and return a JSON-serializable record"""
+    started = time.monotonic()
+    record = {"key": row_key(row), "name": row["name"], "domain": row["domain"], "ticker": row["ticker"]}
+    try:
+        data = collect_company_data(row["name"], row["domain"], row["ticker"], use_cache=use_cache)
+        for field in TEXT_FIELDS:
+            record[field] = data.get(field)
+        if "financial" in data:
+            record["financial_summary"] = format_financial_summary(data["financial"])
+            record["financial_info"] = data["financial"]["info"]
+        record["website_pages"] = [page["url"] for page in data.get("website_pages", [])]
+        record["website_content_chars"] = len(data.get("website_content", ""))
+        record["timed_out"] = data.get("timed_out", [])
+        record["timings"] = data.get("timings", {})
+        record["source_errors"] = data.get("errors", {})
+        record["status"] = "ok"
+        if summarize:
+            summary = generate_company_summary(row["name"], data)
+            if summary.startswith(SUMMARY_ERROR):
+                # Not "ok", so a resumed run tries the summary again
+                record["status"] = "error"
+                record["error"] = summary[len(SUMMARY_ERROR):]
+            else:
+                record["ai_summary"] = summary
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["elapsed"] = round(time.monotonic() - started, 3)
+    record["researched_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return record
+
+
+def checkpoint_path(output_path):
+    """JSONL file that results are streamed to for a given output path"""
+    return output_path if output_path.endswith(".jsonl") else f"{output_path}.jsonl"
+
+
+def load_checkpoint(path):
+    """Latest record per key in a JSONL checkpoint, in the order they were written"""
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                key = record["key"]
+            except (ValueError, KeyError, TypeError):
+                # A partially written last line from an interrupted run
+                continue
+            records.pop(key, None)
+            records[key] = record
+    return records
+
+
+def compact_checkpoint(path):
+    """Rewrite a checkpoint with only the latest record per key"""
+    records = load_checkpoint(path)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        for record in records.values():
+            f.write(json.dumps(record, default=str) + "\n")
+    os.replace(temp_path, path)
+
+
+def _ends_mid_line(path):
+    """True if a file is non-empty and its last byte is not a newline"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+class BatchStats:
+    """Progress and throughput of a batch run"""
+
+    def __init__(self, total, skipped=0):
+        self.total = total
+        self.skipped = skipped
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def throughput(self):
+        """Companies per minute"""
+        return self.done / self.elapsed * 60 if self.elapsed > 0 else 0.0
+
+    @property
+    def remaining(self):
+        return self.total - self.skipped - self.done
+
+    @property
+    def eta(self):
+        return self.remaining / (self.done / self.elapsed) if self.done else None
+
+    def as_dict(self):
+        return {
+            "total": self.total,
+            "skipped": self.skipped,
+            "done": self.done,
+            "failed": self.failed,
+            "elapsed": round(self.elapsed, 1),
+            "throughput_per_min": round(self.throughput, 2),
+            "eta": round(self.eta, 1) if self.eta is not None else None,
+        }
+
+
+def run_batch(rows, output_path, workers=DEFAULT_WORKERS, summarize=True, use_cache=True, resume=True,
+              on_result=None):
+    """Research every row on a bounded pool, streaming records to output_path
+
+    on_result(record, stats) is called from the calling thread after each
+    record has been written.
+    """
+    jsonl_path = checkpoint_path(output_path)
+    checkpoint = load_checkpoint(jsonl_path) if resume else {}
+    if not resume and os.path.exists(jsonl_path):
+        os.remove(jsonl_path)
+
+    unique = {}
+    for row in rows:
+        unique.setdefault(row_key(row), row)
+    # Only successful rows are skipped; failed ones are researched again
+    pending = [row for key, row in unique.items() if checkpoint.get(key, {}).get("status") != "ok"]
+    retried = any(row_key(row) in checkpoint for row in pending)
+    stats = BatchStats(total=len(unique), skipped=len(unique) - len(pending))
+
+    # Terminate a line cut short by an interrupted run before appending
+    terminate = os.path.exists(jsonl_path) and _ends_mid_line(jsonl_path)
+    with open(jsonl_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as executor:
+        if terminate:
+            out.write("\n")
+        futures = [executor.submit(research_row, row, summarize, use_cache) for row in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+            stats.done += 1
+            if record["status"] != "ok":
+                stats.failed += 1
+            if on_result:
+                on_result(record, stats)
+
+    if retried:
+        # Drop the failed records the retries superseded
+        compact_checkpoint(jsonl_path)
+    if output_path.endswith(".parquet"):
+        write_parquet(jsonl_path, output_path)
+    return stats
+
+
+def write_parquet(jsonl_path, parquet_path):
+    """Convert a JSONL checkpoint into a Parquet file"""
+    import pandas as pd
+
+    records = list(load_checkpoint(jsonl_path).values())
+    for record in records:
+        # Nested fields are kept as JSON text so the columns stay flat
+        for field in ("financial_info", "timings", "timed_out", "website_pages", "source_errors"):
+            if field in record:
+                record[field] = json.dumps(record[field], default=str)
+    pd.DataFrame.from_records(records).to_parquet(parquet_path, index=False)
+
+
+def _format_seconds(seconds):
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Research a CSV of companies in bulk")
+    parser.add_argument("csv", help="CSV with a name column and optional domain/ticker columns")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="output .jsonl or .parquet file")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, help="companies researched at once")
+    parser.add_argument("--no-summary", action="store_true", help="skip the AI summary for each company")
+    parser.add_argument("--no-cache", action="store_true", help="fetch every source again instead of using cached research")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint and start over")
+    args = parser.parse_args(argv)
+
+    rows = read_companies(args.csv)
+
+    def report(record, stats):
+        print(
+            f"[{stats.skipped + stats.done}/{stats.total}] {record['name']}: {record['status']} "
+            f"in {record['elapsed']:.1f}s | {stats.throughput:.1f}/min | ETA {_format_seconds(stats.eta)}",
+            flush=True,
+        )
+
+    stats = run_batch(rows, args.output, workers=args.workers, summarize=not args.no_summary,
+                      use_cache=not args.no_cache, resume=not args.restart, on_result=report)
+    print(f"Done: {stats.done} researched, {stats.skipped} already in checkpoint, {stats.failed} failed "
+          f"in {_format_seconds(stats.elapsed)} ({stats.throughput:.1f}/min). Output: {args.output}")
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
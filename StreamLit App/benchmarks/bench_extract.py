@@ -0,0 +1,110 @@
+"""Benchmark streaming text extraction against the old full-page scrape
+
+Run from the app directory:
+
+    python benchmarks/bench_extract.py [--repeat N]
+
+The saved company homepage fixture is inflated from its real size up to
+about 20 MB, standing in for the very large pages some sites serve. For
+each size it times the legacy scrape (decode the whole body, build a full
+BeautifulSoup tree, strip script/style, then cut to 100,000 characters) and
+`extract_stream` on every backend fed 16 KB chunks as they would arrive
+from the network. Peak Python memory is measured with tracemalloc, and the
+menu, footer and cookie-banner phrases left in each output are counted.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from extract import BACKENDS, extract_stream
+from http_client import CHUNK_SIZE
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "company_home.html")
+# Phrases that only occur in the fixture's menus, footer and banners
+BOILERPLATE_MARKERS = ("Accept all", "Footer link", "Press release", "Subscribe to our newsletter",
+                       "Share on Twitter", "Products 7")
+
+
+def legacy_scrape(body, max_chars=100000):
+    """The pre-streaming scrape_website_content, minus the network fetch"""
+    soup = BeautifulSoup(body.decode("utf-8", errors="replace"), "html.parser")
+    for script in soup(["script", "style"]):
+        script.extract()
+    text = soup.get_text(separator=' ', strip=True)
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    text = '\n'.join(chunk for chunk in chunks if chunk)
+    return text[:max_chars]
+
+
+def streaming_extract(body, backend):
+    chunks = (body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE))
+    return extract_stream(chunks, "https://acme.example/", backend=backend).text
+
+
+def measure(fn, *args, repeat=3):
+    """Best wall time, peak traced memory and the output of fn(*args)"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def boilerplate_hits(text):
+    return sum(text.count(marker) for marker in BOILERPLATE_MARKERS)
+
+
+def inflate(html, factor):
+    """Repeat the page's main content so the page is factor times larger"""
+    head, _, rest = html.partition('<main id="content">')
+    body, _, tail = rest.partition("</main>")
+    return f'{head}<main id="content">{body * factor}</main>{tail}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="timing repetitions (best is reported)")
+    parser.add_argument("--max-factor", type=int, default=1024, help="largest inflation factor")
+    args = parser.parse_args()
+
+    with open(FIXTURE, encoding="utf-8") as f:
+        html = f.read()
+
+    approaches = [("legacy", legacy_scrape)] + [(name, lambda body, name=name: streaming_extract(body, name))
+                                                for name in sorted(BACKENDS)]
+    print(f"{'MB':>8}" + "".join(f"{name + ' ms':>14}{name + ' MB':>12}" for name, _ in approaches))
+    outputs = {}
+    factor = 1
+    while factor <= args.max_factor:
+        body = inflate(html, factor).encode("utf-8")
+        row = f"{len(body) / 1e6:>8.2f}"
+        for name, fn in approaches:
+            # The legacy scrape takes seconds on the largest pages; time it once there
+            repeat = 1 if name == "legacy" and factor >= 64 else args.repeat
+            seconds, peak, text = measure(fn, body, repeat=repeat)
+            row += f"{seconds * 1000:>14.1f}{peak / 1e6:>12.1f}"
+            if factor == 1:
+                outputs[name] = text
+        print(row, flush=True)
+        factor *= 4
+
+    print("\noutput on the original page")
+    for name, text in outputs.items():
+        print(f"{name:<10}{len(text):>8} chars {boilerplate_hits(text):>6} boilerplate phrases")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""Load-test the LLM gateway against a local stub OpenAI-compatible server
+
+Run from the app directory:
+
+    python benchmarks/bench_llm_gateway.py [--scenario NAME ...] [--requests N] [--concurrency N]
+
+Every scenario starts a StubLLMServer (see stub_llm_server.py), points a
+real OpenAI client at it through an LLMGateway and streams chat answers
+with ChatStream from a pool of threads, as concurrent sessions would:
+
+    throttle  more requests than the rate limit and in-flight cap allow
+    slow      the primary model's first token takes longer than the p95 threshold
+    failing   half of the primary model's requests fail with a 503
+    deadline  the model never answers within the call deadline
+
+It reports wall time, throughput, p50/p95 time to first token, the errors
+callers saw, which model served the answers, the gateway's counters and the
+most requests the server was handling at once. It exits with status 1 when
+a scenario breaks its expectation: the in-flight cap or rate limit was
+exceeded, traffic did not move to the fallback, failures reached callers
+that a retry should have absorbed, or a call outlived its deadline.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm import ChatStream
+from llm_gateway import LLMGateway
+from stub_llm_server import ModelBehaviour, StubLLMServer
+
+PRIMARY = "primary-model"
+FALLBACK = "fallback-model"
+# Keeps the rate limit out of the scenarios that are not about it
+UNLIMITED = 60000
+MESSAGES = [{"role": "user", "content": "What does Acme Corp do?"}]
+
+
+def run_load(gateway, requests, concurrency, max_tokens=64):
+    """Stream requests answers through the gateway; returns their stats and the wall time"""
+    def ask(_):
+        stream = ChatStream(gateway, MESSAGES, model=PRIMARY, kind="bench", max_tokens=max_tokens)
+        stream.consume()
+        return stream.stats()
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(ask, range(requests)))
+    return results, time.monotonic() - started
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+SCENARIOS = {
+    "throttle": {
+        "behaviours": {PRIMARY: ModelBehaviour(first_token=0.05, per_token=0.005)},
+        "gateway": {"requests_per_minute": 600, "burst": 5, "max_in_flight": 3},
+    },
+    "slow": {
+        "behaviours": {PRIMARY: ModelBehaviour(first_token=0.6), FALLBACK: ModelBehaviour(first_token=0.05)},
+        "gateway": {"fallback_model": FALLBACK, "p95_threshold": 0.3, "min_samples": 4, "cooldown": 30,
+                    "requests_per_minute": UNLIMITED},
+    },
+    "failing": {
+        "behaviours": {PRIMARY: ModelBehaviour(error_rate=0.5), FALLBACK: ModelBehaviour()},
+        "gateway": {"fallback_model": FALLBACK, "error_rate_threshold": 0.9, "min_samples": 1000,
+                    "requests_per_minute": UNLIMITED},
+    },
+    "deadline": {
+        "behaviours": {PRIMARY: ModelBehaviour(first_token=3.0)},
+        "gateway": {"deadline": 1.0, "requests_per_minute": UNLIMITED},
+    },
+}
+
+
+def check(name, results, elapsed, server, gateway):
+    """Problems with a scenario's outcome, as messages"""
+    problems = []
+    settings = SCENARIOS[name]["gateway"]
+    max_in_flight = settings.get("max_in_flight", gateway.max_in_flight)
+    if server.peak_in_flight > max_in_flight:
+        problems.append(f"server saw {server.peak_in_flight} requests at once, cap is {max_in_flight}")
+    errors = [stats for stats in results if stats["error"]]
+    if name == "throttle":
+        rate = settings["requests_per_minute"] / 60
+        allowed = settings["burst"] + rate * elapsed
+        if len(server.arrivals) > allowed + 1:
+            problems.append(f"{len(server.arrivals)} requests in {elapsed:.1f}s, rate limit allows {allowed:.0f}")
+    if name == "slow":
+        served = sum(1 for stats in results if stats["model"] == FALLBACK)
+        if served < len(results) / 2:
+            problems.append(f"only {served} of {len(results)} answers came from the fallback")
+    if name == "failing" and len(errors) >= sum(server.errors.values()):
+        problems.append(f"{len(errors)} callers saw errors for {sum(server.errors.values())} server failures")
+    if name == "deadline":
+        deadline = settings["deadline"]
+        late = [stats for stats in results if stats["total_time"] > deadline + 0.5]
+        if late:
+            problems.append(f"{len(late)} calls ran past the {deadline:.1f}s deadline")
+        if len(errors) != len(results):
+            problems.append("calls that could not meet their deadline did not fail")
+    if name != "deadline" and name != "failing" and errors:
+        problems.append(f"{len(errors)} calls failed: {errors[0]['error']}")
+    return problems
+
+
+def run_scenario(name, requests, concurrency):
+    scenario = SCENARIOS[name]
+    from openai import OpenAI
+
+    with StubLLMServer(scenario["behaviours"]) as server:
+        gateway = LLMGateway(OpenAI(base_url=server.base_url, api_key="stub", max_retries=0),
+                             **dict({"fallback_model": None}, **scenario["gateway"]))
+        if name == "deadline":
+            requests = min(requests, gateway.max_in_flight)
+        results, elapsed = run_load(gateway, requests, concurrency)
+        return results, elapsed, server, gateway
+
+
+def report(name, results, elapsed, server, gateway, problems):
+    ttfts = [stats["time_to_first_token"] for stats in results if stats["time_to_first_token"] is not None]
+    errors = {}
+    served = {}
+    for stats in results:
+        if stats["error_type"]:
+            errors[stats["error_type"]] = errors.get(stats["error_type"], 0) + 1
+        else:
+            served[stats["model"]] = served.get(stats["model"], 0) + 1
+    counters = gateway.stats()
+    p50 = statistics.median(ttfts) if ttfts else None
+    p95 = percentile(ttfts, 0.95)
+    print(f"\n{name}: {len(results)} requests in {elapsed:.2f}s ({len(results) / elapsed:.1f}/s), "
+          f"server peak in flight {server.peak_in_flight}")
+    print(f"  first token p50 {p50 if p50 is None else f'{p50:.3f}s'}, p95 {p95 if p95 is None else f'{p95:.3f}s'}")
+    print(f"  served by {served or '-'}, caller errors {errors or '-'}, server failures {server.errors or '-'}")
+    print(f"  gateway: retries {counters['retries']}, reroutes {counters['rerouted']}, throttled "
+          f"{counters['throttled']} for {counters['throttled_seconds']:.2f}s, "
+          f"past deadline {counters['deadline_exceeded']}")
+    for problem in problems:
+        print(f"  FAILED: {problem}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable; default all)")
+    parser.add_argument("--requests", type=int, default=30, help="answers to stream per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="threads making requests")
+    args = parser.parse_args()
+
+    failed = False
+    for name in args.scenario or list(SCENARIOS):
+        results, elapsed, server, gateway = run_scenario(name, args.requests, args.concurrency)
+        problems = check(name, results, elapsed, server, gateway)
+        report(name, results, elapsed, server, gateway, problems)
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""Benchmark the full research pipeline offline by replaying a cassette
+
+Run from the app directory:
+
+    python benchmarks/bench_pipeline.py [--cassette PATH] [--repeat N] [--http-latency S] ...
+    python benchmarks/bench_pipeline.py --record PATH --company NAME [--domain D] [--ticker T]
+
+--record runs the pipeline live once (network access and HF_API_KEY needed)
+and saves everything it fetched to a cassette. Without --cassette, a
+synthetic cassette is built from the saved fixtures: results pages for
+every search, the saved homepage and a variant of it for every page it
+links to, a logo image, a year of generated prices for the ticker and a
+canned LLM reply.
+
+Each repetition clears the research, search and response caches, then runs
+collect_company_data, build_index, create_combined_text, the streamed
+summary and a few chat turns against the cassette. It reports the median and
+best time per stage and per source, end-to-end time, HTML parse throughput,
+and peak traced memory from one extra run (tracing slows everything down, so
+that run is not timed).
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+# Keep the benchmark's research cache away from the real one
+os.environ.setdefault("COMPANYBOT_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="companybot_bench_"),
+                                                            "research.sqlite3"))
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from context_budget import ContextBudget
+from extract import extract_html
+from pipeline import (SUMMARY_PROMPT_TOKENS, collect_company_data, create_combined_text, stream_chat_answer,
+                      stream_company_summary)
+from replay import Cassette, Latency, recording, replaying
+from research_cache import get_cache
+from response_cache import get_response_cache
+from retrieval import build_index
+from search_planner import get_planner, plan_searches, search_vertical
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+QUESTIONS = (
+    "What products does this company offer?",
+    "How many employees do they have?",
+    "What are their recent news mentions?",
+)
+SEARCH_FIXTURES = {None: "serp_web.html", "nws": "serp_news.html", "isch": "serp_images.html"}
+SYNTHETIC_SITE = "https://www.acme.com/"
+SYNTHETIC_REPLY = ("Acme Corporation makes industrial anvils and rockets for customers worldwide. "
+                   "It sells through its own site and distributors, and reports steady growth. ") * 4
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+def synthetic_cassette(company="Acme", ticker="ACME"):
+    """A cassette built from the saved fixtures, for benchmarking without a recording"""
+    cassette = Cassette({"company": company, "domain": "", "ticker": ticker})
+    html = {"Content-Type": "text/html; charset=utf-8"}
+    for source, url in plan_searches(company).items():
+        if f"GET {url}" not in cassette.http:
+            cassette.add_http("GET", url, 200, html, _fixture(SEARCH_FIXTURES[search_vertical(source)]))
+    for path in ("robots.txt", "sitemap.xml", "favicon.ico", "apple-touch-icon.png"):
+        cassette.add_http("GET", SYNTHETIC_SITE + path, 404)
+    homepage = _fixture("company_home.html")
+    cassette.add_http("GET", SYNTHETIC_SITE, 200, html, homepage)
+    # Each page the homepage links to is the homepage with a line of its own, so none is dropped as a duplicate
+    for link in extract_html(homepage, SYNTHETIC_SITE).links:
+        if link.startswith(SYNTHETIC_SITE) and link != SYNTHETIC_SITE and f"GET {link}" not in cassette.http:
+            marker = f'<main id="content"><h1>{link}</h1>'.encode("utf-8")
+            cassette.add_http("GET", link, 200, html, homepage.replace(b'<main id="content">', marker, 1))
+
+    # The image search fixture's one non-thumbnail result, which becomes the logo
+    logo = BytesIO()
+    Image.new("RGB", (256, 256), (200, 40, 40)).save(logo, format="PNG")
+    cassette.add_http("GET", "https://cdn.example.com/acme-logo.png", 200, {"Content-Type": "image/png"},
+                      logo.getvalue())
+
+    days = pd.bdate_range(end="2026-06-30", periods=252)
+    close = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, len(days)))
+    history = pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+                            "Volume": np.full(len(days), 1_000_000)}, index=days)
+    info = {"longName": "Acme Corporation", "industry": "Industrial Machinery", "marketCap": 12_000_000_000,
+            "fullTimeEmployees": 5000, "totalRevenue": 3_400_000_000, "currency": "USD"}
+    cassette.add_ticker(ticker, info=info, history=history, history_args=(("period", "1y"),))
+
+    words = SYNTHETIC_REPLY.split(" ")
+    cassette.add_llm(None, [word + " " for word in words], first_token=0.4, duration=0.4 + 0.01 * len(words))
+    return cassette
+
+
+def reset_caches():
+    get_cache().clear()
+    get_planner().clear()
+    get_response_cache().clear()
+
+
+def run_pipeline(company, domain, ticker):
+    """One full run; returns (stage timings, collected data, summary stats)"""
+    timings = {}
+    started = time.perf_counter()
+    data = collect_company_data(company, domain, ticker, use_cache=False)
+    timings["collect"] = time.perf_counter() - started
+
+    stage = time.perf_counter()
+    index = build_index(data)
+    timings["index"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    create_combined_text(data, ContextBudget(SUMMARY_PROMPT_TOKENS))
+    timings["combined_text"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    summary = stream_company_summary(company, data)
+    summary.consume()
+    timings["summary"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    history = []
+    for question in QUESTIONS:
+        history.append({"role": "user", "content": question})
+        answer = stream_chat_answer(company, question, index, history, data_version=data["data_version"],
+                                    facts=data.get("facts"))
+        history.append({"role": "assistant", "content": answer.consume()})
+    timings["chat"] = time.perf_counter() - stage
+
+    timings["end_to_end"] = time.perf_counter() - started
+    return timings, data, summary.stats()
+
+
+def record(args):
+    cassette = Cassette({"company": args.company, "domain": args.domain, "ticker": args.ticker})
+    with recording(cassette):
+        reset_caches()
+        timings, data, _ = run_pipeline(args.company, args.domain, args.ticker)
+    cassette.save(args.record)
+    print(f"recorded {cassette.stats()} in {timings['end_to_end']:.1f}s to {args.record}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cassette", help="cassette to replay (default: synthetic, from the fixtures)")
+    parser.add_argument("--record", metavar="PATH", help="run live and save a cassette to PATH")
+    parser.add_argument("--company", default="Acme")
+    parser.add_argument("--domain", default="")
+    parser.add_argument("--ticker", default="")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repetitions")
+    parser.add_argument("--http-latency", type=float, default=0.0, help="seconds added to every HTTP response")
+    parser.add_argument("--llm-first-token", type=float, default=0.0, help="seconds before the first LLM token")
+    parser.add_argument("--llm-per-token", type=float, default=0.0, help="seconds between LLM tokens")
+    parser.add_argument("--scale", type=float, help="replay recorded timings times this factor instead")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- fraction on every delay")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strict", action="store_true", help="fail on requests missing from the cassette")
+    args = parser.parse_args()
+
+    if args.record:
+        return record(args)
+
+    cassette = Cassette.load(args.cassette) if args.cassette else synthetic_cassette()
+    company = cassette.meta.get("company", args.company)
+    domain = cassette.meta.get("domain", args.domain)
+    ticker = cassette.meta.get("ticker", args.ticker)
+    print(f"replaying {args.cassette or 'synthetic cassette'} for {company}: {cassette.stats()}")
+
+    runs, source_times, parsed_bytes, parse_seconds, misses = [], {}, 0, 0.0, set()
+    searches_before = get_planner().stats()
+    for _ in range(args.repeat):
+        latency = Latency(http=args.http_latency, llm_first_token=args.llm_first_token,
+                          llm_per_token=args.llm_per_token, scale=args.scale, jitter=args.jitter, seed=args.seed)
+        reset_caches()
+        with replaying(cassette, latency, strict=args.strict) as (transport, llm_client):
+            timings, data, _ = run_pipeline(company, domain, ticker)
+        misses.update(transport.misses)
+        runs.append(timings)
+        for span in data["trace"]["spans"]:
+            source_times.setdefault(span["name"], []).append(span["wall_time"])
+            if span["parse_time"]:
+                parsed_bytes += span["bytes"]
+                parse_seconds += span["parse_time"]
+
+    print(f"\n{'stage':<16}{'median ms':>12}{'best ms':>12}")
+    for stage in runs[0]:
+        values = [run[stage] for run in runs]
+        print(f"{stage:<16}{statistics.median(values) * 1000:>12.1f}{min(values) * 1000:>12.1f}")
+    print(f"\n{'source':<16}{'median ms':>12}{'best ms':>12}")
+    for source, values in sorted(source_times.items()):
+        print(f"{source:<16}{statistics.median(values) * 1000:>12.1f}{min(values) * 1000:>12.1f}")
+
+    searches = get_planner().stats()
+    print(f"\nsearches per run: {(searches['requests'] - searches_before['requests']) / len(runs):.0f} requests, "
+          f"{(searches['shared'] + searches['cache_hits'] - searches_before['shared'] - searches_before['cache_hits']) / len(runs):.0f} "
+          f"served from a shared page")
+    if parse_seconds:
+        # Parse time is summed over the fetch threads, so this is per-thread throughput
+        print(f"\nparse throughput {parsed_bytes / parse_seconds / 1e6:.1f} MB/s per thread "
+              f"({parsed_bytes / len(runs) / 1e3:.0f} KB per run)")
+    if misses:
+        print(f"{len(misses)} requests were not in the cassette and got its default response or a 404")
+
+    reset_caches()
+    with replaying(cassette, strict=args.strict):
+        tracemalloc.start()
+        run_pipeline(company, domain, ticker)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"peak traced memory {peak / 1e6:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Cost of the Streamlit script reruns that follow each interaction
+
+Run from the app directory:
+
+    python benchmarks/bench_rerun.py [--cassette PATH] [--repeat N] [--history N]
+
+Researches a company through the app itself with Streamlit's AppTest,
+replaying the synthetic cassette from bench_pipeline.py (or a recorded
+one), then times the reruns a user triggers once the company is shown:
+
+    rerun     a full script run, as after any sidebar or page widget change
+    chat      submitting a question the fact table answers, so the time is
+              the rerun rather than the model
+
+It reports the median and best time of each, the number of elements the
+page sends, and the per-section render times the app records in
+st.session_state.render_timings. AppTest always reruns the whole script;
+in the real runtime a chat submit reruns only the chat fragment, so its cost
+there is the "chat" section time. --history pre-fills the chat with that
+many turns, since every rerun redraws them.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_pipeline import APP_DIR, reset_caches, synthetic_cassette
+
+from streamlit.testing.v1 import AppTest
+
+from replay import Cassette, replaying
+
+APP = os.path.join(APP_DIR, "LeadGenBot.py")
+FACT_QUESTION = "How many employees do they have?"
+
+
+def count_elements(node):
+    """Elements under an AppTest node, blocks included"""
+    children = getattr(node, "children", None)
+    if not children:
+        return 1
+    return 1 + sum(count_elements(child) for child in children.values())
+
+
+def timed_run(action):
+    started = time.perf_counter()
+    action()
+    return time.perf_counter() - started
+
+
+def research(company, domain, ticker, timeout=120):
+    at = AppTest.from_file(APP, default_timeout=60).run()
+    at.sidebar.text_input[0].set_value(company)
+    at.sidebar.text_input[1].set_value(domain)
+    at.sidebar.text_input[2].set_value(ticker)
+    at.sidebar.button[0].click().run()
+    deadline = time.monotonic() + timeout
+    while at.session_state["job_id"]:
+        if time.monotonic() > deadline:
+            raise TimeoutError("research did not finish")
+        time.sleep(0.1)
+        at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cassette", help="cassette to replay (default: synthetic, from the fixtures)")
+    parser.add_argument("--repeat", type=int, default=10, help="timed reruns of each kind")
+    parser.add_argument("--history", type=int, default=10, help="chat turns on the page before timing")
+    args = parser.parse_args()
+
+    cassette = Cassette.load(args.cassette) if args.cassette else synthetic_cassette()
+    company = cassette.meta.get("company", "Acme")
+    reset_caches()
+    with replaying(cassette):
+        at = research(company, cassette.meta.get("domain", ""), cassette.meta.get("ticker", ""))
+        history = [{"role": role, "content": f"Earlier {role} message {i}. " * 20}
+                   for i in range(args.history) for role in ("user", "assistant")]
+        at.session_state["chat_history"] = history
+        at.run()
+
+        reruns, sections = [], {}
+        for _ in range(args.repeat):
+            reruns.append(timed_run(at.run))
+            for section, seconds in (at.session_state["render_timings"]
+                                     if "render_timings" in at.session_state else {}).items():
+                sections.setdefault(section, []).append(seconds)
+        elements = count_elements(at._tree)
+
+        chats = []
+        for _ in range(args.repeat):
+            at.session_state["chat_history"] = list(history)
+            chats.append(timed_run(lambda: at.text_input(key="user_input").set_value(FACT_QUESTION).run()))
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+
+    print(f"{company}: {elements} elements on the page, {len(history)} chat messages")
+    print(f"\n{'interaction':<16}{'median ms':>12}{'best ms':>12}")
+    for name, values in (("rerun", reruns), ("chat", chats)):
+        print(f"{name:<16}{statistics.median(values) * 1000:>12.1f}{min(values) * 1000:>12.1f}")
+    if sections:
+        print(f"\n{'section':<16}{'median ms':>12}{'best ms':>12}")
+        for section, values in sections.items():
+            print(f"{section:<16}{statistics.median(values) * 1000:>12.1f}{min(values) * 1000:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
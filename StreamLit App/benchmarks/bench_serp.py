@@ -0,0 +1,105 @@
+"""Benchmark the single-pass SERP parser against the old nested div scans
+
+Run from the app directory:
+
+    python benchmarks/bench_serp.py [--repeat N]
+
+For each saved fixture page it times the legacy BeautifulSoup extraction
+(`find_all("div")` followed by `find`/`find_all` inside every div, as the
+fetchers used to do) and `parse_serp` on every installed backend. It then
+inflates the web results page 1x-8x to show how each approach scales, and
+checks that all backends return the same records.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from serp_parser import BACKENDS, parse_serp
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_extract(html):
+    """The pre-parser extraction: every div is searched again for links, titles and snippets"""
+    soup = BeautifulSoup(html, "html.parser")
+    links = []
+    titles = []
+    snippets = []
+    for result in soup.find_all("div"):
+        for link in result.find_all("a"):
+            href = link.get("href", "")
+            url_match = re.search(r'url\?q=([^&]+)', href)
+            if url_match:
+                links.append(url_match.group(1))
+        title_elem = result.find("h3")
+        if title_elem:
+            titles.append(title_elem.text)
+        snippet_elem = result.find(["div", "span"], {"class": re.compile("^[a-zA-Z]")})
+        if snippet_elem:
+            snippets.append(snippet_elem.text)
+    return links, titles, snippets
+
+
+def timed(fn, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def inflate(html, factor):
+    """Repeat the body of a results page so it holds factor times as many results"""
+    head, _, rest = html.partition('<div id="main">')
+    body, _, tail = rest.rpartition("<footer>")
+    return f'{head}<div id="main">{body * factor}<footer>{tail}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    pages = {}
+    for name in sorted(os.listdir(FIXTURES)):
+        if name.startswith("serp_") and name.endswith(".html"):
+            with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+                pages[name] = f.read()
+
+    backends = sorted(BACKENDS)
+    print(f"{'fixture':<20}{'KB':>8}{'legacy ms':>12}" + "".join(f"{b + ' ms':>16}" for b in backends))
+    for name, html in pages.items():
+        row = f"{name:<20}{len(html) / 1024:>8.1f}{timed(legacy_extract, html, repeat=args.repeat) * 1000:>12.2f}"
+        for backend in backends:
+            row += f"{timed(parse_serp, html, backend, repeat=args.repeat) * 1000:>16.2f}"
+        print(row)
+
+    print("\nscaling on serp_web.html")
+    print(f"{'factor':<20}{'KB':>8}{'legacy ms':>12}" + "".join(f"{b + ' ms':>16}" for b in backends))
+    for factor in (1, 2, 4, 8):
+        html = inflate(pages["serp_web.html"], factor)
+        row = f"{factor:<20}{len(html) / 1024:>8.1f}{timed(legacy_extract, html, repeat=args.repeat) * 1000:>12.2f}"
+        for backend in backends:
+            row += f"{timed(parse_serp, html, backend, repeat=args.repeat) * 1000:>16.2f}"
+        print(row)
+
+    for name, html in pages.items():
+        records = {backend: [r.to_dict() for r in parse_serp(html, backend).results] for backend in backends}
+        reference = records[backends[0]]
+        for backend in backends[1:]:
+            if records[backend] != reference:
+                print(f"MISMATCH: {backend} and {backends[0]} disagree on {name}")
+                return 1
+    print(f"\nall backends agree on {len(pages)} fixtures")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
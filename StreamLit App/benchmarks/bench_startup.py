@@ -0,0 +1,91 @@
+"""Import-time profile of the Streamlit app's cold start
+
+Run from the app directory:
+
+    python benchmarks/bench_startup.py [--repeat N] [--top N] [--budget SECONDS] [--json PATH]
+
+Each repetition imports LeadGenBot in a fresh interpreter under
+`python -X importtime`, which is what Streamlit pays before the first page
+is drawn. The report gives the median and best total import time, the
+slowest top-level packages (self time summed over each package's modules)
+and whether any of the dependencies that should load only when their
+feature runs (DEFERRED) were imported at startup. It exits with status 1
+when one was, or when the median is over --budget, so it can guard
+against startup regressions; --json saves the numbers for tracking over
+time.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_MODULE = "LeadGenBot"
+# Loaded on first use: a ticker lookup, a chart, a table, an LLM call or a logo check
+DEFERRED = ("yfinance", "matplotlib", "pandas", "numpy", "openai", "PIL", "tweepy", "tiktoken")
+
+
+def profile_import(module=APP_MODULE):
+    """Import module in a fresh interpreter; returns {module name: (self us, cumulative us)}"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=APP_DIR,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def package_times(modules):
+    """Self time summed per top-level package, in seconds"""
+    packages = {}
+    for name, (self_us, _) in modules.items():
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us / 1e6
+    return packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="slowest packages to list")
+    parser.add_argument("--budget", type=float, help="fail when the median import takes longer (seconds)")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    runs = [profile_import() for _ in range(args.repeat)]
+    totals = [runs_modules[APP_MODULE][1] / 1e6 for runs_modules in runs]
+    packages = {}
+    for modules in runs:
+        for package, seconds in package_times(modules).items():
+            packages.setdefault(package, []).append(seconds)
+    medians = {package: statistics.median(times) for package, times in packages.items()}
+    deferred = sorted(package for package in DEFERRED if package in packages)
+
+    print(f"import {APP_MODULE}: median {statistics.median(totals):.2f}s, best {min(totals):.2f}s "
+          f"over {len(runs)} runs, {len(runs[0])} modules")
+    print(f"\n{'package':<28}{'median ms':>12}")
+    for package, seconds in sorted(medians.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{package:<28}{seconds * 1000:>12.1f}")
+    if deferred:
+        print(f"\nimported at startup but meant to load on first use: {', '.join(deferred)}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"module": APP_MODULE, "median_seconds": statistics.median(totals), "best_seconds": min(totals),
+                       "modules": len(runs[0]), "packages": medians, "deferred_imported": deferred}, f, indent=2)
+
+    over_budget = args.budget is not None and statistics.median(totals) > args.budget
+    if over_budget:
+        print(f"median import time is over the {args.budget:.2f}s budget")
+    return 1 if deferred or over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""A local OpenAI-compatible chat completions server with scripted behaviour
+
+Run from the app directory to point the app at it:
+
+    python benchmarks/stub_llm_server.py [--port 8901] [--first-token S] [--per-token S] [--error-rate P]
+    COMPANYBOT_LLM_BASE_URL=http://127.0.0.1:8901/v1 streamlit run LeadGenBot.py
+
+POST /v1/chat/completions answers with a canned reply, streamed as
+server-sent events when the request asks for a stream. How each model
+behaves (delay before the first token, delay between tokens, share of
+requests failing and the status they fail with) is set per model and can
+be changed while the server runs, which is how bench_llm_gateway.py makes
+the primary model slow down or start failing. The server counts requests
+per model and the most requests it was serving at once.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = ("Acme Corp makes industrial widgets and sells them to manufacturers in 40 countries. "
+         "Revenue grew 12% last year, led by its automation line.")
+
+
+class ModelBehaviour:
+    """How the stub answers requests for one model"""
+
+    def __init__(self, first_token=0.05, per_token=0.002, error_rate=0.0, error_status=503, reply=REPLY):
+        self.first_token = first_token
+        self.per_token = per_token
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reply = reply
+
+
+class StubLLMServer:
+    """ThreadingHTTPServer on 127.0.0.1 serving chat completions; port 0 picks a free port"""
+
+    def __init__(self, behaviours=None, default=None, port=0, seed=0):
+        self.behaviours = dict(behaviours or {})
+        self.default = default or ModelBehaviour()
+        self.random = random.Random(seed)
+        self.requests = {}
+        self.errors = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.arrivals = []
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def behaviour(self, model):
+        return self.behaviours.get(model, self.default)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
+            self.errors.clear()
+            self.arrivals.clear()
+            self.peak_in_flight = self.in_flight
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _begin(self, model):
+        """Count a request; returns the status to fail it with, or None"""
+        behaviour = self.behaviour(model)
+        with self._lock:
+            self.requests[model] = self.requests.get(model, 0) + 1
+            self.arrivals.append(time.monotonic())
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            failed = self.random.random() < behaviour.error_rate
+            if failed:
+                self.errors[model] = self.errors.get(model, 0) + 1
+        return behaviour.error_status if failed else None
+
+    def _end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+def _chunk(model, **delta_or_finish):
+    finish = delta_or_finish.pop("finish_reason", None)
+    return {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta_or_finish, "finish_reason": finish}]}
+
+
+def _handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            model = request.get("model", "")
+            behaviour = server.behaviour(model)
+            status = server._begin(model)
+            try:
+                time.sleep(behaviour.first_token)
+                if status:
+                    self._json(status, {"error": {"message": f"stub failure for {model}", "type": "server_error"}})
+                elif request.get("stream"):
+                    self._stream(model, behaviour)
+                else:
+                    time.sleep(behaviour.per_token * len(behaviour.reply.split()))
+                    self._json(200, {
+                        "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": behaviour.reply}}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": len(behaviour.reply.split()),
+                                  "total_tokens": len(behaviour.reply.split())},
+                    })
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                server._end()
+
+        def _stream(self, model, behaviour):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            events = [_chunk(model, role="assistant", content="")]
+            events += [_chunk(model, content=word + " ") for word in behaviour.reply.split()]
+            events.append(_chunk(model, finish_reason="stop"))
+            for i, event in enumerate(events):
+                if i > 1:
+                    time.sleep(behaviour.per_token)
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--first-token", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--per-token", type=float, default=0.02, help="seconds between tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server = StubLLMServer(default=ModelBehaviour(args.first_token, args.per_token, args.error_rate,
+                                                  args.error_status), port=args.port)
+    print(f"serving chat completions at {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Process-wide, memory-bounded store of collected company data
+
+Sessions and jobs keep only a company's data version and look the data
+up here, so every session that researched the same company shares one
+copy. The version hashes the company's name, domain and ticker along with
+its data, so two companies never share an entry. Entries are kept compact:
+
+- long texts are pooled, so a page or news block that several data
+  versions have in common is held once
+- data sources are kept as a header plus a pooled body, which is usually
+  the same text as the field it was built from
+- website_content is dropped when it can be rebuilt from website_pages
+- price history is kept as one numpy array per column
+
+Lookups return a read-only mapping that rebuilds values on access. The
+store estimates the bytes each entry holds and evicts the least recently
+used entries once the total passes its ceiling (COMPANYBOT_STORE_MAX_MB).
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from pipeline import format_website_pages
+
+DEFAULT_MAX_BYTES = int(os.environ.get("COMPANYBOT_STORE_MAX_MB", "256")) * 1024 * 1024
+# Shorter strings cost less than their pool entry would
+MIN_POOLED_CHARS = 256
+
+
+class ColumnarFrame:
+    """A DataFrame with a datetime index, held as one numpy array per column"""
+
+    __slots__ = ("index", "tz", "freq", "index_name", "columns")
+
+    def __init__(self, frame):
+        import numpy as np
+
+        index = frame.index
+        self.tz = str(index.tz) if index.tz is not None else None
+        self.index = (index.tz_convert("UTC").tz_localize(None) if self.tz else index).to_numpy()
+        self.freq = index.freqstr
+        self.index_name = index.name
+        self.columns = {name: np.ascontiguousarray(frame[name].to_numpy()) for name in frame.columns}
+
+    def to_frame(self):
+        import pandas as pd
+
+        index = pd.DatetimeIndex(self.index, name=self.index_name)
+        if self.tz:
+            index = index.tz_localize("UTC").tz_convert(self.tz)
+        if self.freq:
+            # Only regular in local time, e.g. business days across a DST change
+            index = pd.DatetimeIndex(index, freq=self.freq)
+        return pd.DataFrame(self.columns, index=index, copy=False)
+
+    @property
+    def nbytes(self):
+        return self.index.nbytes + sum(column.nbytes for column in self.columns.values())
+
+
+class SourceText:
+    """A data source entry kept as its header line and a pooled body"""
+
+    __slots__ = ("header", "body")
+
+    def __init__(self, header, body):
+        self.header = header
+        self.body = body
+
+    def __str__(self):
+        return f"{self.header}\n{self.body}"
+
+
+class WebsiteContent:
+    """Marker for website_content that is rebuilt from website_pages"""
+
+
+class StoredCompany(Mapping):
+    """Read-only view of one stored entry; values are rebuilt on first access"""
+
+    def __init__(self, fields):
+        self._fields = fields
+        self._values = {}
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            value = self._fields[key]
+            if isinstance(value, WebsiteContent):
+                self._values[key] = format_website_pages(self["website_pages"])
+            else:
+                self._values[key] = _expand(value)
+        return self._values[key]
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+
+def _expand(value):
+    if isinstance(value, ColumnarFrame):
+        return value.to_frame()
+    if isinstance(value, SourceText):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: _expand(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_expand(item) for item in value]
+    return value
+
+
+def _sizeof(value):
+    """Rough bytes held by a compacted value, not counting pooled texts"""
+    if isinstance(value, ColumnarFrame):
+        return sys.getsizeof(value) + value.nbytes
+    if isinstance(value, SourceText):
+        return sys.getsizeof(value) + _sizeof(value.header) + _sizeof(value.body)
+    if isinstance(value, str) and len(value) >= MIN_POOLED_CHARS:
+        return 0
+    if isinstance(value, dict):
+        # Keys are mostly short literals shared by every entry
+        return sys.getsizeof(value) + sum(_sizeof(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class CompanyStore:
+    """Bounded LRU of compacted company data keyed by data version"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        # text -> [the pooled text, number of entries holding it]
+        self._texts = {}
+        self._text_bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"puts": 0, "hits": 0, "misses": 0, "evictions": 0}
+
+    def _pool(self, text, held):
+        pooled = self._texts.get(text)
+        if pooled is None:
+            pooled = self._texts[text] = [text, 0]
+            self._text_bytes += sys.getsizeof(text)
+        if pooled[0] not in held:
+            pooled[1] += 1
+            held.add(pooled[0])
+        return pooled[0]
+
+    def _release(self, entry):
+        for text in entry["texts"]:
+            pooled = self._texts[text]
+            pooled[1] -= 1
+            if not pooled[1]:
+                del self._texts[text]
+                self._text_bytes -= sys.getsizeof(text)
+
+    def _compact(self, value, held):
+        if isinstance(value, str):
+            return self._pool(value, held) if len(value) >= MIN_POOLED_CHARS else value
+        # A DataFrame can only exist once something has imported pandas
+        pd = sys.modules.get("pandas")
+        if pd is not None and isinstance(value, pd.DataFrame) and isinstance(value.index, pd.DatetimeIndex):
+            return ColumnarFrame(value)
+        if isinstance(value, dict):
+            return {key: self._compact(item, held) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._compact(item, held) for item in value]
+        return value
+
+    def put(self, data, company_name=""):
+        """Store collected data, replacing any entry for the same version; returns the version"""
+        version = data["data_version"]
+        with self._lock:
+            held = set()
+            fields = {}
+            for key, value in data.items():
+                if key == "data_sources":
+                    fields[key] = [SourceText(*source.split("\n", 1)) if "\n" in source else source
+                                   for source in value]
+                    for source in fields[key]:
+                        if isinstance(source, SourceText):
+                            source.body = self._compact(source.body, held)
+                elif key == "website_content" and value == format_website_pages(data.get("website_pages", [])):
+                    fields[key] = WebsiteContent()
+                else:
+                    fields[key] = self._compact(value, held)
+
+            previous = self._entries.pop(version, None)
+            if previous is not None:
+                self._release(previous)
+            self._entries[version] = {
+                "fields": fields,
+                "texts": held,
+                "company": company_name,
+                "own_bytes": _sizeof(fields),
+                "stored": time.time(),
+                "last_access": time.time(),
+            }
+            self.counters["puts"] += 1
+            self._evict(keep=version)
+        return version
+
+    def get(self, version):
+        """A read-only view of the stored data, or None when it is not (or no longer) stored"""
+        with self._lock:
+            entry = self._entries.get(version) if version else None
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(version)
+            entry["last_access"] = time.time()
+            self.counters["hits"] += 1
+            return StoredCompany(entry["fields"])
+
+    def __contains__(self, version):
+        with self._lock:
+            return version in self._entries
+
+    def _total_bytes(self):
+        return self._text_bytes + sum(entry["own_bytes"] for entry in self._entries.values())
+
+    def _evict(self, keep=None):
+        while self._total_bytes() > self.max_bytes and len(self._entries) > 1:
+            version = next(iter(self._entries))
+            if version == keep:
+                self._entries.move_to_end(version)
+                version = next(iter(self._entries))
+            self._release(self._entries.pop(version))
+            self.counters["evictions"] += 1
+
+    def entries(self):
+        """Memory held by each entry, most recently used first
+
+        bytes counts every text the entry refers to; unique_bytes is what
+        evicting it would free, leaving out texts other entries share.
+        """
+        with self._lock:
+            report = []
+            for version, entry in reversed(self._entries.items()):
+                text_bytes = sum(sys.getsizeof(text) for text in entry["texts"])
+                unique_bytes = sum(sys.getsizeof(text) for text in entry["texts"] if self._texts[text][1] == 1)
+                report.append({
+                    "version": version,
+                    "company": entry["company"],
+                    "bytes": entry["own_bytes"] + text_bytes,
+                    "unique_bytes": entry["own_bytes"] + unique_bytes,
+                    "stored": entry["stored"],
+                    "last_access": entry["last_access"],
+                })
+            return report
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._texts.clear()
+            self._text_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), pooled_texts=len(self._texts),
+                        bytes=self._total_bytes(), max_bytes=self.max_bytes)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_company_store():
+    """Return the process-wide company data store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CompanyStore()
+        return _store
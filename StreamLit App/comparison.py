@@ -0,0 +1,112 @@
+"""Side-by-side research of several companies
+
+Each company in a comparison is researched by its own background job, so
+the companies run in parallel, each keeps its results in the company store
+and one already researched by another session is reused. Once they have
+finished, their data shares one retrieval index tagged by company, and a
+question about several of them is answered from a single bounded prompt
+holding the best chunks of each; a plain lookup such as "who has more
+employees?" is answered from the companies' fact tables instead. The
+financial view is built from the price histories the research already
+collected, so it needs no further lookups.
+"""
+import io
+
+from batch import read_companies
+from context_budget import ContextBudget, MODEL_CONTEXT_TOKENS
+from facts import answer_comparison_from_facts
+from jobs import get_job_store
+from llm import CachedStream, ChatStream, DEFAULT_MODEL
+from pipeline import CHAT_MAX_TOKENS, CHAT_PROMPT_TOKENS, build_chat_messages, get_llm_client
+from response_cache import conversation_context, get_response_cache
+from retrieval import get_comparison_index
+
+MIN_COMPANIES = 2
+MAX_COMPANIES = 6
+
+
+def parse_companies(text):
+    """[{"name", "domain", "ticker"}, ...] from lines of "name, domain, ticker", repeats dropped"""
+    rows = read_companies(io.StringIO("name,domain,ticker\n" + text))
+    unique = {}
+    for row in rows:
+        unique.setdefault(row["name"].lower(), row)
+    return list(unique.values())
+
+
+def start_comparison(companies, use_cache=True):
+    """Start (or join) a research job for every company; returns the jobs in order"""
+    store = get_job_store()
+    return [store.submit(row["name"], row["domain"], row["ticker"], use_cache=use_cache) for row in companies]
+
+
+def comparison_label(companies):
+    return " vs ".join(company_name for company_name, _ in companies)
+
+
+def stream_comparison_answer(companies, question, chat_history, top_k=24):
+    """Start a streaming answer to a question about [(company name, company data), ...]
+
+    A factual question every company's fact table can answer is answered
+    from them without calling the model. Other answers are cached on the
+    question, the turns before it and the data versions of every company in
+    the comparison.
+    """
+    answer = answer_comparison_from_facts(companies, question)
+    if answer is not None:
+        return CachedStream(answer, model="facts", kind="comparison", source="facts")
+
+    label = comparison_label(companies)
+    version = "+".join(company_data.get("data_version") or "" for _, company_data in companies)
+    context = conversation_context(chat_history)
+    cached = get_response_cache().get("comparison", label, version, question, context)
+    if cached is not None:
+        return CachedStream(cached, model=DEFAULT_MODEL, kind="comparison")
+
+    names = ", ".join(company_name for company_name, _ in companies)
+    budget = ContextBudget(min(CHAT_PROMPT_TOKENS, MODEL_CONTEXT_TOKENS - CHAT_MAX_TOKENS))
+    instructions = f"""You are a company intelligence assistant comparing {names}.
+    Use ONLY the following information. Every section is labelled with the company it is about in [brackets].
+    When comparing, give the figure or fact for each company and say which company it belongs to.
+    If the information for a company is missing, say so rather than guessing.
+    """
+    messages = build_chat_messages(label, question, get_comparison_index(companies), chat_history, top_k=top_k,
+                                   budget=budget, instructions=instructions)
+    return ChatStream(get_llm_client(), messages, model=DEFAULT_MODEL, kind="comparison", budget=budget.report(),
+                      on_complete=lambda text: get_response_cache().put("comparison", label, version, question, text,
+                                                                        context),
+                      max_tokens=CHAT_MAX_TOKENS, temperature=0.5)
+
+
+def financial_rows(companies):
+    """Headline figures for each company, one row per company"""
+    rows = []
+    for company_name, company_data in companies:
+        financial = company_data.get("financial")
+        info = financial["info"] if financial else {}
+        row = {
+            "Company": company_name,
+            "Ticker": info.get("symbol", ""),
+            "Industry": info.get("industry"),
+            "Market cap": info.get("marketCap"),
+            "Revenue": info.get("totalRevenue"),
+            "Employees": info.get("fullTimeEmployees"),
+            "Price": info.get("currentPrice"),
+            "1y change %": None,
+            "Sources": len(company_data.get("data_sources", [])),
+        }
+        if financial and not financial["history"].empty:
+            close = financial["history"]["Close"]
+            row["1y change %"] = round((close.iloc[-1] / close.iloc[0] - 1) * 100, 1)
+        rows.append(row)
+    return rows
+
+
+def price_histories(companies):
+    """{company name: (history, version)} for every company with price history"""
+    histories = {}
+    for company_name, company_data in companies:
+        financial = company_data.get("financial")
+        if financial and not financial["history"].empty:
+            histories[company_name] = (financial["history"], financial["version"])
+    return histories
@@ -0,0 +1,162 @@
+"""Token counting and prompt budgets
+
+Prompts are sized in tokens rather than characters. Tokens are counted
+locally with tiktoken's cl100k_base encoding when it is installed and its
+vocabulary is available, otherwise with a conservative word/punctuation
+estimate that never needs a download. A ContextBudget hands a fixed number
+of prompt tokens to named sections in the order the caller asks for them, so
+the most important sections are filled first and lower-priority ones get
+what is left. Each section's share is reported for cost and latency
+tracking.
+"""
+import re
+import threading
+
+MODEL_CONTEXT_TOKENS = 64_000
+# Role markers and separators the chat format adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+ESTIMATE_RE = re.compile(r"\w+|[^\w\s]")
+TIKTOKEN_ENCODING = "cl100k_base"
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """The tiktoken encoding, or False when tiktoken or its vocabulary is unavailable
+
+    tiktoken is imported here, on the first count, rather than at startup.
+    """
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+            except ImportError:
+                _encoding = False
+            except Exception:
+                # The vocabulary is downloaded on first use and may be unreachable
+                _encoding = False
+        return _encoding
+
+
+def _estimate_spans(text):
+    """(end offset, running token count) per word or symbol, ~4 characters per token for long words"""
+    total = 0
+    for match in ESTIMATE_RE.finditer(text):
+        total += (len(match.group()) + 3) // 4
+        yield match.end(), total
+
+
+def count_tokens(text):
+    """Number of tokens in text"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    total = 0
+    for _, total in _estimate_spans(text):
+        pass
+    return total
+
+
+def count_message_tokens(messages):
+    """Prompt tokens for a list of chat messages"""
+    return sum(count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def truncate_tokens(text, max_tokens):
+    """Longest prefix of text that fits in max_tokens"""
+    if max_tokens <= 0 or not text:
+        return ""
+    encoding = _get_encoding()
+    if encoding:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    end = 0
+    for offset, total in _estimate_spans(text):
+        if total > max_tokens:
+            return text[:end]
+        end = offset
+    return text
+
+
+class ContextBudget:
+    """A prompt's token allowance, handed out to named sections in priority order"""
+
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+        self.used = 0
+        self.sections = {}
+
+    @property
+    def remaining(self):
+        return max(0, self.total_tokens - self.used)
+
+    def _charge(self, name, tokens):
+        self.used += tokens
+        self.sections[name] = self.sections.get(name, 0) + tokens
+
+    def take(self, name, text, max_tokens=None):
+        """Text cut to fit this section's share of what is left"""
+        limit = self.remaining if max_tokens is None else min(max_tokens, self.remaining)
+        tokens = count_tokens(text)
+        if tokens > limit:
+            text = truncate_tokens(text, limit)
+            tokens = count_tokens(text)
+        self._charge(name, tokens)
+        return text
+
+    def select(self, name, items, text_of=None, max_tokens=None, overhead=0, contiguous=False):
+        """Whole items, in the given order, that fit this section's share
+
+        Items that do not fit are skipped so smaller ones further down can
+        still use the space; with contiguous=True everything after the first
+        item that does not fit is skipped instead. Returns (kept, skipped).
+        """
+        text_of = text_of or (lambda item: item)
+        limit = self.remaining if max_tokens is None else min(max_tokens, self.remaining)
+        kept, skipped, spent = [], [], 0
+        for item in items:
+            cost = count_tokens(text_of(item)) + overhead
+            if spent + cost <= limit and not (contiguous and skipped):
+                kept.append(item)
+                spent += cost
+            else:
+                skipped.append(item)
+        self._charge(name, spent)
+        return kept, skipped
+
+    def share(self, name, texts, max_tokens=None, overhead=0):
+        """Fit every text by giving each an equal share, with unused share passed on to the rest
+
+        Short texts stay whole and long ones are cut, so one large source
+        cannot crowd out the others.
+        """
+        limit = self.remaining if max_tokens is None else min(max_tokens, self.remaining)
+        counts = [count_tokens(text) + overhead for text in texts]
+        allowance = {}
+        pending = sorted(range(len(texts)), key=lambda i: counts[i])
+        left = limit
+        while pending:
+            fair = left // len(pending)
+            index = pending.pop(0)
+            allowance[index] = min(counts[index], fair)
+            left -= allowance[index]
+        fitted = []
+        spent = 0
+        for index, text in enumerate(texts):
+            if allowance[index] <= overhead:
+                continue
+            if counts[index] > allowance[index]:
+                text = truncate_tokens(text, allowance[index] - overhead)
+            fitted.append(text)
+            spent += count_tokens(text) + overhead
+        self._charge(name, spent)
+        return fitted
+
+    def report(self):
+        return {"total": self.total_tokens, "used": self.used, "sections": dict(self.sections)}
@@ -0,0 +1,329 @@
+"""Bounded multi-page crawl of a company website
+
+Starting from the homepage, the crawler discovers same-site pages from
+homepage links, sitemap.xml (and any sitemaps named in robots.txt) and the
+pages it fetches, and honours robots.txt. Candidates are fetched
+concurrently in priority order, so About, Products, Investors and Careers
+pages come before blog posts and legal pages, until the page, byte or time
+budget runs out. Pages whose text has already been seen under another URL
+are dropped. The result is one text record per page for retrieval.
+
+Each page's ETag, Last-Modified and text hash are kept in the research
+cache, so a later crawl of the same site sends conditional requests
+(If-None-Match / If-Modified-Since). A 304 reuses the stored text and links
+instead of downloading and parsing the page again.
+"""
+import hashlib
+import heapq
+import re
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse, urlunparse
+from urllib.robotparser import RobotFileParser
+
+from events import hooks
+from extract import ExtractedPage, fetch_page
+from http_client import get_client
+from metrics import bind
+from research_cache import cache_key, get_cache
+
+MAX_PAGES = 12
+MAX_BYTES = 4_000_000
+MAX_SECONDS = 15
+MAX_DEPTH = 2
+MAX_PAGE_BYTES = 1_000_000
+MAX_PAGE_CHARS = 50_000
+MAX_SITEMAP_BYTES = 1_000_000
+MAX_SITEMAPS = 3
+CRAWL_WORKERS = 4
+ROBOTS_AGENT = "*"
+
+# Path words that usually lead to the content worth reading, and words that
+# mark pages that are never worth a slot in the budget
+PRIORITY_WORDS = {
+    "about": 10, "company": 8, "who": 6, "overview": 6, "mission": 5,
+    "product": 9, "solution": 8, "service": 8, "platform": 7, "feature": 5, "pricing": 5,
+    "investor": 8, "ir": 6, "financial": 5,
+    "career": 7, "job": 6, "team": 6, "leadership": 6, "management": 5,
+    "press": 5, "newsroom": 5, "news": 4, "customer": 4, "industries": 4, "contact": 3,
+}
+LOW_VALUE_WORDS = {
+    "privacy", "terms", "legal", "cookie", "cookies", "login", "signin", "signup", "register", "account",
+    "cart", "checkout", "search", "tag", "tags", "category", "author", "feed", "wp", "cdn",
+}
+SKIP_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".json", ".xml",
+    ".zip", ".gz", ".mp4", ".mp3", ".mov", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+)
+PATH_WORD_RE = re.compile(r"[a-z]+")
+
+
+def site_host(url):
+    """Host of a URL without a leading www., used to keep the crawl on one site"""
+    host = urlparse(url).netloc.lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def normalize_url(url):
+    """Drop fragments, default ports and trailing slashes so one page has one URL"""
+    parsed = urlparse(url)
+    netloc = parsed.netloc.lower()
+    if netloc.endswith(":80") or netloc.endswith(":443"):
+        netloc = netloc.rsplit(":", 1)[0]
+    path = parsed.path.rstrip("/") or "/"
+    return urlunparse((parsed.scheme.lower(), netloc, path, "", parsed.query, ""))
+
+
+def url_priority(url):
+    """Higher is fetched first: homepage, then high-value sections, then short paths"""
+    path = urlparse(url).path.lower()
+    segments = [segment for segment in path.split("/") if segment]
+    if not segments:
+        return 100
+    score = 0
+    for word in PATH_WORD_RE.findall(path):
+        for key, weight in PRIORITY_WORDS.items():
+            if word == key or word.startswith(key) and len(key) > 2:
+                score = max(score, weight)
+    # Section landing pages beat deep pages such as individual blog posts
+    return score - 2 * (len(segments) - 1)
+
+
+def is_crawlable(url, host):
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or site_host(url) != host:
+        return False
+    path = parsed.path.lower()
+    if path.endswith(SKIP_EXTENSIONS):
+        return False
+    return not any(word in LOW_VALUE_WORDS for word in PATH_WORD_RE.findall(path))
+
+
+def content_hash(text):
+    return hashlib.sha1(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+def page_key(url):
+    return cache_key("", url, "", "page")
+
+
+def conditional_headers(stored):
+    """If-None-Match / If-Modified-Since headers for a stored page, or None"""
+    if not stored:
+        return None
+    headers = {}
+    if stored.get("etag"):
+        headers["If-None-Match"] = stored["etag"]
+    if stored.get("last_modified"):
+        headers["If-Modified-Since"] = stored["last_modified"]
+    return headers or None
+
+
+def parse_sitemap(content):
+    """Return (page_urls, sitemap_urls) from sitemap or sitemap index XML"""
+    try:
+        root = ET.fromstring(content)
+    except ET.ParseError:
+        return [], []
+    locs = [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+    if root.tag.endswith("sitemapindex"):
+        return [], locs
+    return locs, []
+
+
+class Crawl:
+    """State of one budgeted crawl; run() returns the page records"""
+
+    def __init__(self, start_url, client=None, max_pages=MAX_PAGES, max_bytes=MAX_BYTES, max_seconds=MAX_SECONDS,
+                 max_depth=MAX_DEPTH, workers=CRAWL_WORKERS, cache=None, conditional=True):
+        self.start_url = normalize_url(start_url)
+        self.host = site_host(start_url)
+        self.client = client or get_client()
+        self.cache = cache
+        self.conditional = conditional
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.max_depth = max_depth
+        self.workers = workers
+        self.robots = None
+        self.pages = []
+        self._queue = []
+        self._seen_urls = set()
+        self._seen_hashes = set()
+        self._counter = 0
+        self.stats = {"pages": 0, "bytes": 0, "fetched": 0, "duplicates": 0, "disallowed": 0, "errors": 0,
+                      "not_modified": 0, "changed": 0, "sitemap_urls": 0, "stopped": None, "elapsed": 0.0}
+
+    def _origin(self):
+        parsed = urlparse(self.start_url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def _load_robots(self, timeout):
+        self.robots = RobotFileParser()
+        sitemaps = []
+        try:
+            response = self.client.get(f"{self._origin()}/robots.txt", timeout=timeout, max_bytes=256_000, retries=0)
+        except Exception:
+            self.robots.parse([])
+            return sitemaps
+        if response.status_code in (401, 403):
+            self.robots.disallow_all = True
+        elif response.status_code >= 400:
+            self.robots.allow_all = True
+        else:
+            lines = response.text.splitlines()
+            self.robots.parse(lines)
+            sitemaps = [line.split(":", 1)[1].strip() for line in lines if line.lower().startswith("sitemap:")]
+        return sitemaps
+
+    def _load_sitemaps(self, sitemaps, timeout):
+        """Page URLs from the sitemaps, following one level of sitemap index"""
+        urls = []
+        queue = list(dict.fromkeys(sitemaps or [f"{self._origin()}/sitemap.xml"]))
+        fetched = 0
+        while queue and fetched < MAX_SITEMAPS:
+            sitemap_url = queue.pop(0)
+            if sitemap_url.lower().endswith(".gz") or site_host(sitemap_url) != self.host:
+                continue
+            fetched += 1
+            try:
+                response = self.client.get(sitemap_url, timeout=timeout, max_bytes=MAX_SITEMAP_BYTES, retries=0)
+            except Exception:
+                continue
+            if response.status_code != 200:
+                continue
+            pages, children = parse_sitemap(response.content)
+            urls.extend(pages)
+            queue.extend(children)
+        return urls
+
+    def _allowed(self, url):
+        if self.robots.can_fetch(ROBOTS_AGENT, url):
+            return True
+        self.stats["disallowed"] += 1
+        return False
+
+    def _enqueue(self, url, depth):
+        if depth > self.max_depth or not is_crawlable(url, self.host):
+            return
+        url = normalize_url(url)
+        if url in self._seen_urls:
+            return
+        self._seen_urls.add(url)
+        if not self._allowed(url):
+            return
+        self._counter += 1
+        heapq.heappush(self._queue, (-url_priority(url), depth, self._counter, url))
+
+    def _fetch(self, url, max_bytes, timeout):
+        """Fetch one page, conditionally when it was stored by an earlier crawl
+
+        Returns (response, page, changed); changed is None for a page never
+        seen before.
+        """
+        cache = self.cache or get_cache()
+        stored = None
+        if self.conditional:
+            cached = cache.get(page_key(url))
+            stored = cached[0] if cached else None
+        response, page = fetch_page(url, client=self.client, timeout=timeout, max_bytes=max_bytes,
+                                    max_chars=MAX_PAGE_CHARS, headers=conditional_headers(stored))
+        if response.status_code == 304 and stored:
+            page = ExtractedPage(response.url or url, stored["title"], stored["text"], stored["links"], 0, False)
+            return response, page, False
+        if page is None:
+            return response, page, None
+        digest = content_hash(page.text)
+        cache.set(page_key(url), "page", {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "hash": digest,
+            "title": page.title,
+            "text": page.text,
+            "links": page.links,
+        })
+        return response, page, (digest != stored["hash"]) if stored else None
+
+    def run(self):
+        started = time.monotonic()
+        deadline = started + self.max_seconds
+
+        def remaining():
+            return max(0.5, deadline - time.monotonic())
+
+        sitemaps = self._load_robots(min(5, remaining()))
+        self._enqueue(self.start_url, 0)
+        sitemap_urls = self._load_sitemaps(sitemaps, min(5, remaining()))
+        self.stats["sitemap_urls"] = len(sitemap_urls)
+        for url in sitemap_urls:
+            self._enqueue(url, 1)
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        inflight = {}
+        try:
+            while self._queue or inflight:
+                # Nothing else starts until the homepage has supplied its links
+                homepage_pending = any(depth == 0 for _, depth in inflight.values())
+                while (self._queue and not homepage_pending and len(inflight) < self.workers
+                       and len(self.pages) + len(inflight) < self.max_pages
+                       and self.stats["bytes"] < self.max_bytes):
+                    _, depth, _, url = heapq.heappop(self._queue)
+                    homepage_pending = depth == 0
+                    max_bytes = min(MAX_PAGE_BYTES, self.max_bytes - self.stats["bytes"])
+                    inflight[executor.submit(bind(self._fetch), url, max_bytes, min(10, remaining()))] = (url, depth)
+
+                if not inflight:
+                    break
+                if time.monotonic() >= deadline:
+                    self.stats["stopped"] = "time"
+                    break
+                done, _ = wait(inflight, timeout=deadline - time.monotonic(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, depth = inflight.pop(future)
+                    self.stats["fetched"] += 1
+                    try:
+                        response, page, changed = future.result()
+                    except Exception:
+                        self.stats["errors"] += 1
+                        continue
+                    if response.status_code == 304:
+                        self.stats["not_modified"] += 1
+                    elif changed:
+                        self.stats["changed"] += 1
+                    self.stats["bytes"] += response.bytes_read
+                    if response.url:
+                        self._seen_urls.add(normalize_url(response.url))
+                        if depth == 0:
+                            # Follow the homepage's redirect to its canonical host
+                            self.host = site_host(response.url)
+                    if page is None:
+                        continue
+                    digest = content_hash(page.text)
+                    if not page.text or digest in self._seen_hashes:
+                        self.stats["duplicates"] += 1
+                        continue
+                    self._seen_hashes.add(digest)
+                    if len(self.pages) < self.max_pages:
+                        self.pages.append({"url": page.url, "title": page.title, "text": page.text})
+                    for link in page.links:
+                        self._enqueue(link, depth + 1)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if self.stats["stopped"] is None:
+            if len(self.pages) >= self.max_pages:
+                self.stats["stopped"] = "pages"
+            elif self.stats["bytes"] >= self.max_bytes:
+                self.stats["stopped"] = "bytes"
+        self.pages.sort(key=lambda page: -url_priority(page["url"]))
+        self.stats["pages"] = len(self.pages)
+        self.stats["elapsed"] = round(time.monotonic() - started, 3)
+        hooks.emit("crawl_finished", url=self.start_url, stats=dict(self.stats))
+        return self.pages
+
+
+def crawl_site(start_url, **budget):
+    """Crawl a site from its homepage and return [{"url", "title", "text"}], most useful pages first"""
+    return Crawl(start_url, **budget).run()
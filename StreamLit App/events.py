@@ -0,0 +1,61 @@
+"""Process-wide event hooks for the research pipeline
+
+The pipeline emits named events with keyword payloads. Anything that needs
+to observe it (the UI, logging, metrics, a worker queue) subscribes without
+the pipeline knowing about it. Handlers run synchronously on the emitting
+thread, which may be a fetcher worker, so they must be quick and must not
+touch Streamlit. A failing handler is logged and never breaks the pipeline.
+
+Events emitted by the pipeline:
+
+    collection_started   company, domain, ticker
+    source_started       company, source
+    source_finished      company, source, elapsed, cache_state
+    source_failed        company, source, elapsed, error
+    source_timeout       company, source, elapsed
+    collection_finished  company, elapsed, sources, timed_out
+    crawl_finished       url, stats
+    job_started          job_id, company
+    job_finished         job_id, company, status, elapsed
+    llm_finished         kind, stats
+    llm_rerouted         model, fallback, reason, health
+"""
+import logging
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+ALL_EVENTS = "*"
+
+
+class EventHooks:
+    """Registry of event handlers called as handler(event, payload)"""
+
+    def __init__(self):
+        self._handlers = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, event, handler):
+        """Register a handler for an event (or "*" for every event); returns an unsubscribe function"""
+        with self._lock:
+            self._handlers[event].append(handler)
+
+        def unsubscribe():
+            with self._lock:
+                if handler in self._handlers[event]:
+                    self._handlers[event].remove(handler)
+
+        return unsubscribe
+
+    def emit(self, event, **payload):
+        with self._lock:
+            handlers = self._handlers.get(event, []) + self._handlers.get(ALL_EVENTS, [])
+        for handler in handlers:
+            try:
+                handler(event, payload)
+            except Exception:
+                logger.exception("Event handler for %s failed", event)
+
+
+hooks = EventHooks()
@@ -0,0 +1,299 @@
+"""Streaming HTML-to-text extraction with boilerplate removal
+
+A page is read from the network in chunks and fed straight into an
+incremental parser, so no full body string or document tree is ever built.
+Reading stops at a byte cap, or as soon as enough text has been collected,
+which bounds memory and CPU per page whatever the page size. Navigation,
+headers, footers, cookie banners and similar chrome are recognised from
+their tags, ARIA roles and class/id names and dropped while parsing, before
+any text is produced. Links are collected from the whole page, menus
+included, since that is where most of a site's sections are linked from,
+and so are the page's icons (link rel=icon / apple-touch-icon and
+og:image) for the logo finder.
+
+The parsing backends are the incremental ones from serp_parser: lxml when
+installed, else the standard library's html.parser.
+benchmarks/bench_extract.py compares them with the old full-parse scrape.
+"""
+import codecs
+import re
+import time
+from urllib.parse import urljoin
+
+from http_client import get_client, header_encoding
+from metrics import record_parse
+from serp_parser import LxmlTarget, StdlibAdapter, etree
+
+DEFAULT_MAX_BYTES = 1_000_000
+DEFAULT_MAX_CHARS = 50_000
+MAX_LINKS = 500
+MAX_ICONS = 20
+SNIFF_BYTES = 2048
+
+SKIP_TAGS = frozenset(["script", "style", "noscript", "template", "svg", "canvas", "iframe", "object"])
+BOILERPLATE_TAGS = frozenset(["nav", "footer", "aside", "form", "button", "select", "dialog", "menu"])
+BOILERPLATE_ROLES = frozenset(["navigation", "banner", "contentinfo", "dialog", "alertdialog", "menu", "menubar",
+                               "search", "complementary"])
+# Words that mark chrome wherever they appear as a part of a class or id
+BOILERPLATE_RE = re.compile(
+    r"(?:^|[_-])(?:nav|navbar|navigation|menu|megamenu|footer|breadcrumbs?|sidebar|cookies?|consent|gdpr|"
+    r"onetrust|cookiebot|newsletter|skip-link)(?:$|[_-])",
+    re.IGNORECASE,
+)
+# Words that also name content ("hero-banner", "share-price", "social-impact"), so they only count as a
+# whole class or id, or in compounds that are always chrome
+BOILERPLATE_TOKEN_RE = re.compile(
+    r"(?:share|sharing|social|subscribe|popup|modal|overlay|(?:share|sharing|social)[_-](?:buttons?|bar|links|"
+    r"icons|tools|widget)|social[_-]share|(?:promo|announcement|alert)[_-]banner)",
+    re.IGNORECASE,
+)
+# Containers that are never dropped on class or id alone: pages often put
+# flags such as "has-cookie-banner" on them
+CONTENT_TAGS = frozenset(["html", "body", "main", "article"])
+VOID_TAGS = frozenset(["area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+                       "source", "track", "wbr"])
+BLOCK_TAGS = frozenset(["p", "div", "section", "article", "main", "li", "ul", "ol", "tr", "table", "blockquote",
+                        "h1", "h2", "h3", "h4", "h5", "h6", "dd", "dt", "pre", "figcaption", "address"])
+WHITESPACE_RE = re.compile(r"\s+")
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([a-zA-Z0-9_-]+)""", re.IGNORECASE)
+
+
+class ExtractedPage:
+    """Text, title and links extracted from one page"""
+
+    def __init__(self, url, title, text, links, bytes_read, truncated, parse_time=0.0, icons=None):
+        self.url = url
+        self.title = title
+        self.text = text
+        self.links = links
+        self.icons = icons or []
+        self.bytes_read = bytes_read
+        self.truncated = truncated
+        self.parse_time = parse_time
+
+    def __repr__(self):
+        return f"<ExtractedPage {self.url} {len(self.text)} chars>"
+
+
+def is_boilerplate(tag, attrs, in_content):
+    """True for elements whose whole subtree is page chrome rather than content"""
+    if tag in BOILERPLATE_TAGS or (tag == "header" and not in_content):
+        return True
+    if (attrs.get("role") or "").lower() in BOILERPLATE_ROLES:
+        return True
+    if attrs.get("aria-hidden") == "true" or "hidden" in attrs:
+        return True
+    if tag in CONTENT_TAGS:
+        return False
+    tokens = (attrs.get("class") or "").split()
+    if attrs.get("id"):
+        tokens.append(attrs["id"])
+    return any(BOILERPLATE_RE.search(token) or BOILERPLATE_TOKEN_RE.fullmatch(token) for token in tokens)
+
+
+class _TextBuilder:
+    """Collects visible content text from start/end/data events, skipping boilerplate subtrees"""
+
+    def __init__(self, base_url="", max_chars=DEFAULT_MAX_CHARS, max_links=MAX_LINKS):
+        self.base_url = base_url
+        self.max_chars = max_chars
+        self.max_links = max_links
+        self.links = []
+        self.icons = []
+        self.full = False
+        self._parts = []
+        self._chars = 0
+        self._title_parts = []
+        self._in_title = False
+        self._stack = []
+        self._skip_at = None
+        self._content_depth = 0
+
+    def start(self, tag, attrs):
+        if tag == "a" and len(self.links) < self.max_links:
+            href = attrs.get("href")
+            if href and not href.startswith(("#", "javascript:", "mailto:", "tel:")):
+                self.links.append(urljoin(self.base_url, href))
+        if tag in ("link", "meta") and len(self.icons) < MAX_ICONS:
+            self._icon(tag, attrs)
+        if tag in VOID_TAGS:
+            if tag == "br" and self._skip_at is None:
+                self._parts.append("\n")
+            return
+        if tag == "title" and self._skip_at is None and not self._title_parts:
+            self._in_title = True
+        if self._skip_at is None and (tag in SKIP_TAGS or is_boilerplate(tag, attrs, self._content_depth > 0)):
+            self._skip_at = len(self._stack)
+        self._stack.append(tag)
+        if tag in ("main", "article"):
+            self._content_depth += 1
+        if tag in BLOCK_TAGS and self._skip_at is None:
+            self._parts.append("\n")
+
+    def _icon(self, tag, attrs):
+        """Record (kind, url, sizes) for icon links and og:image"""
+        if tag == "link":
+            rel = (attrs.get("rel") or "").lower().split()
+            href = attrs.get("href")
+            touch = any(r.startswith("apple-touch-icon") for r in rel)
+            if href and (touch or "icon" in rel):
+                kind = "apple-touch-icon" if touch else "icon"
+                self.icons.append((kind, urljoin(self.base_url, href), attrs.get("sizes") or ""))
+        elif (attrs.get("property") or attrs.get("name") or "").lower() in ("og:image", "og:image:url"):
+            if attrs.get("content"):
+                self.icons.append(("og:image", urljoin(self.base_url, attrs["content"]), ""))
+
+    def end(self, tag):
+        if tag in VOID_TAGS:
+            return
+        if tag == "title":
+            self._in_title = False
+        # Unclosed children (e.g. <p> or <li> without end tags) close with their parent
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index] == tag:
+                break
+        else:
+            return
+        for closed in self._stack[index:]:
+            if closed in ("main", "article"):
+                self._content_depth -= 1
+        del self._stack[index:]
+        if self._skip_at is not None and self._skip_at >= index:
+            # Keep the text on either side of a dropped element apart
+            self._skip_at = None
+            self._parts.append("\n")
+        elif tag in BLOCK_TAGS and self._skip_at is None:
+            self._parts.append("\n")
+
+    def data(self, text):
+        if self._in_title:
+            self._title_parts.append(text)
+            return
+        if self._skip_at is not None or self.full or not text:
+            return
+        text = WHITESPACE_RE.sub(" ", text)
+        self._parts.append(text)
+        self._chars += len(text)
+        if self._chars >= self.max_chars:
+            self.full = True
+
+    def close(self):
+        lines = (" ".join(line.split()) for line in "".join(self._parts).split("\n"))
+        text = "\n".join(line for line in lines if line)
+        title = " ".join(" ".join(self._title_parts).split())
+        return title, text[:self.max_chars]
+
+
+class _StdlibFeed:
+    def __init__(self, builder):
+        self.parser = StdlibAdapter(builder)
+
+    def feed(self, text):
+        self.parser.feed(text)
+
+    def close(self):
+        self.parser.close()
+
+
+class _LxmlFeed:
+    def __init__(self, builder):
+        self.parser = etree.HTMLParser(target=LxmlTarget(builder), recover=True)
+
+    def feed(self, text):
+        self.parser.feed(text)
+
+    def close(self):
+        try:
+            self.parser.close()
+        except etree.XMLSyntaxError:
+            # Nothing was fed, e.g. an empty body
+            pass
+
+
+BACKENDS = {"stdlib": _StdlibFeed}
+if etree is not None:
+    BACKENDS["lxml"] = _LxmlFeed
+DEFAULT_BACKEND = "lxml" if "lxml" in BACKENDS else "stdlib"
+
+
+def sniff_encoding(head, default="utf-8"):
+    """Charset from a byte order mark or a <meta charset> near the start of the body"""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    match = META_CHARSET_RE.search(head[:SNIFF_BYTES])
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode("ascii")).name
+        except LookupError:
+            pass
+    return default
+
+
+def extract_stream(chunks, url="", encoding=None, max_bytes=DEFAULT_MAX_BYTES, max_chars=DEFAULT_MAX_CHARS,
+                   backend=None):
+    """Extract an ExtractedPage from an iterable of body byte chunks
+
+    Stops consuming chunks once max_bytes have been read or max_chars of
+    text have been collected. encoding, when None, is sniffed from the
+    first chunk. Time spent decoding and parsing, as opposed to waiting for
+    chunks, is reported as parse_time.
+    """
+    builder = _TextBuilder(url, max_chars=max_chars)
+    parser = BACKENDS[backend or DEFAULT_BACKEND](builder)
+    decoder = None
+    bytes_read = 0
+    truncated = False
+    parse_time = 0.0
+
+    for chunk in chunks:
+        if max_bytes and bytes_read + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - bytes_read]
+            truncated = True
+        bytes_read += len(chunk)
+        parse_started = time.perf_counter()
+        if decoder is None:
+            name = encoding or sniff_encoding(chunk)
+            try:
+                decoder = codecs.getincrementaldecoder(name)(errors="replace")
+            except LookupError:
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        parser.feed(decoder.decode(chunk))
+        parse_time += time.perf_counter() - parse_started
+        if builder.full:
+            truncated = True
+        if truncated:
+            break
+
+    parse_started = time.perf_counter()
+    if decoder is not None:
+        parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    title, text = builder.close()
+    parse_time += time.perf_counter() - parse_started
+    record_parse(parse_time)
+    return ExtractedPage(url, title, text, builder.links, bytes_read, truncated, parse_time, builder.icons)
+
+
+def extract_html(html, url="", max_bytes=DEFAULT_MAX_BYTES, max_chars=DEFAULT_MAX_CHARS, backend=None):
+    """Extract an ExtractedPage from a complete document given as str or bytes"""
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+        encoding = "utf-8"
+    else:
+        encoding = None
+    chunks = (html[i:i + 65536] for i in range(0, len(html), 65536))
+    return extract_stream(chunks, url, encoding, max_bytes=max_bytes, max_chars=max_chars, backend=backend)
+
+
+def fetch_page(url, client=None, timeout=10, max_bytes=DEFAULT_MAX_BYTES, max_chars=DEFAULT_MAX_CHARS,
+               backend=None, headers=None):
+    """Stream a page and extract it; returns (response, ExtractedPage or None for non-HTML/non-200)"""
+    with (client or get_client()).stream(url, headers=headers, timeout=timeout, max_bytes=max_bytes,
+                                         retries=0) as response:
+        content_type = response.headers.get("Content-Type", "text/html").lower()
+        if response.status_code != 200 or "html" not in content_type:
+            return response, None
+        encoding = header_encoding(response.headers, default=None)
+        page = extract_stream(response.iter_content(), response.url or url, encoding, max_bytes=max_bytes,
+                              max_chars=max_chars, backend=backend)
+    return response, page
@@ -0,0 +1,378 @@
+"""Structured company facts, and answers to factual questions without the LLM
+
+extract_facts builds a small typed table when a company is researched:
+headcount, revenue, market cap, sector, industry, headquarters, founding
+year, website, ticker, share price and social profiles. Each fact keeps its
+provenance: the source it came from, the field or the sentence it was read
+from, and the page URL for website text. Yahoo Finance fields are preferred
+over LinkedIn snippets, and LinkedIn over phrases found on the website.
+
+answer_from_facts recognises whole lookup questions ("how many employees
+do they have?", "where is it headquartered?", "what is their revenue and
+market cap?"). When every clause of the question is such a lookup and the
+table holds the facts, it returns the answer straight away. Anything else,
+including a question with a second, open-ended part, returns None and goes
+to the LLM as before.
+"""
+import re
+from datetime import date
+
+YAHOO = "Yahoo Finance"
+LINKEDIN = "LinkedIn"
+TWITTER = "Twitter"
+WEBSITE = "Company website"
+EVIDENCE_CHARS = 80
+
+# name -> (label, type, sentence template for a single-company answer)
+FACTS = {
+    "employees": ("Employees", "count", "{company} has {value} employees."),
+    "revenue": ("Revenue", "money", "{company}'s revenue is {value}."),
+    "market_cap": ("Market cap", "money", "{company}'s market capitalisation is {value}."),
+    "sector": ("Sector", "text", "{company} is in the {value} sector."),
+    "industry": ("Industry", "text", "{company} is in the {value} industry."),
+    "headquarters": ("Headquarters", "text", "{company} is headquartered in {value}."),
+    "founded": ("Founded", "year", "{company} was founded in {value}."),
+    "website": ("Website", "url", "{company}'s website is {value}."),
+    "ticker": ("Ticker", "text", "{company} trades as {value}."),
+    "price": ("Share price", "price", "{company}'s share price is {value}."),
+    "twitter": ("Twitter", "text", "{company} is on Twitter as {value}."),
+    "linkedin": ("LinkedIn", "url", "{company}'s LinkedIn page is {value}."),
+}
+# Asked-for fact -> the closest one to answer with when it is missing
+STAND_INS = {"sector": "industry", "industry": "sector"}
+
+CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥", "INR": "₹", "CNY": "¥"}
+
+LINKEDIN_PATTERNS = {
+    "employees": re.compile(r"(?:company size|employees)\s*:?\s*([\d,]+\s*(?:-\s*[\d,]+|\+))\s*employees?", re.I),
+    "headquarters": re.compile(r"(?i:headquarters)\s*:?\s*([A-Z][^.;|·\n]{2,60})"),
+    "industry": re.compile(r"(?i:industry)\s*:?\s*([A-Z][^.;|·\n]{2,60})"),
+    "founded": re.compile(r"founded\s*:?\s*(?:in\s+)?((?:18|19|20)\d\d)\b", re.I),
+}
+WEBSITE_PATTERNS = {
+    "founded": re.compile(r"\b(?:founded|established|incorporated)\s+in\s+((?:18|19|20)\d\d)\b", re.I),
+    "headquarters": re.compile(r"\b(?:headquartered|headquarters|based)\s+in\s+([A-Z][\w'-]+(?:[ ,]+[A-Z][\w'-]+){0,3})"),
+    "employees": re.compile(r"\b((?:over|more than|nearly|approximately|about|around)\s+)?(\d{1,3}(?:,\d{3})+|\d{2,6})\+?"
+                            r"\s+(?:employees|team members|staff members|people worldwide)\b", re.I),
+}
+
+# Lookup questions are recognised by their whole form, not by keywords, so
+# "who founded it?" or "what does their website say about pricing?" still
+# go to the LLM. {subject} is the company ("they", "Acme", "the company"),
+# {owner} an optional possessive before a noun ("their", "Acme's").
+SUBJECT = (r"(?:(?:it|they|them)(?: each| all| both)?|(?:(?!(?:in|of|for|at|about|with|by|from|to|on|and|or|"
+           r"their|its|they|what|which|who|how|do|does|did|is|are|was|were|have|has)\b)[\w&.'-]+ ?){1,4})")
+OWNER = rf"(?:(?:the|their|its|this company's|the company's|{SUBJECT}'s|{SUBJECT}) )?"
+ASKING = (r"(?:(?:please|so|ok|okay|(?:can|could) you tell me|do you know|tell me|i want to know|"
+          r"i'd like to know) )*")
+NOUN_QUESTION = (r"(?:(?:what|whats|what's|what is|what are|what was|tell me|give me|show me|and|what about|"
+                 r"how about) )?{owner}(?:current |latest |annual |total |official |full )?(?:{nouns})"
+                 r"(?: (?:of|for|at) {subject})?")
+
+# fact -> (nouns asked for as "what is their <noun>?", other whole question forms)
+INTENTS = {
+    "employees": (
+        r"headcount|employees|employee count|number of (?:employees|staff|people)|staff count|workforce(?: size)?|"
+        r"size of (?:the|their|its) workforce|company size|team size",
+        [r"how many (?:employees|people|staff|staff members|workers|team members)(?: (?:does|do) {subject} "
+         r"(?:have|employ)| (?:work|are employed) (?:at|for|by) {subject}| work there| are there)?",
+         r"how (?:big|large) is {owner}(?:workforce|team|staff)"],
+    ),
+    "revenue": (
+        r"revenues?|sales|turnover|top line",
+        [r"how much (?:revenue|money|sales) (?:does|do) {subject} (?:make|generate|earn|bring in|have)",
+         r"how much (?:does|do) {subject} (?:make|earn)(?: a year| annually)?"],
+    ),
+    "market_cap": (
+        r"market cap|market capitali[sz]ation|market value|valuation",
+        [r"how much (?:is|are) {subject} worth", r"what (?:is|are) {subject} worth"],
+    ),
+    "price": (
+        r"(?:stock|share) price|price per share",
+        [r"what (?:is|are) {owner}(?:stock|shares) trading at", r"how much (?:is|are) {owner}(?:stock|shares)"],
+    ),
+    "ticker": (
+        r"ticker(?: symbol)?|stock (?:symbol|ticker)|symbol",
+        [r"what (?:does|do) {subject} trade (?:as|under)", r"what (?:is|are) {subject} traded as"],
+    ),
+    "sector": (
+        r"sector",
+        [r"(?:what|which) sector (?:is|are) {subject} in",
+         r"(?:what|which) sector (?:does|do) {subject} (?:operate|belong|work|compete) in"],
+    ),
+    "industry": (
+        r"industry|line of business",
+        [r"(?:what|which) (?:industry|business|line of business) (?:is|are) {subject} in",
+         r"(?:what|which) industry (?:does|do) {subject} (?:operate|belong|work|compete) in"],
+    ),
+    "headquarters": (
+        r"headquarters(?: location)?|hq(?: location)?|head office|main office|location",
+        [r"where (?:is|are) {subject}(?: headquartered| based| located)?",
+         r"where (?:is|are) {owner}(?:headquarters|hq|head office|main office)(?: located)?",
+         r"(?:in )?(?:which|what) (?:city|country) (?:is|are) {subject} (?:headquartered|based)(?: in)?"],
+    ),
+    "founded": (
+        r"founding (?:year|date)|year (?:founded|of founding)",
+        [r"when (?:was|were) {subject} (?:founded|established|incorporated|started|formed)",
+         r"when (?:did|do) {subject} (?:start|begin|get started)",
+         r"(?:what|which) year (?:was|were) {subject} (?:founded|established|incorporated|started|formed)",
+         r"how old (?:is|are) {subject}"],
+    ),
+    "website": (
+        r"website|web site|homepage|home page|url|web address",
+        [r"where (?:can i find|is) {owner}(?:website|homepage|site)", r"(?:does|do) {subject} have a (?:website|homepage)"],
+    ),
+    "twitter": (
+        r"twitter(?: handle| account| profile)?|x handle",
+        [r"(?:is|are) {subject} on (?:twitter|x)"],
+    ),
+    "linkedin": (
+        r"linkedin(?: page| profile| url)?",
+        [r"(?:is|are) {subject} on linkedin"],
+    ),
+}
+# Comparison-only forms: "who has more employees?", "which one is worth more?"
+COMPARISON_FORMS = {
+    "market_cap": [r"(?:who|which(?: company| one| of them| of the companies| firm)?) (?:is|are) worth "
+                   r"(?:more|the most|less|the least)"],
+}
+COMPARISON_QUESTIONS = [
+    r"(?:who|which(?: company| one| of them| of the companies| firm)?) (?:has|have|had|reports?|makes?) (?:the )?"
+    r"(?:more|most|larger|largest|bigger|biggest|higher|highest|greater|greatest|fewer|fewest|less|least|smaller|"
+    r"smallest|lower|lowest) (?:{nouns})",
+    r"(?:who|which(?: company| one| of them| of the companies| firm)?) (?:has|have|had) (?:the )?(?:{nouns})",
+    r"compare {owner}(?:{nouns})",
+]
+# A question is split into clauses; every clause must be a lookup
+CLAUSE_SPLIT_RE = re.compile(r"\s*(?:[?!;,]|\.(?:\s|$)|\b(?:and also|as well as|and|also|plus)\b)\s*")
+MAX_QUESTION_WORDS = 16
+
+
+def _intent_pattern(name, comparing):
+    nouns, forms = INTENTS[name]
+    if comparing:
+        forms = forms + COMPARISON_FORMS.get(name, []) + COMPARISON_QUESTIONS
+    fields = {"subject": SUBJECT, "owner": OWNER, "nouns": nouns}
+    alternatives = [NOUN_QUESTION.format(**fields)] + [form.format(**fields) for form in forms]
+    return re.compile(rf"{ASKING}(?:{'|'.join(alternatives)})(?: please)?")
+
+
+INTENT_RES = {name: _intent_pattern(name, False) for name in INTENTS}
+COMPARISON_INTENT_RES = {name: _intent_pattern(name, True) for name in INTENTS}
+HIGHEST_RE = re.compile(r"\b(more|most|larger|largest|bigger|biggest|higher|highest|greater|greatest)\b")
+LOWEST_RE = re.compile(r"\b(fewer|fewest|less|least|smaller|smallest|lower|lowest)\b")
+
+
+def _evidence(text, match):
+    """The match with up to EVIDENCE_CHARS of context either side, cut at whole words"""
+    start = max(0, match.start() - EVIDENCE_CHARS)
+    end = match.end() + EVIDENCE_CHARS
+    words = text[start:end].split()
+    if start > 0 and not text[start - 1].isspace():
+        words = words[1:]
+    if end < len(text) and not text[end].isspace():
+        words = words[:-1]
+    return " ".join(words)
+
+
+def _count(text):
+    return int(text.replace(",", "").rstrip("+"))
+
+
+def _fact(value, kind, source, field=None, evidence=None, url=None, **extra):
+    return dict({"value": value, "type": kind, "source": source, "field": field, "evidence": evidence,
+                 "url": url}, **extra)
+
+
+def yahoo_facts(info):
+    """Facts from a Yahoo Finance info dict"""
+    facts = {}
+    currency = info.get("financialCurrency") or info.get("currency") or "USD"
+    if info.get("fullTimeEmployees"):
+        facts["employees"] = _fact(int(info["fullTimeEmployees"]), "count", YAHOO, "fullTimeEmployees")
+    if info.get("totalRevenue"):
+        facts["revenue"] = _fact(float(info["totalRevenue"]), "money", YAHOO, "totalRevenue", currency=currency,
+                                 note="trailing twelve months")
+    if info.get("marketCap"):
+        facts["market_cap"] = _fact(float(info["marketCap"]), "money", YAHOO, "marketCap",
+                                    currency=info.get("currency") or "USD")
+    price = info.get("currentPrice") or info.get("regularMarketPrice")
+    if price:
+        field = "currentPrice" if info.get("currentPrice") else "regularMarketPrice"
+        facts["price"] = _fact(float(price), "price", YAHOO, field, currency=info.get("currency") or "USD")
+    for name, field in (("sector", "sector"), ("industry", "industry"), ("website", "website")):
+        if info.get(field):
+            facts[name] = _fact(str(info[field]), FACTS[name][1], YAHOO, field)
+    place = ", ".join(str(info[field]) for field in ("city", "state", "country") if info.get(field))
+    if place:
+        facts["headquarters"] = _fact(place, "text", YAHOO, "city, state, country")
+    if info.get("symbol"):
+        exchange = info.get("fullExchangeName") or info.get("exchange")
+        facts["ticker"] = _fact(f"{info['symbol']} ({exchange})" if exchange else str(info["symbol"]), "text", YAHOO,
+                                "symbol")
+    return facts
+
+
+def text_facts(text, patterns, source, url=None):
+    """Facts read from free text with the given {name: pattern}"""
+    facts = {}
+    for name, pattern in patterns.items():
+        for match in pattern.finditer(text):
+            raw = match.group(match.lastindex).strip(" ,")
+            if name == "founded":
+                if not 1800 <= int(raw) <= date.today().year:
+                    continue
+                value = int(raw)
+            elif name == "employees":
+                if not re.fullmatch(r"[\d,]+", raw):
+                    # A size bracket such as "1,001-5,000" or "10,001+"
+                    value = " ".join(raw.split())
+                elif _count(raw) < 10:
+                    continue
+                else:
+                    qualifier = match.group(1) if match.lastindex > 1 else None
+                    value = f"{qualifier.strip()} {_count(raw):,}" if qualifier else _count(raw)
+            else:
+                value = raw
+            facts[name] = _fact(value, "year" if name == "founded" else FACTS[name][1], source,
+                                evidence=_evidence(text, match), url=url)
+            break
+    return facts
+
+
+def extract_facts(data):
+    """{fact name: fact} from collected company data, best source first"""
+    facts = {}
+
+    def add(found):
+        for name, fact in found.items():
+            facts.setdefault(name, fact)
+
+    financial = data.get("financial")
+    if financial:
+        add(yahoo_facts(financial["info"]))
+    linkedin = data.get("linkedin") or ""
+    add(text_facts(linkedin, LINKEDIN_PATTERNS, LINKEDIN))
+    url_match = re.search(r"LinkedIn Company URL: (\S+)", linkedin)
+    if url_match:
+        add({"linkedin": _fact(url_match.group(1), "url", LINKEDIN)})
+    handle_match = re.search(r"Twitter Handle: (@\S+)", data.get("twitter") or "")
+    if handle_match:
+        add({"twitter": _fact(handle_match.group(1), "text", TWITTER)})
+    if data.get("website_url"):
+        add({"website": _fact(data["website_url"], "url", WEBSITE, url=data["website_url"])})
+    for page in data.get("website_pages", []):
+        add(text_facts(page["text"], WEBSITE_PATTERNS, WEBSITE, url=page["url"]))
+    return facts
+
+
+def format_value(fact):
+    """A fact's value as text, e.g. "$3.4 billion" or "5,000" """
+    value = fact["value"]
+    if fact["type"] == "money":
+        currency = fact.get("currency") or "USD"
+        symbol = CURRENCY_SYMBOLS.get(currency, f"{currency} ")
+        for size, word in ((1e12, "trillion"), (1e9, "billion"), (1e6, "million")):
+            if abs(value) >= size:
+                return f"{symbol}{value / size:,.1f} {word}"
+        return f"{symbol}{value:,.0f}"
+    if fact["type"] == "price":
+        currency = fact.get("currency") or "USD"
+        return f"{CURRENCY_SYMBOLS.get(currency, currency + ' ')}{value:,.2f}"
+    if fact["type"] == "count" and isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+
+def format_provenance(fact):
+    """Where a fact came from, for the line under an answer"""
+    detail = fact["source"]
+    if fact.get("field"):
+        detail += f" ({fact['field']}"
+        detail += f", {fact['note']})" if fact.get("note") else ")"
+    if fact.get("url") and fact["type"] != "url":
+        detail += f", {fact['url']}"
+    if fact.get("evidence"):
+        detail += f": “{fact['evidence']}”"
+    return detail
+
+
+def match_intents(question, comparing=False):
+    """Names of the facts a question asks for, or [] when any part of it needs more than a lookup"""
+    text = " ".join(question.lower().replace("’", "'").split())
+    if len(text.split()) > MAX_QUESTION_WORDS:
+        return []
+    patterns = COMPARISON_INTENT_RES if comparing else INTENT_RES
+    names = []
+    for clause in CLAUSE_SPLIT_RE.split(text):
+        if not clause:
+            continue
+        name = next((name for name, pattern in patterns.items() if pattern.fullmatch(clause)), None)
+        if name is None:
+            # "and what products do they sell?", "who founded it?": leave the whole question to the LLM
+            return []
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def _lookup(facts, name):
+    if not facts:
+        return None, None
+    if name in facts:
+        return name, facts[name]
+    stand_in = STAND_INS.get(name)
+    if stand_in in facts:
+        return stand_in, facts[stand_in]
+    return None, None
+
+
+def answer_from_facts(company_name, question, facts):
+    """Answer a factual question from the fact table, or None to leave it to the LLM"""
+    names = match_intents(question)
+    if not names:
+        return None
+    answers = []
+    for name in names:
+        name, fact = _lookup(facts, name)
+        if fact is None:
+            return None
+        answers.append((name, fact))
+
+    lines = []
+    for name, fact in answers:
+        sentence = FACTS[name][2].format(company=company_name, value=f"**{format_value(fact)}**")
+        lines.append(f"{sentence}\n\n_Source: {format_provenance(fact)}_")
+    return "\n\n".join(lines)
+
+
+def answer_comparison_from_facts(companies, question):
+    """Answer a factual question about [(company name, company data), ...], or None to leave it to the LLM"""
+    names = match_intents(question, comparing=True)
+    if not names:
+        return None
+    text = question.lower()
+    sections = []
+    for name in names:
+        rows = []
+        for company_name, company_data in companies:
+            found, fact = _lookup(company_data.get("facts"), name)
+            if fact is None:
+                return None
+            rows.append((company_name, found, fact))
+        label = FACTS[rows[0][1]][0]
+        lines = [f"**{label}**"]
+        lines += [f"- {company_name}: {format_value(fact)} — _{format_provenance(fact)}_"
+                  for company_name, _, fact in rows]
+
+        numeric = [(company_name, fact) for company_name, _, fact in rows
+                   if fact["type"] in ("count", "money", "price") and isinstance(fact["value"], (int, float))]
+        currencies = {fact.get("currency") for _, fact in numeric}
+        if len(numeric) == len(rows) and len(currencies) == 1 and (HIGHEST_RE.search(text) or LOWEST_RE.search(text)):
+            lowest = LOWEST_RE.search(text) and not HIGHEST_RE.search(text)
+            best = (min if lowest else max)(fact["value"] for _, fact in numeric)
+            leaders = [(company_name, fact) for company_name, fact in numeric if fact["value"] == best]
+            lines.append(f"\n{'Lowest' if lowest else 'Highest'}: {', '.join(name for name, _ in leaders)} "
+                         f"({format_value(leaders[0][1])})")
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections)
@@ -0,0 +1,350 @@
+"""Shared HTTP client used by every fetcher
+
+One client is shared by the whole process. It keeps a pooled keep-alive
+session per host, caps the number of in-flight requests per host, retries
+429/5xx responses and connection failures with jittered exponential backoff,
+and reads bodies as a stream that stops at a byte cap. `stream()` hands the
+body to the caller chunk by chunk instead, so a consumer can stop reading as
+soon as it has what it needs.
+
+The network layer is a pluggable transport, so the client can be pointed at
+a local stub server or a fake transport without touching the fetchers.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from metrics import record_request
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+DEFAULT_TIMEOUT = 10
+DEFAULT_MAX_BYTES = 2_000_000
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CHUNK_SIZE = 16384
+
+
+class TransportError(Exception):
+    """Raised by a transport when no response could be obtained
+
+    retryable is False for failures another attempt cannot fix, such as an
+    invalid URL or a redirect loop.
+    """
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+# Failures worth another attempt; any other requests error fails at once
+RETRYABLE_REQUEST_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+def _transport_error(error):
+    return TransportError(str(error), retryable=isinstance(error, RETRYABLE_REQUEST_ERRORS))
+
+
+def header_encoding(headers, default="utf-8"):
+    """Charset named in a Content-Type header, or default"""
+    content_type = headers.get("Content-Type", "")
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "charset" and value:
+            return value.strip("\"'")
+    return default
+
+
+class HttpResponse:
+    """A fully read (possibly truncated) HTTP response"""
+
+    def __init__(self, url, status_code, headers=None, content=b"", truncated=False, elapsed=0.0):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.content = content
+        self.truncated = truncated
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return 200 <= self.status_code < 400
+
+    @property
+    def encoding(self):
+        return header_encoding(self.headers)
+
+    @property
+    def text(self):
+        try:
+            return self.content.decode(self.encoding, errors="replace")
+        except LookupError:
+            return self.content.decode("utf-8", errors="replace")
+
+    def __repr__(self):
+        return f"<HttpResponse [{self.status_code}] {self.url}>"
+
+
+class StreamedResponse:
+    """An HTTP response whose body is read on demand, up to a byte cap"""
+
+    def __init__(self, url, status_code, headers=None, chunks=(), max_bytes=None, on_close=None, elapsed=0.0):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.max_bytes = max_bytes
+        self.elapsed = elapsed
+        self.bytes_read = 0
+        self.truncated = False
+        self._chunks = chunks
+        self._on_close = on_close
+
+    @classmethod
+    def from_response(cls, response, max_bytes=None):
+        """Wrap an already read HttpResponse, e.g. from a transport without streaming"""
+        content = response.content
+        chunks = (content[i:i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE))
+        return cls(response.url, response.status_code, response.headers, chunks, max_bytes, elapsed=response.elapsed)
+
+    @property
+    def ok(self):
+        return 200 <= self.status_code < 400
+
+    @property
+    def encoding(self):
+        return header_encoding(self.headers)
+
+    def iter_content(self):
+        """Yield body chunks until the body or the byte cap runs out"""
+        for chunk in self._chunks:
+            if self.max_bytes and self.bytes_read + len(chunk) >= self.max_bytes:
+                chunk = chunk[:self.max_bytes - self.bytes_read]
+                self.truncated = True
+            self.bytes_read += len(chunk)
+            if chunk:
+                yield chunk
+            if self.truncated:
+                return
+
+    def close(self):
+        if self._on_close is not None:
+            self._on_close()
+            self._on_close = None
+
+    def __repr__(self):
+        return f"<StreamedResponse [{self.status_code}] {self.url}>"
+
+
+class RequestsTransport:
+    """Transport backed by one pooled requests.Session per host"""
+
+    def __init__(self, pool_size=4):
+        self.pool_size = pool_size
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _session(self, host):
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+            return session
+
+    def send(self, method, url, headers, timeout, max_bytes):
+        session = self._session(urlparse(url).netloc)
+        started = time.monotonic()
+        try:
+            with session.request(method, url, headers=headers, timeout=timeout, stream=True) as response:
+                chunks = []
+                received = 0
+                truncated = False
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    chunks.append(chunk)
+                    received += len(chunk)
+                    if max_bytes and received >= max_bytes:
+                        truncated = True
+                        break
+                content = b"".join(chunks)
+                if max_bytes:
+                    content = content[:max_bytes]
+                return HttpResponse(response.url, response.status_code, response.headers, content,
+                                    truncated=truncated, elapsed=time.monotonic() - started)
+        except requests.RequestException as e:
+            raise _transport_error(e) from e
+
+    def open(self, method, url, headers, timeout, max_bytes):
+        """Start a request and return a StreamedResponse; the caller must close it"""
+        session = self._session(urlparse(url).netloc)
+        started = time.monotonic()
+        try:
+            response = session.request(method, url, headers=headers, timeout=timeout, stream=True)
+        except requests.RequestException as e:
+            raise _transport_error(e) from e
+
+        def chunks():
+            try:
+                yield from response.iter_content(CHUNK_SIZE)
+            except requests.RequestException as e:
+                raise _transport_error(e) from e
+
+        return StreamedResponse(response.url, response.status_code, response.headers, chunks(), max_bytes,
+                                on_close=response.close, elapsed=time.monotonic() - started)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+class HttpClient:
+    """Pooled HTTP client with per-host concurrency limits and retries"""
+
+    def __init__(self, transport=None, headers=None, timeout=DEFAULT_TIMEOUT, max_bytes=DEFAULT_MAX_BYTES,
+                 max_per_host=4, retries=2, backoff=0.5, max_backoff=8.0):
+        self.transport = transport or RequestsTransport(pool_size=max_per_host)
+        self.headers = dict(DEFAULT_HEADERS if headers is None else headers)
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, host):
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.max_per_host)
+                self._host_slots[host] = slot
+            return slot
+
+    def _delay(self, attempt, response=None):
+        """Full-jitter exponential backoff, honouring Retry-After when given"""
+        if response is not None and "Retry-After" in response.headers:
+            retry_after = response.headers["Retry-After"]
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                try:
+                    wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                    return min(max(wait, 0), self.max_backoff)
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method, url, headers=None, timeout=None, max_bytes=None, retries=None):
+        """Send a request, retrying throttled, failed or unreachable attempts"""
+        merged_headers = dict(self.headers)
+        if headers:
+            merged_headers.update(headers)
+        timeout = self.timeout if timeout is None else timeout
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        retries = self.retries if retries is None else retries
+        slot = self._slot(urlparse(url).netloc)
+
+        attempt = 0
+        while True:
+            response = None
+            try:
+                with slot:
+                    response = self.transport.send(method, url, merged_headers, timeout, max_bytes)
+            except TransportError as e:
+                record_request(None, 0)
+                if attempt >= retries or not e.retryable:
+                    raise
+            else:
+                record_request(response.status_code, len(response.content))
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    return response
+            time.sleep(self._delay(attempt, response))
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def _open(self, method, url, headers, timeout, max_bytes):
+        if hasattr(self.transport, "open"):
+            return self.transport.open(method, url, headers, timeout, max_bytes)
+        return StreamedResponse.from_response(self.transport.send(method, url, headers, timeout, max_bytes), max_bytes)
+
+    @contextmanager
+    def stream(self, url, method="GET", headers=None, timeout=None, max_bytes=None, retries=None):
+        """Context manager yielding a StreamedResponse whose body has not been read yet
+
+        The per-host slot is held until the block exits, so slow body reads
+        count against the host's concurrency cap. Retries happen only before
+        the body is handed over.
+        """
+        merged_headers = dict(self.headers)
+        if headers:
+            merged_headers.update(headers)
+        timeout = self.timeout if timeout is None else timeout
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        retries = self.retries if retries is None else retries
+        slot = self._slot(urlparse(url).netloc)
+
+        attempt = 0
+        while True:
+            response = None
+            slot.acquire()
+            try:
+                response = self._open(method, url, merged_headers, timeout, max_bytes)
+            except TransportError as e:
+                slot.release()
+                record_request(None, 0)
+                if attempt >= retries or not e.retryable:
+                    raise
+            except BaseException:
+                slot.release()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    break
+                response.close()
+                slot.release()
+                record_request(response.status_code, response.bytes_read)
+            time.sleep(self._delay(attempt, response))
+            attempt += 1
+
+        try:
+            yield response
+        finally:
+            response.close()
+            slot.release()
+            record_request(response.status_code, response.bytes_read)
+
+    def close(self):
+        self.transport.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide HTTP client, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def set_client(client):
+    """Replace the process-wide HTTP client, e.g. with a stub transport"""
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    return previous
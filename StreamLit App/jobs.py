@@ -0,0 +1,209 @@
+"""Background research jobs
+
+Research runs on a process-wide worker pool instead of inside a Streamlit
+script run. A job records per-source progress, each source's value as it
+lands and the AI summary as it streams in. Callers poll a snapshot of the
+job, so a rerun or a reloaded page just looks the job up again by id.
+Finished data goes to the shared company store and the job keeps only its
+data version. Jobs are keyed on (company, domain, ticker): a session asking
+about a company that is already being researched, or was researched a few
+minutes ago, attaches to that job instead of starting another one.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from company_store import get_company_store
+from events import hooks
+from metrics import llm_span
+from pipeline import SUMMARY_ERROR, collect_company_data, stream_company_summary
+from retrieval import get_index
+
+# Enough for every company of a comparison to be researched at once
+DEFAULT_WORKERS = 6
+# How long a finished job stays available to sessions asking for the same company
+DEFAULT_RETAIN = 10 * 60
+MAX_JOBS = 200
+ACTIVE_STATES = ("queued", "running")
+
+
+def job_key(company_name, company_domain="", ticker_symbol=""):
+    return (company_name.strip().lower(), company_domain.strip().lower().rstrip("/"), ticker_symbol.strip().upper())
+
+
+class ResearchJob:
+    """One company research run and everything it has produced so far"""
+
+    def __init__(self, company_name, company_domain="", ticker_symbol="", use_cache=True, summarize=True):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = job_key(company_name, company_domain, ticker_symbol)
+        self.company_name = company_name
+        self.company_domain = company_domain
+        self.ticker_symbol = ticker_symbol
+        self.use_cache = use_cache
+        self.summarize = summarize
+        self.status = "queued"
+        self.sources = {}
+        self.results = {}
+        self.data_version = None
+        self.summary = ""
+        self.summary_stats = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.version = 0
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATES
+
+    def finished_at(self):
+        """When the job finished, or None while it is queued or running"""
+        with self._lock:
+            return None if self.active else self.finished
+
+    def _update(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def _progress(self, source, state, detail):
+        with self._changed:
+            if state == "info":
+                self.sources.setdefault(source, {}).setdefault("info", []).append(detail)
+            else:
+                self.sources.setdefault(source, {}).update(state=state, detail=detail)
+            self.version += 1
+            self._changed.notify_all()
+
+    def _result(self, source, value):
+        with self._changed:
+            self.results[source] = value
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait(self, since_version=None, timeout=None):
+        """Block until the job changes after since_version (or finishes); returns the current version"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != since_version or not self.active, timeout=timeout)
+            return self.version
+
+    def snapshot(self):
+        """A consistent copy of the job's state for rendering"""
+        with self._lock:
+            return {
+                "id": self.id,
+                "company_name": self.company_name,
+                "ticker_symbol": self.ticker_symbol,
+                "status": self.status,
+                "sources": {source: dict(info) for source, info in self.sources.items()},
+                "results": dict(self.results),
+                "summary": self.summary,
+                "error": self.error,
+                "created": self.created,
+                "finished": self.finished,
+                "version": self.version,
+            }
+
+    def run(self):
+        self._update(status="running")
+        hooks.emit("job_started", job_id=self.id, company=self.company_name)
+        try:
+            data = collect_company_data(self.company_name, self.company_domain, self.ticker_symbol,
+                                        use_cache=self.use_cache, progress=self._progress, on_result=self._result)
+            # Built now so the first question does not wait for it
+            get_index(data)
+
+            if self.summarize:
+                stream = stream_company_summary(self.company_name, data)
+                for _ in stream:
+                    self._update(summary=stream.text)
+                summary = stream.text
+                if not summary and stream.error:
+                    summary = f"{SUMMARY_ERROR}{stream.error}"
+                summary_stats = stream.stats()
+                data["trace"]["spans"].append(llm_span(summary_stats).to_dict())
+                self._update(summary=summary, summary_stats=summary_stats)
+            data_version = get_company_store().put(data, self.company_name)
+            # The store holds the data now; the raw per-source values are only needed while running
+            # finished goes first: fields are set in order and status ends the job
+            self._update(finished=time.time(), data_version=data_version, results={}, status="done")
+        except Exception as e:
+            self._update(finished=time.time(), error=f"{type(e).__name__}: {e}", status="failed")
+        hooks.emit("job_finished", job_id=self.id, company=self.company_name, status=self.status,
+                   elapsed=self.finished - self.created)
+
+
+class JobStore:
+    """Process-wide registry of research jobs running on a bounded worker pool"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, retain=DEFAULT_RETAIN, max_jobs=MAX_JOBS):
+        self.retain = retain
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="research")
+        self._jobs = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, company_name, company_domain="", ticker_symbol="", use_cache=True, summarize=True):
+        """Start researching a company, or return the job already doing it
+
+        A running job for the same company is always shared. A recently
+        finished one is shared only when use_cache is set, since turning it
+        off asks for fresh data, and while its data is still in the company
+        store.
+        """
+        key = job_key(company_name, company_domain, ticker_symbol)
+        with self._lock:
+            self._prune()
+            existing = self._jobs.get(self._by_key.get(key))
+            reusable = (use_cache and existing is not None and existing.status == "done"
+                        and existing.data_version in get_company_store())
+            if existing is not None and (existing.active or reusable):
+                return existing
+            job = ResearchJob(company_name, company_domain, ticker_symbol, use_cache=use_cache, summarize=summarize)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+        self._executor.submit(job.run)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        now = time.time()
+        # Read under each job's lock, since a job may finish while we look
+        finished = {job_id: job.finished_at() for job_id, job in self._jobs.items()}
+        finished = {job_id: at for job_id, at in finished.items() if at is not None}
+        expired = [job_id for job_id, at in finished.items() if now - at > self.retain]
+        overflow = len(self._jobs) - len(expired) - self.max_jobs
+        if overflow > 0:
+            expired.extend(job_id for job_id in sorted(finished, key=finished.get)[:overflow] if job_id not in expired)
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if self._by_key.get(job.key) == job_id:
+                del self._by_key[job.key]
+
+    def stats(self):
+        with self._lock:
+            states = [job.status for job in self._jobs.values()]
+        return {state: states.count(state) for state in ("queued", "running", "done", "failed")}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """Return the process-wide job store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JobStore()
+        return _store
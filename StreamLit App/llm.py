@@ -0,0 +1,170 @@
+"""Streaming chat completions with latency accounting
+
+ChatStream wraps a streaming `chat.completions.create` call. Iterating it
+yields text deltas as they arrive while it records time-to-first-token and
+throughput, and the text received so far stays available when the stream
+fails or the consumer stops early. Prompt tokens are counted locally up
+front, so cost is known even when the provider reports no usage.
+CachedStream replays a cached answer, or one read from the fact table,
+through the same interface.
+"""
+import time
+
+from context_budget import count_message_tokens
+from events import hooks
+
+DEFAULT_MODEL = "deepseek/deepseek-v3-turbo"
+
+
+class ChatStream:
+    """Iterable of text deltas from one streaming chat completion"""
+
+    def __init__(self, client, messages, model=DEFAULT_MODEL, kind="chat", budget=None, on_complete=None,
+                 **params):
+        self.client = client
+        self.messages = messages
+        self.model = model
+        self.requested_model = model
+        self.kind = kind
+        self.budget = budget
+        self.on_complete = on_complete
+        self.params = params
+        self.prompt_tokens = count_message_tokens(messages)
+        self.parts = []
+        self.chunks = 0
+        self.usage = None
+        self.error = None
+        self.cancelled = False
+        self.started = None
+        self.first_token_at = None
+        self.finished = None
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    @property
+    def complete(self):
+        return self.finished is not None and self.error is None and not self.cancelled
+
+    def __iter__(self):
+        self.started = time.monotonic()
+        stream = None
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model, messages=self.messages, stream=True, **self.params
+            )
+            # A gateway may have routed the call to its fallback model
+            self.model = getattr(stream, "served_model", self.model)
+            for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    self.usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if self.first_token_at is None:
+                    self.first_token_at = time.monotonic()
+                self.chunks += 1
+                self.parts.append(delta)
+                yield delta
+        except GeneratorExit:
+            self.cancelled = True
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = time.monotonic()
+            if self.on_complete is not None and self.complete and self.parts:
+                self.on_complete(self.text)
+            hooks.emit("llm_finished", kind=self.kind, stats=self.stats())
+            if stream is not None and hasattr(stream, "close"):
+                try:
+                    stream.close()
+                except Exception:
+                    pass
+
+    def consume(self):
+        """Drain the stream and return the full text"""
+        for _ in self:
+            pass
+        return self.text
+
+    def stats(self):
+        """Timing figures for the stream so far"""
+        end = self.finished or time.monotonic()
+        completion_tokens = getattr(self.usage, "completion_tokens", None) or self.chunks
+        ttft = (self.first_token_at - self.started) if self.first_token_at and self.started else None
+        generation_time = (end - self.first_token_at) if self.first_token_at else 0.0
+        return {
+            "kind": self.kind,
+            "model": self.model,
+            "rerouted": self.model != self.requested_model,
+            "time_to_first_token": ttft,
+            "total_time": (end - self.started) if self.started else None,
+            "prompt_tokens": getattr(self.usage, "prompt_tokens", None) or self.prompt_tokens,
+            "prompt_sections": self.budget["sections"] if self.budget else None,
+            "completion_tokens": completion_tokens,
+            "tokens_per_second": completion_tokens / generation_time if generation_time > 0 else None,
+            "error": str(self.error) if self.error else None,
+            "error_type": type(self.error).__name__ if self.error else None,
+            "cancelled": self.cancelled,
+            "cached": False,
+        }
+
+
+class CachedStream:
+    """A ready answer served through the ChatStream interface
+
+    source is "cache" for a previously generated answer and "facts" for one
+    read from the company's fact table without calling the model.
+    """
+
+    def __init__(self, text, model=DEFAULT_MODEL, kind="chat", source="cache"):
+        self.parts = [text]
+        self.model = model
+        self.kind = kind
+        self.source = source
+        self.error = None
+        self.cancelled = False
+        self.started = None
+        self.finished = None
+
+    @property
+    def text(self):
+        return self.parts[0]
+
+    @property
+    def complete(self):
+        return self.finished is not None
+
+    def __iter__(self):
+        self.started = time.monotonic()
+        yield self.text
+        self.finished = time.monotonic()
+        hooks.emit("llm_finished", kind=self.kind, stats=self.stats())
+
+    def consume(self):
+        for _ in self:
+            pass
+        return self.text
+
+    def stats(self):
+        end = self.finished or time.monotonic()
+        return {
+            "kind": self.kind,
+            "model": self.model,
+            "rerouted": False,
+            "time_to_first_token": 0.0,
+            "total_time": (end - self.started) if self.started else None,
+            "prompt_tokens": 0,
+            "prompt_sections": None,
+            "completion_tokens": 0,
+            "tokens_per_second": None,
+            "error": None,
+            "error_type": None,
+            "cancelled": False,
+            "cached": self.source == "cache",
+            "source": self.source,
+        }
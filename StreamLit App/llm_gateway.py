@@ -0,0 +1,291 @@
+"""Rate limiting, concurrency caps, deadlines and model fallback for LLM calls
+
+LLMGateway wraps an OpenAI-compatible client and offers the same
+`chat.completions.create` call, so ChatStream, the replay stand-ins and
+anything else holding "a client" use it unchanged. Every call:
+
+- takes a token from a token bucket (requests per minute with a burst),
+  waiting for one when the bucket is empty
+- waits for one of a fixed number of in-flight slots; a streamed call holds
+  its slot until the stream is finished or closed
+- has a deadline: the waits, the request and every read are bounded by what
+  is left of it, and a stream still running when it passes is cut off
+- is retried once when it fails before returning, on the fallback model if
+  one is configured
+
+The gateway keeps a sliding window of latencies (time to first token for
+streams) and errors per model. When the primary model's p95 latency or error
+rate crosses its threshold, calls go to the fallback model for a cooldown
+period, after which the primary is tried again on fresh samples.
+
+Limits and the fallback model come from COMPANYBOT_LLM_* environment
+variables; see the defaults below.
+"""
+import os
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+from events import hooks
+
+DEFAULT_REQUESTS_PER_MINUTE = float(os.environ.get("COMPANYBOT_LLM_RPM", "60"))
+DEFAULT_BURST = int(os.environ.get("COMPANYBOT_LLM_BURST", "10"))
+DEFAULT_MAX_IN_FLIGHT = int(os.environ.get("COMPANYBOT_LLM_MAX_IN_FLIGHT", "8"))
+DEFAULT_DEADLINE = float(os.environ.get("COMPANYBOT_LLM_DEADLINE", "60"))
+DEFAULT_FALLBACK_MODEL = os.environ.get("COMPANYBOT_LLM_FALLBACK_MODEL") or None
+# The primary model is considered degraded past either threshold
+DEFAULT_P95_THRESHOLD = float(os.environ.get("COMPANYBOT_LLM_P95_SECONDS", "10"))
+DEFAULT_ERROR_RATE_THRESHOLD = 0.25
+MIN_HEALTH_SAMPLES = 5
+HEALTH_WINDOW = 300
+MAX_HEALTH_SAMPLES = 200
+DEFAULT_COOLDOWN = 60
+DEFAULT_RETRIES = 1
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (408, 409, 429)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when an LLM call cannot start or finish before its deadline"""
+
+
+def _retryable(error):
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRY_STATUSES or status >= 500
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in (
+        "APIConnectionError", "APITimeoutError")
+
+
+class TokenBucket:
+    """Allows rate calls per second on average and bursts of up to capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        """Take a token if there is one; returns 0, or the seconds until one is due"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout=None):
+        """Wait for a token; returns the seconds waited, or None if none came within timeout"""
+        started = time.monotonic()
+        while True:
+            wait = self._take()
+            if not wait:
+                return time.monotonic() - started
+            if timeout is not None and time.monotonic() - started + wait > timeout:
+                return None
+            time.sleep(wait)
+
+
+class ModelHealth:
+    """Latencies and errors of recent calls to one model"""
+
+    def __init__(self, window=HEALTH_WINDOW, max_samples=MAX_HEALTH_SAMPLES):
+        self.window = window
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, latency=None, error=False):
+        with self._lock:
+            self._samples.append((time.monotonic(), latency, error))
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def snapshot(self):
+        """{"calls", "error_rate", "p95"} over the window; p95 is None without latencies"""
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            samples = [sample for sample in self._samples if sample[0] >= cutoff]
+        latencies = sorted(latency for _, latency, error in samples if latency is not None and not error)
+        errors = sum(1 for _, _, error in samples if error)
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None
+        return {"calls": len(samples), "error_rate": errors / len(samples) if samples else 0.0, "p95": p95}
+
+
+class _GatewayStream:
+    """A streamed response that records first-token latency and holds its in-flight slot until closed"""
+
+    def __init__(self, gateway, model, response, started, deadline_at):
+        self.gateway = gateway
+        self.served_model = model
+        self.response = response
+        self.started = started
+        self.deadline_at = deadline_at
+        self._first_token = False
+        self._released = False
+
+    def __iter__(self):
+        try:
+            for chunk in self.response:
+                if not self._first_token:
+                    self._first_token = True
+                    self.gateway._health(self.served_model).record(latency=time.monotonic() - self.started)
+                if time.monotonic() > self.deadline_at:
+                    self.gateway._count("deadline_exceeded")
+                    raise DeadlineExceeded(f"{self.served_model} stream passed its deadline")
+                yield chunk
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            if not self._first_token:
+                self.gateway._health(self.served_model).record(error=True)
+            raise
+        finally:
+            self.close()
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self.gateway._slots.release()
+        if hasattr(self.response, "close"):
+            try:
+                self.response.close()
+            except Exception:
+                pass
+
+
+class LLMGateway:
+    """An OpenAI-compatible client that schedules calls to another one"""
+
+    def __init__(self, client, fallback_model=DEFAULT_FALLBACK_MODEL, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 burst=DEFAULT_BURST, max_in_flight=DEFAULT_MAX_IN_FLIGHT, deadline=DEFAULT_DEADLINE,
+                 p95_threshold=DEFAULT_P95_THRESHOLD, error_rate_threshold=DEFAULT_ERROR_RATE_THRESHOLD,
+                 min_samples=MIN_HEALTH_SAMPLES, cooldown=DEFAULT_COOLDOWN, retries=DEFAULT_RETRIES):
+        self.client = client
+        self.fallback_model = fallback_model
+        self.deadline = deadline
+        self.p95_threshold = p95_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.retries = retries
+        self.max_in_flight = max_in_flight
+        self._bucket = TokenBucket(requests_per_minute / 60, burst)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._models = {}
+        self._degraded_until = {}
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "retries": 0, "rerouted": 0, "throttled": 0, "throttled_seconds": 0.0,
+                         "deadline_exceeded": 0, "errors": 0}
+        # Mirrors client.chat.completions.create
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def _health(self, model):
+        with self._lock:
+            health = self._models.get(model)
+            if health is None:
+                health = self._models[model] = ModelHealth()
+            return health
+
+    def route(self, model):
+        """The model a call asking for model should go to right now"""
+        if not self.fallback_model or model == self.fallback_model:
+            return model
+        now = time.monotonic()
+        with self._lock:
+            degraded_until = self._degraded_until.get(model, 0)
+        if now < degraded_until:
+            return self.fallback_model
+
+        health = self._health(model).snapshot()
+        reason = None
+        if health["calls"] >= self.min_samples and health["error_rate"] > self.error_rate_threshold:
+            reason = "error_rate"
+        elif health["p95"] is not None and health["calls"] >= self.min_samples and health["p95"] > self.p95_threshold:
+            reason = "latency"
+        if reason is None:
+            return model
+        with self._lock:
+            self._degraded_until[model] = now + self.cooldown
+            self.counters["rerouted"] += 1
+        # After the cooldown the primary is judged on new calls only
+        self._health(model).reset()
+        hooks.emit("llm_rerouted", model=model, fallback=self.fallback_model, reason=reason, health=health)
+        return self.fallback_model
+
+    def _remaining(self, deadline_at, what):
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            self._count("deadline_exceeded")
+            raise DeadlineExceeded(f"LLM call passed its deadline {what}")
+        return remaining
+
+    def create(self, model, messages, stream=False, deadline=None, **params):
+        """chat.completions.create with scheduling; deadline is in seconds from now"""
+        started = time.monotonic()
+        deadline_at = started + (deadline or self.deadline)
+        self._count("calls")
+        attempt = 0
+        while True:
+            target = self.route(model) if attempt == 0 else (self.fallback_model or model)
+            waited = self._bucket.acquire(timeout=self._remaining(deadline_at, "waiting for the rate limit"))
+            if waited is None:
+                self._count("deadline_exceeded")
+                raise DeadlineExceeded("LLM call passed its deadline waiting for the rate limit")
+            if waited > 0.001:
+                self._count("throttled")
+                self._count("throttled_seconds", waited)
+            if not self._slots.acquire(timeout=self._remaining(deadline_at, "waiting for a free slot")):
+                self._count("deadline_exceeded")
+                raise DeadlineExceeded("LLM call passed its deadline waiting for a free slot")
+
+            try:
+                timeout = self._remaining(deadline_at, "before the request")
+            except DeadlineExceeded:
+                self._slots.release()
+                raise
+            call_started = time.monotonic()
+            try:
+                response = self.client.chat.completions.create(
+                    model=target, messages=messages, stream=stream, timeout=timeout, **params)
+            except Exception as e:
+                self._slots.release()
+                self._health(target).record(error=True)
+                self._count("errors")
+                if attempt >= self.retries or not _retryable(e):
+                    raise
+                attempt += 1
+                backoff = RETRY_BACKOFF * attempt
+                if time.monotonic() + backoff >= deadline_at:
+                    self._count("deadline_exceeded")
+                    raise DeadlineExceeded(f"LLM call passed its deadline after {type(e).__name__}: {e}") from e
+                self._count("retries")
+                time.sleep(backoff)
+                continue
+
+            if stream:
+                return _GatewayStream(self, target, response, call_started, deadline_at)
+            self._slots.release()
+            self._health(target).record(latency=time.monotonic() - call_started)
+            return response
+
+    def stats(self):
+        """Counters plus each model's recent health"""
+        with self._lock:
+            counters = dict(self.counters)
+            models = dict(self._models)
+            degraded = {model: until - time.monotonic() for model, until in self._degraded_until.items()
+                        if until > time.monotonic()}
+        return dict(counters, models={model: dict(health.snapshot(), degraded_for=degraded.get(model))
+                                      for model, health in models.items()})
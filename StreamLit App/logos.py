@@ -0,0 +1,193 @@
+"""Company logo discovery, validation and thumbnail cache
+
+Logo candidates come from the company homepage (apple-touch-icon, icon
+links and og:image) plus the conventional /apple-touch-icon.png and
+/favicon.ico paths. They are downloaded concurrently and each is opened
+with PIL, so only real, decodable images of a sensible size are accepted.
+The best one is resized once to a small PNG thumbnail and written to a
+content-addressed directory next to the research cache. The app serves
+those bytes directly, so a logo never needs another request after the
+first research, and pages never hot-link third-party images.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlparse
+
+from extract import fetch_page
+from http_client import TransportError, get_client
+from metrics import bind
+from research_cache import DEFAULT_CACHE_PATH
+
+LOGO_DIR = os.environ.get(
+    "COMPANYBOT_LOGO_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(DEFAULT_CACHE_PATH)), "logos"),
+)
+THUMBNAIL_SIZE = 128
+MIN_LOGO_SIZE = 16
+# Larger images are refused before decoding, as decompression bombs
+MAX_LOGO_PIXELS = 16_000_000
+MAX_LOGO_BYTES = 2_000_000
+MAX_HEAD_BYTES = 256_000
+MAX_CANDIDATES = 6
+CANDIDATE_TIMEOUT = 5
+MAX_MEMORY_THUMBNAILS = 128
+# Preferred sources, best first; og:image is often a banner rather than a logo
+KIND_PRIORITY = {"apple-touch-icon": 4, "icon": 3, "favicon": 2, "og:image": 1, "search": 0}
+
+
+def _declared_size(sizes):
+    """Largest edge from a sizes attribute such as "32x32 192x192", or 0"""
+    edges = []
+    for size in sizes.lower().split():
+        width, _, height = size.partition("x")
+        if width.isdigit() and height.isdigit():
+            edges.append(min(int(width), int(height)))
+    return max(edges, default=0)
+
+
+def site_candidates(website_url, client=None):
+    """(kind, url) logo candidates for a site, most promising first"""
+    parsed = urlparse(website_url)
+    origin = f"{parsed.scheme}://{parsed.netloc}"
+    declared = []
+    try:
+        # Icons are declared in the head, so only the start of the page is read
+        _, page = fetch_page(website_url, client=client, timeout=CANDIDATE_TIMEOUT, max_bytes=MAX_HEAD_BYTES,
+                             max_chars=2000)
+        if page is not None:
+            declared = page.icons
+    except TransportError:
+        pass
+
+    ranked = sorted(declared, key=lambda icon: (KIND_PRIORITY[icon[0]], _declared_size(icon[2])), reverse=True)
+    candidates = [(kind, url) for kind, url, _ in ranked]
+    candidates.append(("apple-touch-icon", f"{origin}/apple-touch-icon.png"))
+    candidates.append(("favicon", f"{origin}/favicon.ico"))
+    unique = list(dict.fromkeys(url for _, url in candidates))
+    kinds = {}
+    for kind, url in candidates:
+        kinds.setdefault(url, kind)
+    return [(kinds[url], url) for url in unique if not url.startswith("data:")][:MAX_CANDIDATES]
+
+
+def load_image(content):
+    """Open and fully decode image bytes with PIL; raises ValueError when they are not a usable image"""
+    from PIL import Image
+
+    try:
+        with Image.open(BytesIO(content)) as probe:
+            width, height = probe.size
+            if width * height > MAX_LOGO_PIXELS:
+                raise ValueError(f"image too large: {width}x{height}")
+            probe.verify()
+        image = Image.open(BytesIO(content))
+        image.load()
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"not an image: {e}") from e
+    if min(image.size) < MIN_LOGO_SIZE:
+        raise ValueError(f"image too small: {image.size[0]}x{image.size[1]}")
+    return image
+
+
+def _fetch_candidate(kind, url, client):
+    """(score, url, kind, image) for a candidate that is a real image, else None"""
+    try:
+        response = client.get(url, timeout=CANDIDATE_TIMEOUT, max_bytes=MAX_LOGO_BYTES, retries=0)
+    except TransportError:
+        return None
+    if response.status_code != 200 or response.truncated or not response.content:
+        return None
+    try:
+        image = load_image(response.content)
+    except ValueError:
+        return None
+    width, height = image.size
+    squareness = min(width, height) / max(width, height)
+    # Prefer the better source, then square images, then size up to what the thumbnail needs
+    score = (KIND_PRIORITY[kind], round(squareness, 1), min(width, height, THUMBNAIL_SIZE * 2))
+    return score, url, kind, image
+
+
+def make_thumbnail(image, size=THUMBNAIL_SIZE):
+    """PNG bytes of the image scaled to fit size x size"""
+    from PIL import Image
+
+    thumbnail = image.convert("RGBA")
+    thumbnail.thumbnail((size, size), Image.LANCZOS)
+    output = BytesIO()
+    thumbnail.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def _thumbnail_path(digest):
+    return os.path.join(LOGO_DIR, digest[:2], f"{digest}.png")
+
+
+_thumbnails = OrderedDict()
+_thumbnails_lock = threading.Lock()
+
+
+def store_thumbnail(png):
+    """Write thumbnail bytes under their content hash and return the hash"""
+    digest = hashlib.sha256(png).hexdigest()[:32]
+    path = _thumbnail_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(png)
+        os.replace(temporary, path)
+    _remember(digest, png)
+    return digest
+
+
+def _remember(digest, png):
+    with _thumbnails_lock:
+        _thumbnails[digest] = png
+        _thumbnails.move_to_end(digest)
+        while len(_thumbnails) > MAX_MEMORY_THUMBNAILS:
+            _thumbnails.popitem(last=False)
+
+
+def logo_bytes(digest):
+    """Thumbnail PNG bytes for a stored logo, or None when it is no longer on disk"""
+    with _thumbnails_lock:
+        png = _thumbnails.get(digest)
+        if png is not None:
+            _thumbnails.move_to_end(digest)
+            return png
+    try:
+        with open(_thumbnail_path(digest), "rb") as f:
+            png = f.read()
+    except OSError:
+        return None
+    _remember(digest, png)
+    return png
+
+
+def best_logo(candidates, client=None):
+    """Download (kind, url) candidates concurrently and store the best valid one
+
+    Returns {"digest", "url", "kind", "width", "height"} for the stored
+    thumbnail, or None when no candidate is a usable image.
+    """
+    if not candidates:
+        return None
+    client = client or get_client()
+    with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+        # Bound here, in the caller's context, so the requests count against its span
+        futures = [executor.submit(bind(_fetch_candidate), *candidate, client) for candidate in candidates]
+        fetched = [future.result() for future in futures]
+    valid = [result for result in fetched if result is not None]
+    if not valid:
+        return None
+    _, url, kind, image = max(valid, key=lambda result: result[0])
+    png = make_thumbnail(image)
+    width, height = image.size
+    return {"digest": store_thumbnail(png), "url": url, "kind": kind, "width": width, "height": height}
@@ -0,0 +1,205 @@
+"""Cached market data from Yahoo Finance
+
+Ticker info and a year of daily OHLC history are kept in the research cache
+with the market-aware TTL, so repeated research runs, sessions and batch
+rows share one lookup per ticker until the market moves. When cached
+history expires only the bars since the last cached one are fetched and
+merged in. Each history carries a version string, and the price chart is
+rendered to PNG once per version instead of on every rerun.
+
+yfinance and matplotlib are slow to import and only needed once a ticker
+is looked up or a chart is drawn, so they are imported on first use.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from research_cache import cache_key, financial_ttl, get_cache
+
+HISTORY_DAYS = 365
+# Yahoo returns a near-empty info dict for unknown tickers
+MIN_INFO_FIELDS = 5
+MAX_CHARTS = 64
+
+
+def history_version(ticker, history):
+    """Short identifier that changes whenever the history gains or revises a bar"""
+    if history.empty:
+        return f"{ticker}:empty"
+    last = f"{ticker}|{len(history)}|{history.index[-1]}|{history['Close'].iloc[-1]}"
+    return hashlib.sha1(last.encode("utf-8")).hexdigest()[:12]
+
+
+def merge_history(cached, recent, days=HISTORY_DAYS):
+    """Replace cached bars from the first recent bar onwards and keep the last `days` days"""
+    import pandas as pd
+
+    if recent.empty:
+        merged = cached
+    elif cached.empty:
+        merged = recent
+    else:
+        merged = pd.concat([cached[cached.index < recent.index[0]], recent])
+    if merged.empty:
+        return merged
+    return merged[merged.index > merged.index[-1] - pd.Timedelta(days=days)]
+
+
+def yahoo_ticker(ticker):
+    """yfinance Ticker for a symbol"""
+    import yfinance as yf
+    return yf.Ticker(ticker)
+
+
+class MarketData:
+    """Per-ticker info and history lookups backed by the research cache"""
+
+    def __init__(self, cache=None, ticker_factory=yahoo_ticker):
+        self.cache = cache
+        self.ticker_factory = ticker_factory
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, ticker):
+        with self._locks_lock:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _cache(self):
+        return self.cache or get_cache()
+
+    def info(self, ticker, refresh=False):
+        """Flat info dict for a ticker, or None when Yahoo does not know it"""
+        key = cache_key("", "", ticker, "market_info")
+        cached = None if refresh else self._cache().get(key)
+        if cached is not None and cached[1]:
+            return cached[0]
+
+        info = self.ticker_factory(ticker).info
+        if not info or len(info) < MIN_INFO_FIELDS:
+            return None
+        info = {k: v for k, v in info.items() if not isinstance(v, dict) and not isinstance(v, list)}
+        self._cache().set(key, "market_info", info, ttl=financial_ttl())
+        return info
+
+    def history(self, ticker, refresh=False):
+        """Return (history, state) with state "hit", "incremental" or "miss"
+
+        Expired history is extended from its last bar, which is fetched again
+        because it may have been an intraday bar when it was cached.
+        """
+        key = cache_key("", "", ticker, "market_history")
+        cached = None if refresh else self._cache().get(key)
+        if cached is not None and cached[1]:
+            return cached[0], "hit"
+
+        stock = self.ticker_factory(ticker)
+        if cached is not None and not cached[0].empty:
+            previous = cached[0]
+            recent = stock.history(start=previous.index[-1].strftime("%Y-%m-%d"))
+            history, state = merge_history(previous, recent), "incremental"
+        else:
+            history, state = stock.history(period="1y"), "miss"
+
+        if not history.empty:
+            self._cache().set(key, "market_history", history, ttl=financial_ttl())
+        return history, state
+
+    def get(self, ticker, refresh=False):
+        """Return (financial_data, state) for a ticker; financial_data is None when unavailable
+
+        Concurrent lookups of one ticker wait for a single fetch.
+        """
+        with self._lock(ticker.upper()):
+            info = self.info(ticker, refresh=refresh)
+            if info is None:
+                return None, "miss"
+            history, state = self.history(ticker, refresh=refresh)
+            if history.empty:
+                return None, state
+            return {"info": info, "history": history, "version": history_version(ticker, history)}, state
+
+
+_charts = OrderedDict()
+_charts_lock = threading.Lock()
+
+
+def _chart_png(key, draw):
+    """PNG of a chart drawn by draw(ax), rendered once per key
+
+    The figure is built without pyplot, so nothing is left registered in
+    its global figure manager and the figure is freed with its last
+    reference.
+    """
+    with _charts_lock:
+        if key in _charts:
+            _charts.move_to_end(key)
+            return _charts[key]
+
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    draw(ax)
+    ax.grid(True)
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    png = buffer.getvalue()
+
+    with _charts_lock:
+        _charts[key] = png
+        while len(_charts) > MAX_CHARTS:
+            _charts.popitem(last=False)
+    return png
+
+
+def price_chart_png(history, version):
+    """PNG of the closing price chart, rendered once per history version"""
+    def draw(ax):
+        ax.plot(history.index, history['Close'])
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Price ($)')
+
+    return _chart_png(version, draw)
+
+
+def comparison_chart_png(histories):
+    """PNG of several closing price series rebased to 100 over their common dates
+
+    histories maps a label to (history, version); the chart is rendered once
+    per set of versions.
+    """
+    def draw(ax):
+        start = max(history.index[0] for history, _ in histories.values())
+        for label, (history, _) in histories.items():
+            close = history["Close"][history.index >= start]
+            # Exchanges differ in time zone; daily bars line up by date
+            dates = close.index.tz_localize(None) if close.index.tz is not None else close.index
+            ax.plot(dates, close.to_numpy() / close.iloc[0] * 100, label=label)
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Close (start = 100)')
+        ax.legend()
+
+    key = "compare:" + "|".join(f"{label}={version}" for label, (_, version) in histories.items())
+    return _chart_png(key, draw)
+
+
+_market_data = None
+_market_data_lock = threading.Lock()
+
+
+def get_market_data():
+    """Return the process-wide market data layer"""
+    global _market_data
+    with _market_data_lock:
+        if _market_data is None:
+            _market_data = MarketData()
+        return _market_data
+
+
+def set_market_data(market_data):
+    """Replace the process-wide market data layer, e.g. with one backed by recorded tickers"""
+    global _market_data
+    with _market_data_lock:
+        previous, _market_data = _market_data, market_data
+    return previous
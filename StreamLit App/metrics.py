@@ -0,0 +1,430 @@
+"""Instrumentation for source fetchers and LLM calls
+
+Every source in a research run executes inside a Span, which records wall
+time, HTTP requests and their statuses, bytes transferred, time spent
+parsing HTML and the class of any error. The span is carried in a context
+variable, so the HTTP client and the parsers add to it without being passed
+anything; code that hands work to another thread copies the context along
+(see `bind`). LLM calls are recorded from the llm_finished event with their
+timings and token counts, and switches to the fallback model from the
+llm_rerouted event.
+
+A run's spans make up its RunTrace, a structured record kept with the
+collected data. Finished spans also feed process-wide histograms and
+counters, which `prometheus_text()` and `to_dict()` export. When
+COMPANYBOT_METRICS_PORT is set, the app serves them at /metrics and
+/metrics.json.
+"""
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from events import hooks
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 45)
+BYTES_BUCKETS = (1_000, 10_000, 100_000, 500_000, 1_000_000, 4_000_000, 16_000_000)
+TOKEN_BUCKETS = (100, 500, 1_000, 2_000, 4_000, 8_000, 16_000, 32_000)
+RENDER_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+MAX_TRACES = 50
+MAX_LLM_CALLS = 200
+METRIC_PREFIX = "companybot_"
+
+_current_span = contextvars.ContextVar("metrics_span", default=None)
+
+
+class Span:
+    """Measurements for one source fetch or LLM call"""
+
+    def __init__(self, name, kind="source"):
+        self.name = name
+        self.kind = kind
+        self.started = time.monotonic()
+        self.wall_time = None
+        self.outcome = None
+        self.cache_state = None
+        self.requests = 0
+        self.bytes = 0
+        self.statuses = Counter()
+        self.parse_time = 0.0
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.time_to_first_token = None
+        self.error = None
+        self.error_message = None
+        self._lock = threading.Lock()
+
+    def add_request(self, status, nbytes):
+        with self._lock:
+            self.requests += 1
+            self.bytes += nbytes
+            self.statuses[str(status) if status is not None else "error"] += 1
+
+    def add_parse(self, seconds):
+        with self._lock:
+            self.parse_time += seconds
+
+    def set_error(self, error):
+        self.error = type(error).__name__
+        self.error_message = str(error)[:500]
+
+    def run(self, fn, *args):
+        """Call fn(*args) with this span current, recording the class of any error it raises"""
+        token = _current_span.set(self)
+        try:
+            return fn(*args)
+        except Exception as e:
+            self.set_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+
+    def finish(self, outcome, cache_state=None):
+        self.wall_time = time.monotonic() - self.started
+        self.outcome = outcome
+        self.cache_state = cache_state
+        return self
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "kind": self.kind,
+                "outcome": self.outcome,
+                "cache_state": self.cache_state,
+                "wall_time": round(self.wall_time, 4) if self.wall_time is not None else None,
+                "requests": self.requests,
+                "bytes": self.bytes,
+                "statuses": dict(self.statuses),
+                "parse_time": round(self.parse_time, 4),
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "time_to_first_token": self.time_to_first_token,
+                "error": self.error,
+                "error_message": self.error_message,
+            }
+
+
+def current_span():
+    return _current_span.get()
+
+
+def bind(fn):
+    """Wrap fn so it runs in a copy of the caller's context, e.g. before handing it to a thread pool"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def record_request(status, nbytes):
+    """Count one HTTP request against the current span, if any"""
+    span = _current_span.get()
+    if span is not None:
+        span.add_request(status, nbytes)
+    get_metrics().inc("http_requests_total", status=str(status) if status is not None else "error")
+    get_metrics().inc("http_bytes_total", nbytes)
+
+
+def record_parse(seconds):
+    span = _current_span.get()
+    if span is not None:
+        span.add_parse(seconds)
+
+
+def llm_span(stats):
+    """A finished Span built from a ChatStream's or CachedStream's stats"""
+    span = Span(stats["kind"], kind="llm")
+    span.wall_time = stats.get("total_time")
+    span.prompt_tokens = stats.get("prompt_tokens")
+    span.completion_tokens = stats.get("completion_tokens")
+    span.time_to_first_token = stats.get("time_to_first_token")
+    span.error = stats.get("error_type")
+    span.error_message = stats.get("error")
+    if stats.get("source") == "facts":
+        span.outcome = "facts"
+    elif stats.get("cached"):
+        span.outcome = "cached"
+    elif stats.get("error"):
+        span.outcome = "error"
+    elif stats.get("cancelled"):
+        span.outcome = "cancelled"
+    else:
+        span.outcome = "ok"
+    return span
+
+
+class RunTrace:
+    """The spans of one research run"""
+
+    def __init__(self, company):
+        self.id = uuid.uuid4().hex[:12]
+        self.company = company
+        self.started = time.time()
+        self.elapsed = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def finish(self, span, outcome, cache_state=None):
+        """Close a span, add it to the trace and to the process-wide metrics"""
+        span.finish(outcome, cache_state)
+        with self._lock:
+            self.spans.append(span)
+        get_metrics().observe_span(span)
+
+    def close(self):
+        self.elapsed = time.time() - self.started
+        get_metrics().add_trace(self)
+        return self
+
+    def to_dict(self):
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {"id": self.id, "company": self.company, "started": self.started,
+                "elapsed": round(self.elapsed, 4) if self.elapsed is not None else None, "spans": spans}
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (the largest bound for the overflow bucket)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def to_dict(self):
+        cumulative, seen = {}, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            cumulative[str(bound)] = seen
+        cumulative["+Inf"] = self.count
+        return {"buckets": cumulative, "count": self.count, "sum": self.sum}
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_label_value(value)}"' for key, value in labels) + "}"
+
+
+class Metrics:
+    """Process-wide counters, histograms, recent run traces and recent LLM calls"""
+
+    HISTOGRAMS = {
+        "source_seconds": SECONDS_BUCKETS,
+        "source_bytes": BYTES_BUCKETS,
+        "source_parse_seconds": SECONDS_BUCKETS,
+        "llm_seconds": SECONDS_BUCKETS,
+        "llm_time_to_first_token_seconds": SECONDS_BUCKETS,
+        "llm_prompt_tokens": TOKEN_BUCKETS,
+        "ui_render_seconds": RENDER_BUCKETS,
+    }
+
+    def __init__(self, max_traces=MAX_TRACES, max_llm_calls=MAX_LLM_CALLS):
+        self._counters = Counter()
+        self._histograms = {}
+        self.traces = deque(maxlen=max_traces)
+        self.llm_calls = deque(maxlen=max_llm_calls)
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name, value, **labels):
+        if value is None:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.HISTOGRAMS[name])
+            histogram.observe(value)
+
+    def observe_span(self, span):
+        if span.kind == "llm":
+            self.inc("llm_calls_total", kind=span.name, outcome=span.outcome)
+            if span.error:
+                self.inc("llm_errors_total", kind=span.name, error=span.error)
+            if span.outcome not in ("cached", "facts"):
+                self.observe("llm_seconds", span.wall_time, kind=span.name)
+                self.observe("llm_time_to_first_token_seconds", span.time_to_first_token, kind=span.name)
+                self.observe("llm_prompt_tokens", span.prompt_tokens, kind=span.name)
+                self.inc("llm_tokens_total", span.prompt_tokens or 0, kind=span.name, type="prompt")
+                self.inc("llm_tokens_total", span.completion_tokens or 0, kind=span.name, type="completion")
+            with self._lock:
+                self.llm_calls.append(span.to_dict())
+            return
+        self.inc("source_runs_total", source=span.name, outcome=span.outcome)
+        if span.error:
+            self.inc("source_errors_total", source=span.name, error=span.error)
+        self.observe("source_seconds", span.wall_time, source=span.name)
+        if span.requests:
+            self.observe("source_bytes", span.bytes, source=span.name)
+        if span.parse_time:
+            self.observe("source_parse_seconds", span.parse_time, source=span.name)
+
+    def add_trace(self, trace):
+        with self._lock:
+            self.traces.append(trace)
+
+    def source_summary(self):
+        """Per-source run counts, success rate and latency/bytes quantiles for display"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+        summary = {}
+        for (name, labels), value in counters.items():
+            if name != "source_runs_total":
+                continue
+            labels = dict(labels)
+            row = summary.setdefault(labels["source"], {"runs": 0, "ok": 0})
+            row["runs"] += value
+            if labels["outcome"] in ("ok", "cached"):
+                row["ok"] += value
+        for source, row in summary.items():
+            seconds = histograms.get(("source_seconds", (("source", source),)))
+            size = histograms.get(("source_bytes", (("source", source),)))
+            row["success_rate"] = row["ok"] / row["runs"] if row["runs"] else None
+            row["p50_seconds"] = seconds.quantile(0.5) if seconds else None
+            row["p95_seconds"] = seconds.quantile(0.95) if seconds else None
+            row["mean_bytes"] = size.sum / size.count if size and size.count else None
+        return summary
+
+    def to_dict(self):
+        """Everything as JSON-ready data"""
+        with self._lock:
+            counters = [{"name": METRIC_PREFIX + name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [dict(histogram.to_dict(), name=METRIC_PREFIX + name, labels=dict(labels))
+                          for (name, labels), histogram in sorted(self._histograms.items())]
+            traces = list(self.traces)
+            llm_calls = list(self.llm_calls)
+        return {"counters": counters, "histograms": histograms, "traces": [trace.to_dict() for trace in traces],
+                "llm_calls": llm_calls}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), default=str)
+
+    def prometheus_text(self):
+        """Counters and histograms in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, histogram.to_dict()) for key, histogram in self._histograms.items())
+        lines = []
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} counter")
+                declared.add(name)
+            lines.append(f"{METRIC_PREFIX}{name}{_label_text(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            if name not in declared:
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+                declared.add(name)
+            for bound, count in histogram["buckets"].items():
+                lines.append(f"{METRIC_PREFIX}{name}_bucket{_label_text(labels + (('le', bound),))} {count}")
+            lines.append(f"{METRIC_PREFIX}{name}_sum{_label_text(labels)} {histogram['sum']}")
+            lines.append(f"{METRIC_PREFIX}{name}_count{_label_text(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.traces.clear()
+            self.llm_calls.clear()
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide metrics"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+        return _metrics
+
+
+def _on_llm_finished(event, payload):
+    get_metrics().observe_span(llm_span(payload["stats"]))
+
+
+def _on_llm_rerouted(event, payload):
+    get_metrics().inc("llm_reroutes_total", model=payload["model"], reason=payload["reason"])
+
+
+hooks.subscribe("llm_finished", _on_llm_finished)
+hooks.subscribe("llm_rerouted", _on_llm_rerouted)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body, content_type = get_metrics().prometheus_text(), "text/plain; version=0.0.4"
+        elif self.path.split("?")[0] == "/metrics.json":
+            body, content_type = get_metrics().to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host=None):
+    """Serve /metrics and /metrics.json on a background thread, once per process
+
+    The port defaults to COMPANYBOT_METRICS_PORT; nothing is started when
+    neither is set. The host defaults to COMPANYBOT_METRICS_HOST, else
+    127.0.0.1, so the endpoint is only reachable from outside when asked
+    for. Returns the server, or None.
+    """
+    global _server
+    port = port or os.environ.get("COMPANYBOT_METRICS_PORT")
+    host = host or os.environ.get("COMPANYBOT_METRICS_HOST", "127.0.0.1")
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
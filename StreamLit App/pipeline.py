@@ -0,0 +1,612 @@
+"""Company research pipeline: source fetchers, concurrent collection and LLM calls
+
+Nothing here imports Streamlit, so the same pipeline serves the app, batch
+runs, benchmarks and any worker process. Callers follow a run through the
+progress callback of collect_company_data, and anything else can observe
+every run through the event hooks in events.py.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+from context_budget import ContextBudget, MESSAGE_OVERHEAD_TOKENS, MODEL_CONTEXT_TOKENS
+from crawler import crawl_site
+from events import hooks
+from facts import answer_from_facts, extract_facts
+from llm import CachedStream, ChatStream, DEFAULT_MODEL
+from llm_gateway import LLMGateway
+from logos import best_logo, site_candidates
+from market_data import get_market_data
+from metrics import RunTrace, Span
+from research_cache import cache_key, get_cache
+from response_cache import conversation_context, data_version, get_response_cache
+from retrieval import format_context
+from search_planner import search_page
+
+LLM_BASE_URL = os.environ.get("COMPANYBOT_LLM_BASE_URL", "https://router.huggingface.co/novita/v3/openai")
+
+client = None
+_client_lock = threading.Lock()
+
+def get_llm_client():
+    """Return the process-wide LLM client, creating it on first use
+
+    openai is imported here rather than at module level, so starting the
+    app does not pay for it until the first summary or answer. Calls go
+    through an LLMGateway, which rate limits them, bounds how many run at
+    once and falls back to COMPANYBOT_LLM_FALLBACK_MODEL when the primary
+    model is slow or failing; the gateway does the retrying, so the OpenAI
+    client's own retries are turned off.
+    """
+    global client
+    with _client_lock:
+        if client is None:
+            from openai import OpenAI
+            client = LLMGateway(OpenAI(
+                base_url=LLM_BASE_URL,
+                api_key=os.environ.get("HF_API_KEY", "hf_**********************************"),
+                #get api_key from hugging face, or set HF_API_KEY
+                max_retries=0,
+            ))
+        return client
+
+def llm_gateway_stats():
+    """The LLM gateway's counters and model health, or None before the first call or when a stub is installed"""
+    with _client_lock:
+        llm_client = client
+    return llm_client.stats() if isinstance(llm_client, LLMGateway) else None
+
+def set_llm_client(llm_client):
+    """Replace the LLM client used for summaries and chat, e.g. with a replaying stub; returns the previous one"""
+    global client
+    with _client_lock:
+        previous, client = client, llm_client
+    return previous
+
+TWITTER_HANDLE_RE = re.compile(r'twitter\.com/([^/?#]+)')
+# Image search results tried when the website has no usable icon
+MAX_SEARCH_LOGOS = 4
+
+# Web scraping and data collection functions
+def fetch_company_website(company_name, domain=None):
+    """Find the official website for a company"""
+    if domain and (domain.startswith('http://') or domain.startswith('https://')):
+        return domain
+    
+    if domain:
+        if not domain.startswith('http'):
+            return f"https://{domain}"
+        return domain
+        
+    page = search_page("website", company_name)
+    
+    # Look for the first organic result
+    for result in page.results:
+        if result.url:
+            return result.url
+    if page.links:
+        return page.links[0]
+    return None
+
+def fetch_logo(company_name, website_url):
+    """Find the company logo, validate it and cache a thumbnail; returns its record from logos.best_logo"""
+    logo = best_logo(site_candidates(website_url)) if website_url else None
+    if logo is None:
+        # No usable icon on the site, so try the first few image search results
+        page = search_page("logo", company_name)
+        images = [src for src in page.images if 'gstatic' not in src]
+        logo = best_logo([("search", src) for src in images[:MAX_SEARCH_LOGOS]])
+    return logo
+
+def scrape_website_pages(url):
+    """Crawl the company website and return one text record per page"""
+    if not url:
+        return []
+
+    return crawl_site(url)
+
+def fetch_google_news(company):
+    """Fetch news about the company from Google"""
+    page = search_page("news", company)
+    
+    news_items = []
+    for result in page.results:
+        if len(result.title) > 10:  # Avoid empty or tiny headlines
+            news_items.append(f"Headline: {result.title}\nSnippet: {result.snippet}")
+            
+    return "\n\n".join(news_items[:10])
+
+def fetch_linkedin_info(company):
+    """Attempt to fetch information from LinkedIn via Google search"""
+    page = search_page("linkedin", company)
+    
+    linkedin_info = []
+    linkedin_url = next((link for link in page.links if "linkedin.com/company" in link), None)
+    
+    for result in page.results:
+        if "LinkedIn" in result.title and len(result.snippet) > 30:
+            linkedin_info.append(f"LinkedIn Info: {result.snippet}")
+    
+    if linkedin_url:
+        linkedin_info.insert(0, f"LinkedIn Company URL: {linkedin_url}")
+            
+    return "\n\n".join(linkedin_info[:5])
+
+def fetch_twitter_info(company_name):
+    """Fetch Twitter information about the company using Google search"""
+    page = search_page("twitter", company_name)
+    
+    twitter_info = []
+    twitter_handle = None
+    
+    for link in page.links:
+        if "search?" not in link:
+            handle_match = TWITTER_HANDLE_RE.search(link)
+            if handle_match:
+                twitter_handle = handle_match.group(1)
+                break
+    
+    for result in page.results:
+        if "Twitter" in result.title and len(result.snippet) > 20:
+            twitter_info.append(f"Twitter Info: {result.snippet}")
+    
+    if twitter_handle:
+        twitter_info.insert(0, f"Twitter Handle: @{twitter_handle}")
+            
+    return "\n\n".join(twitter_info[:5])
+
+def fetch_company_reviews(company):
+    """Fetch company reviews from Google"""
+    page = search_page("reviews", company)
+    
+    review_snippets = []
+    for result in page.results:
+        if "review" in result.snippet.lower() and len(result.snippet) > 50:
+            review_snippets.append(result.snippet)
+            
+    return "\n\n".join(review_snippets[:5])
+
+def fetch_financial_data(ticker, use_cache=True):
+    """Fetch financial data if ticker symbol is provided, returning (financial_data, cache_state)"""
+    if not ticker:
+        return None, "miss"
+
+    return get_market_data().get(ticker, refresh=not use_cache)
+
+# Per-source deadlines (seconds) for a research run. Sources that miss their
+# deadline are reported as timed out and left out of the results.
+COLLECTION_DEADLINE = 45
+MAX_COLLECTION_WORKERS = 8
+COLLECTION_SOURCES = {
+    "website": ("Finding company website...", 12),
+    "website_pages": ("Extracting website content...", 20),
+    "logo": ("Finding company logo...", 15),
+    "news": ("Collecting news articles...", 12),
+    "linkedin": ("Finding LinkedIn information...", 12),
+    "twitter": ("Finding Twitter information...", 12),
+    "reviews": ("Finding company reviews...", 12),
+    "financial": ("Fetching financial data...", 20),
+}
+
+def format_website_pages(pages):
+    """Join crawled pages into one text, each under its title and URL"""
+    return "\n\n".join(f"## {page['title'] or page['url']}\n{page['url']}\n\n{page['text']}" for page in pages)
+
+def format_financial_summary(financial_data):
+    """Format the headline financial figures used as a data source"""
+    info = financial_data["info"]
+    financial_summary = f"Market Cap: ${info.get('marketCap', 'N/A')}\n"
+    financial_summary += f"Industry: {info.get('industry', 'N/A')}\n"
+    financial_summary += f"Employees: {info.get('fullTimeEmployees', 'N/A')}\n"
+    financial_summary += f"Revenue: ${info.get('totalRevenue', 'N/A')}"
+    return financial_summary
+
+def is_cacheable(value):
+    """Only keep real results in the research cache, not empty ones"""
+    return bool(value)
+
+def fetch_source(source, key, use_cache, fn, *args):
+    """Run a fetcher through the research cache, returning (value, cache_state)"""
+    company, domain, ticker = key
+    return get_cache().get_or_fetch(company, domain, ticker, source, lambda: fn(*args),
+                                    cacheable=is_cacheable, refresh=not use_cache)
+
+def source_hashes(company_data):
+    """Hash of the prompt-facing content of each collected source"""
+    hashes = {}
+    for page in company_data.get("website_pages", []):
+        hashes.setdefault("website_pages", hashlib.sha256())
+        hashes["website_pages"].update(f"{page['url']}\x1f{page['text']}\x1e".encode("utf-8"))
+    for source in ("news", "linkedin", "twitter", "reviews"):
+        if company_data.get(source):
+            hashes[source] = hashlib.sha256(company_data[source].encode("utf-8"))
+    if company_data.get("financial"):
+        hashes["financial"] = hashlib.sha256(format_financial_summary(company_data["financial"]).encode("utf-8"))
+    return {source: digest.hexdigest()[:16] for source, digest in hashes.items()}
+
+def changed_sources(company_name, company_domain, ticker_symbol, hashes):
+    """Sources whose content differs from the last research of this company, or None the first time
+
+    The new hashes replace the stored ones.
+    """
+    key = cache_key(company_name, company_domain, ticker_symbol, "source_hashes")
+    cached = get_cache().get(key)
+    get_cache().set(key, "source_hashes", hashes)
+    if cached is None:
+        return None
+    previous = cached[0]
+    return sorted(source for source in set(previous) | set(hashes) if previous.get(source) != hashes.get(source))
+
+def stored_summary(company_name, version):
+    """Summary generated for this exact data version in an earlier run or process, or None"""
+    cached = get_cache().get(cache_key(company_name, "", "", "summary")) if version else None
+    if cached and cached[0]["data_version"] == version:
+        return cached[0]["text"]
+    return None
+
+def store_summary(company_name, version, text):
+    """Keep a summary for this data version in the response cache and the persistent research cache"""
+    get_response_cache().put("summary", company_name, version, "", text)
+    if version and text:
+        get_cache().set(cache_key(company_name, "", "", "summary"), "summary", {"data_version": version, "text": text})
+
+def source_label(source, ticker_symbol=""):
+    """Human readable progress label for a source"""
+    if source == "financial" and ticker_symbol:
+        return f"Fetching financial data for {ticker_symbol}..."
+    return COLLECTION_SOURCES[source][0]
+
+def run_collection(company_name, company_domain="", ticker_symbol="", deadline=COLLECTION_DEADLINE, use_cache=True,
+                   progress=None, on_result=None):
+    """Run the source fetchers concurrently and return whatever finished in time
+
+    The website and logo steps wait on URL discovery; every other source
+    starts immediately. Each source has its own deadline, capped by the
+    overall deadline. Results come from the research cache when a usable
+    entry exists. Each source runs in a metrics Span, and the run's spans
+    are returned as its trace.
+
+    progress, if given, is called from the calling thread as
+    progress(source, state, detail) with state "running", "complete",
+    "error", "timeout" or "info". Fetchers that raise are reported as
+    errors rather than aborting the run. on_result(source, value), if
+    given, is called with each source's value as soon as it lands.
+    """
+    results = {}
+    cache_states = {}
+    errors = {}
+    timed_out = []
+    timings = {}
+    pending = {}
+    spans = {}
+    notify = progress or (lambda source, state, detail: None)
+
+    executor = ThreadPoolExecutor(max_workers=MAX_COLLECTION_WORKERS)
+    trace = RunTrace(company_name)
+    started = time.monotonic()
+    hooks.emit("collection_started", company=company_name, domain=company_domain, ticker=ticker_symbol)
+    overall_deadline = started + deadline
+
+    def submit(source, key, fn, *args):
+        source_deadline = COLLECTION_SOURCES[source][1]
+        notify(source, "running", source_label(source, ticker_symbol))
+        hooks.emit("source_started", company=company_name, source=source)
+        submitted = time.monotonic()
+        spans[source] = Span(source)
+        if key is None:
+            # The fetcher does its own caching and returns (value, cache_state)
+            future = executor.submit(spans[source].run, fn, *args)
+        else:
+            future = executor.submit(spans[source].run, fetch_source, source, key, use_cache, fn, *args)
+        pending[future] = (source, submitted, min(submitted + source_deadline, overall_deadline))
+
+    def on_website(website_url):
+        if website_url:
+            notify("website", "info", f"Website: {website_url}")
+            submit("website_pages", (company_name, website_url, ""), scrape_website_pages, website_url)
+        submit("logo", (company_name, website_url, ""), fetch_logo, company_name, website_url)
+
+    submit("website", (company_name, company_domain, ""), fetch_company_website, company_name, company_domain)
+    submit("news", (company_name, "", ""), fetch_google_news, company_name)
+    submit("linkedin", (company_name, "", ""), fetch_linkedin_info, company_name)
+    submit("twitter", (company_name, "", ""), fetch_twitter_info, company_name)
+    submit("reviews", (company_name, "", ""), fetch_company_reviews, company_name)
+    if ticker_symbol:
+        submit("financial", None, fetch_financial_data, ticker_symbol, use_cache)
+
+    try:
+        while pending:
+            next_deadline = min(source_deadline for _, _, source_deadline in pending.values())
+            done, _ = wait(pending, timeout=max(0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                source, submitted, _ = pending.pop(future)
+                timings[source] = time.monotonic() - submitted
+                try:
+                    results[source], cache_states[source] = future.result()
+                    cached = cache_states[source] in ("hit", "stale")
+                    trace.finish(spans[source], "cached" if cached else "ok" if results[source] else "empty",
+                                 cache_state=cache_states[source])
+                    notify(source, "complete", "cached" if cached else f"{timings[source]:.1f}s")
+                    if on_result:
+                        on_result(source, results[source])
+                    hooks.emit("source_finished", company=company_name, source=source,
+                               elapsed=timings[source], cache_state=cache_states[source])
+                except Exception as e:
+                    results[source] = None
+                    errors[source] = f"{type(e).__name__}: {e}"
+                    trace.finish(spans[source], "error")
+                    notify(source, "error", errors[source])
+                    hooks.emit("source_failed", company=company_name, source=source,
+                               elapsed=timings[source], error=e)
+                if source == "website":
+                    on_website(results[source])
+
+            now = time.monotonic()
+            for future, (source, submitted, source_deadline) in list(pending.items()):
+                if now >= source_deadline:
+                    del pending[future]
+                    future.cancel()
+                    timed_out.append(source)
+                    timings[source] = now - submitted
+                    trace.finish(spans[source], "timeout")
+                    notify(source, "timeout", f"after {timings[source]:.1f}s")
+                    hooks.emit("source_timeout", company=company_name, source=source, elapsed=timings[source])
+                    if source == "website":
+                        on_website(None)
+    finally:
+        # Stragglers keep running until their own request timeouts, but
+        # nobody waits on them.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.monotonic() - started
+    trace.close()
+    hooks.emit("collection_finished", company=company_name, elapsed=elapsed,
+               sources=sorted(source for source, value in results.items() if value), timed_out=list(timed_out))
+    return {
+        "results": results,
+        "cache_states": cache_states,
+        "errors": errors,
+        "timed_out": timed_out,
+        "timings": timings,
+        "elapsed": elapsed,
+        "trace": trace,
+    }
+
+def collect_company_data(company_name, company_domain="", ticker_symbol="", use_cache=True, progress=None,
+                         on_result=None):
+    """Collect data about a company from multiple sources"""
+    data = {}
+    data_sources = []
+
+    collection = run_collection(company_name, company_domain, ticker_symbol, use_cache=use_cache, progress=progress,
+                                on_result=on_result)
+    results = collection["results"]
+
+    website_url = results.get("website")
+    if website_url:
+        data["website_url"] = website_url
+
+    website_pages = results.get("website_pages")
+    if website_pages:
+        website_content = format_website_pages(website_pages)
+        data["website_pages"] = website_pages
+        data["website_content"] = website_content
+        data_sources.append(f"COMPANY WEBSITE CONTENT:\n{website_content[:2000]}...[truncated]")
+
+    logo = results.get("logo")
+    # Records cached before logos were stored locally are bare URLs; they are ignored until refreshed
+    if isinstance(logo, dict):
+        data["logo"] = logo
+        data["logo_url"] = logo["url"]
+
+    news_content = results.get("news")
+    if news_content:
+        data["news"] = news_content
+        data_sources.append(f"RECENT NEWS ABOUT {company_name.upper()}:\n{news_content}")
+
+    linkedin_info = results.get("linkedin")
+    if linkedin_info:
+        data["linkedin"] = linkedin_info
+        data_sources.append(f"LINKEDIN INFORMATION ABOUT {company_name.upper()}:\n{linkedin_info}")
+
+    twitter_info = results.get("twitter")
+    if twitter_info:
+        data["twitter"] = twitter_info
+        data_sources.append(f"TWITTER INFORMATION ABOUT {company_name.upper()}:\n{twitter_info}")
+
+    reviews = results.get("reviews")
+    if reviews:
+        data["reviews"] = reviews
+        data_sources.append(f"COMPANY REVIEWS FOR {company_name.upper()}:\n{reviews}")
+
+    financial_data = results.get("financial")
+    if financial_data:
+        data["financial"] = financial_data
+        data_sources.append(f"FINANCIAL DATA FOR {company_name.upper()} ({ticker_symbol}):\n{format_financial_summary(financial_data)}")
+
+    summary = f"Data collected about {company_name}:\n"
+    if "website_content" in data:
+        summary += "✅ Company Website Content\n"
+    if "news" in data:
+        summary += "✅ Recent News Articles\n"
+    if "linkedin" in data:
+        summary += "✅ LinkedIn Information\n"
+    if "twitter" in data:
+        summary += "✅ Twitter Information\n"
+    if "reviews" in data:
+        summary += "✅ Company Reviews\n"
+    if "financial" in data:
+        summary += f"✅ Financial Data (Ticker: {ticker_symbol})\n"
+    for source in collection["timed_out"]:
+        summary += f"⏱️ {source} timed out\n"
+    for source in collection["errors"]:
+        summary += f"⚠️ {source} failed\n"
+
+    data["summary"] = summary
+    data["data_sources"] = data_sources
+    data["facts"] = extract_facts(data)
+    data["timed_out"] = collection["timed_out"]
+    data["timings"] = collection["timings"]
+    data["cache_states"] = collection["cache_states"]
+    data["errors"] = collection["errors"]
+    data["trace"] = collection["trace"].to_dict()
+    data["data_version"] = data_version(data, (company_name, company_domain, ticker_symbol))
+    data["source_hashes"] = source_hashes(data)
+    data["changed_sources"] = changed_sources(company_name, company_domain, ticker_symbol, data["source_hashes"])
+    # Answers about this company's previous data no longer apply
+    get_response_cache().invalidate(company_name, keep_version=data["data_version"])
+    data["last_update"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    return data
+
+# Token budgets for prompts; completions are reserved out of the model context
+SUMMARY_PROMPT_TOKENS = 12_000
+SUMMARY_MAX_TOKENS = 500
+CHAT_PROMPT_TOKENS = 12_000
+CHAT_MAX_TOKENS = 800
+CHAT_QUESTION_TOKENS = 1_000
+CHAT_CONTEXT_TOKENS = 7_000
+CHAT_HISTORY_TOKENS = 4_000
+CHAT_HISTORY_SUMMARY_TOKENS = 600
+# Prefix of the text stored in place of a summary the LLM failed to produce
+SUMMARY_ERROR = "Error generating summary: "
+
+def create_combined_text(company_data, budget=None):
+    """Create combined text from all data sources, sharing the budget's remaining tokens between them"""
+    combined = []
+    
+    if "data_sources" in company_data:
+        combined = company_data["data_sources"]
+    if budget is not None:
+        combined = budget.share("sources", combined)
+    
+    full_text = "\n\n" + "-"*50 + "\n\n".join(combined)
+    return full_text
+
+def stream_company_summary(company_name, company_data):
+    """Start a streaming AI summary of the company based on collected data, or replay a cached one
+
+    A summary is reused for as long as the data it was generated from is
+    unchanged, across sessions and restarts.
+    """
+    version = company_data.get("data_version")
+    cached = get_response_cache().get("summary", company_name, version, "")
+    if cached is None:
+        cached = stored_summary(company_name, version)
+    if cached is not None:
+        return CachedStream(cached, model=DEFAULT_MODEL, kind="summary")
+
+    budget = ContextBudget(min(SUMMARY_PROMPT_TOKENS, MODEL_CONTEXT_TOKENS - SUMMARY_MAX_TOKENS))
+
+    system_message = f"""You are a business intelligence analyst. 
+    Create a concise but comprehensive summary of {company_name} based on the information provided.
+    Include what the company does, key products/services, market position, and any other notable information.
+    Keep your summary to 3-4 paragraphs maximum.
+    Only use information from the provided data.
+    """
+    request = f"Here is the collected data about {company_name}. Please summarize it:\n"
+    system_message = budget.take("system", system_message)
+    request = budget.take("instructions", request)
+    combined_text = create_combined_text(company_data, budget)
+    
+    messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": f"{request}{combined_text}"}
+    ]
+    
+    return ChatStream(get_llm_client(), messages, model=DEFAULT_MODEL, kind="summary", budget=budget.report(),
+                      on_complete=lambda text: store_summary(company_name, version, text),
+                      max_tokens=SUMMARY_MAX_TOKENS, temperature=0.3)
+
+def generate_company_summary(company_name, company_data):
+    """Generate an AI summary of the company based on collected data"""
+    if not company_data:
+        return "No data available to generate summary."
+    
+    stream = stream_company_summary(company_name, company_data)
+    summary = stream.consume()
+    if stream.error:
+        return f"{SUMMARY_ERROR}{stream.error}"
+    return summary
+
+def compact_turn(message):
+    """One summary line for an earlier chat message"""
+    first_sentence = re.split(r"(?<=[.!?])\s", " ".join(message["content"].split()), maxsplit=1)[0]
+    speaker = "User asked" if message["role"] == "user" else "Assistant answered"
+    return f"- {speaker}: {first_sentence}"
+
+def build_chat_messages(company_name, question, index, chat_history, top_k=24, budget=None, instructions=None):
+    """Messages for a chat answer: retrieved context plus as much history as fits
+
+    chat_history is expected to end with the user's question. The prompt
+    budget goes to the instructions and question first, then the best
+    matching chunks, then the most recent turns verbatim; turns too old to
+    fit are kept as a one-line-per-message summary instead of being dropped.
+    """
+    budget = budget or ContextBudget(min(CHAT_PROMPT_TOKENS, MODEL_CONTEXT_TOKENS - CHAT_MAX_TOKENS))
+    instructions = budget.take("system", instructions or f"""You are a company intelligence assistant for {company_name}.
+    Use ONLY the following information to answer questions about {company_name}.
+    Be concise, factual, and only use the information provided.
+    If you don't know something, admit it rather than making up information.
+    """)
+    *earlier, last = chat_history or [{"role": "user", "content": question}]
+    last = dict(last, content=budget.take("question", last["content"], max_tokens=CHAT_QUESTION_TOKENS))
+
+    # Retrieve only the chunks relevant to this question, best first, as many as fit
+    results = index.search(question, top_k) or index.overview(top_k)
+    results, _ = budget.select("context", results, text_of=lambda result: result[1]["text"],
+                               max_tokens=CHAT_CONTEXT_TOKENS)
+    context = format_context(results)
+
+    recent, older = budget.select("history", reversed(earlier), text_of=lambda message: message["content"],
+                                  max_tokens=min(CHAT_HISTORY_TOKENS, budget.remaining - CHAT_HISTORY_SUMMARY_TOKENS),
+                                  overhead=MESSAGE_OVERHEAD_TOKENS, contiguous=True)
+    history_summary = ""
+    if older:
+        lines, omitted = budget.select("history_summary", [compact_turn(message) for message in older],
+                                       max_tokens=CHAT_HISTORY_SUMMARY_TOKENS, contiguous=True)
+        if omitted:
+            lines.append(f"- ({len(omitted)} earlier messages omitted)")
+        history_summary = "\n\n    EARLIER CONVERSATION (summary):\n" + "\n".join(reversed(lines))
+
+    system_message = f"""{instructions}
+    COMPANY INFORMATION:
+    {context}{history_summary}
+    """
+    
+    messages = [
+        {"role": "system", "content": system_message},
+    ]
+    
+    messages.extend(reversed(recent))
+    messages.append(last)
+    return messages
+
+def stream_chat_answer(company_name, question, index, chat_history, top_k=24, data_version=None, facts=None):
+    """Start a streaming answer to a question about the company
+
+    A factual question the company's fact table can answer is answered from
+    it without calling the model. With a data_version, answers are cached
+    and an earlier answer to the same (or a near-identical) question about
+    the same data, asked after the same earlier turns, is replayed.
+    """
+    answer = answer_from_facts(company_name, question, facts)
+    if answer is not None:
+        return CachedStream(answer, model="facts", kind="chat", source="facts")
+
+    context = conversation_context(chat_history)
+    cached = get_response_cache().get("chat", company_name, data_version, question, context)
+    if cached is not None:
+        return CachedStream(cached, model=DEFAULT_MODEL, kind="chat")
+
+    budget = ContextBudget(min(CHAT_PROMPT_TOKENS, MODEL_CONTEXT_TOKENS - CHAT_MAX_TOKENS))
+    messages = build_chat_messages(company_name, question, index, chat_history, top_k=top_k, budget=budget)
+    return ChatStream(get_llm_client(), messages, model=DEFAULT_MODEL, kind="chat", budget=budget.report(),
+                      on_complete=lambda text: get_response_cache().put("chat", company_name, data_version, question, text,
+                                                                        context),
+                      max_tokens=CHAT_MAX_TOKENS, temperature=0.5)
@@ -0,0 +1,372 @@
+"""Record and replay the pipeline's outside world
+
+A Cassette holds everything a research run fetched from outside the process:
+HTTP responses, streamed LLM completions and Yahoo Finance lookups.
+`recording()` wraps the live HTTP transport, LLM client and ticker factory so
+a run captures into a cassette. `replaying()` swaps in stand-ins that serve
+the cassette instead, so the whole pipeline, from collect_company_data
+through the summary and chat answers, runs offline and deterministically.
+
+A Latency profile adds delays during replay: fixed HTTP and LLM delays with
+optional seeded jitter, or the timings recorded with each response scaled by
+a factor. Cassettes are gzipped pickles, like the research cache's values,
+so DataFrames and raw bodies round-trip exactly.
+
+    with replaying(Cassette.load("acme.cassette"), Latency(http=0.05)):
+        data = collect_company_data("Acme", use_cache=False)
+"""
+import gzip
+import hashlib
+import json
+import pickle
+import random
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pandas as pd
+
+import http_client
+import market_data
+import pipeline
+from http_client import HttpResponse
+
+CASSETTE_VERSION = 1
+
+
+class FixtureMissing(LookupError):
+    """Raised in strict replay when a request was never recorded"""
+
+
+def llm_key(model, messages):
+    """Stable key for a completion request"""
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+class Cassette:
+    """Recorded HTTP responses, LLM completions and ticker lookups"""
+
+    def __init__(self, meta=None):
+        self.meta = dict(meta or {})
+        self.http = {}
+        self.llm = {}
+        self.tickers = {}
+        self.default_http = None
+        self.default_llm = None
+        self._lock = threading.Lock()
+
+    def add_http(self, method, url, status_code, headers=None, content=b"", elapsed=0.0):
+        with self._lock:
+            self.http.setdefault(f"{method} {url}", []).append(
+                {"url": url, "status_code": status_code, "headers": dict(headers or {}), "content": content,
+                 "elapsed": elapsed})
+
+    def add_llm(self, key, deltas, usage=None, first_token=0.0, duration=0.0):
+        """Record a completion; key None sets the reply used for prompts that were never recorded"""
+        entry = {"deltas": list(deltas), "usage": usage, "first_token": first_token, "duration": duration}
+        with self._lock:
+            if key is None:
+                self.default_llm = entry
+            else:
+                self.llm[key] = entry
+
+    def add_ticker(self, symbol, info=None, history=None, history_args=None):
+        with self._lock:
+            entry = self.tickers.setdefault(symbol.upper(), {"info": None, "history": {}})
+            if info is not None:
+                entry["info"] = info
+            if history is not None:
+                entry["history"][history_args] = history
+
+    def save(self, path):
+        with self._lock:
+            state = {"version": CASSETTE_VERSION, "meta": self.meta, "http": self.http, "llm": self.llm,
+                     "tickers": self.tickers, "default_http": self.default_http, "default_llm": self.default_llm}
+        with gzip.open(path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version {state.get('version')}")
+        cassette = cls(state["meta"])
+        cassette.http = state["http"]
+        cassette.llm = state["llm"]
+        cassette.tickers = state["tickers"]
+        cassette.default_http = state["default_http"]
+        cassette.default_llm = state["default_llm"]
+        return cassette
+
+    def stats(self):
+        with self._lock:
+            return {"http": sum(len(responses) for responses in self.http.values()), "llm": len(self.llm),
+                    "tickers": len(self.tickers)}
+
+
+class Latency:
+    """Delays injected during replay
+
+    With scale set, each response waits for its recorded timing multiplied
+    by scale; otherwise the fixed delays below are used. jitter is a
+    fraction (0.2 is +/-20%) drawn from a generator seeded with seed.
+    """
+
+    def __init__(self, http=0.0, llm_first_token=0.0, llm_per_token=0.0, scale=None, jitter=0.0, seed=0):
+        self.http = http
+        self.llm_first_token = llm_first_token
+        self.llm_per_token = llm_per_token
+        self.scale = scale
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, fixed, recorded=0.0):
+        seconds = recorded * self.scale if self.scale is not None else fixed
+        if seconds > 0 and self.jitter:
+            with self._lock:
+                seconds *= 1 + self._random.uniform(-self.jitter, self.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+NO_LATENCY = Latency()
+
+
+class RecordingTransport:
+    """HTTP transport that records every response from the wrapped transport
+
+    It only implements send(), so streamed requests are read up to their
+    byte cap while recording; replay serves the same bytes.
+    """
+
+    def __init__(self, transport, cassette):
+        self.transport = transport
+        self.cassette = cassette
+
+    def send(self, method, url, headers, timeout, max_bytes):
+        response = self.transport.send(method, url, headers, timeout, max_bytes)
+        self.cassette.add_http(method, url, response.status_code, response.headers, response.content,
+                               response.elapsed)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class ReplayTransport:
+    """HTTP transport that serves recorded responses
+
+    Repeated requests for one URL get its recorded responses in order, the
+    last one repeating. Unrecorded URLs get the cassette's default response,
+    a 404, or FixtureMissing when strict.
+    """
+
+    def __init__(self, cassette, latency=NO_LATENCY, strict=False):
+        self.cassette = cassette
+        self.latency = latency
+        self.strict = strict
+        self.misses = []
+        self._served = {}
+        self._lock = threading.Lock()
+
+    def send(self, method, url, headers, timeout, max_bytes):
+        key = f"{method} {url}"
+        responses = self.cassette.http.get(key)
+        if responses:
+            with self._lock:
+                index = self._served.get(key, 0)
+                self._served[key] = index + 1
+            recorded = responses[min(index, len(responses) - 1)]
+        else:
+            with self._lock:
+                self.misses.append(key)
+            if self.strict:
+                raise FixtureMissing(key)
+            recorded = self.cassette.default_http or {"url": url, "status_code": 404, "headers": {},
+                                                      "content": b"", "elapsed": 0.0}
+        self.latency.delay(self.latency.http, recorded["elapsed"])
+        content = recorded["content"]
+        truncated = bool(max_bytes) and len(content) > max_bytes
+        if truncated:
+            content = content[:max_bytes]
+        return HttpResponse(recorded["url"] if responses else url, recorded["status_code"], recorded["headers"],
+                            content, truncated=truncated, elapsed=recorded["elapsed"])
+
+    def close(self):
+        pass
+
+
+def _chunk(delta=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=delta))] if delta is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class _RecordingCompletions:
+    def __init__(self, completions, cassette):
+        self.completions = completions
+        self.cassette = cassette
+
+    def create(self, model, messages, stream=False, **params):
+        key = llm_key(model, messages)
+        started = time.monotonic()
+        response = self.completions.create(model=model, messages=messages, stream=stream, **params)
+        if not stream:
+            message = response.choices[0].message.content
+            self.cassette.add_llm(key, [message], usage=_usage_dict(response.usage),
+                                  duration=time.monotonic() - started)
+            return response
+        return self._record_stream(key, response, started)
+
+    def _record_stream(self, key, stream, started):
+        deltas, usage, first_token = [], None, None
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage = _usage_dict(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token is None:
+                    first_token = time.monotonic() - started
+                deltas.append(chunk.choices[0].delta.content)
+            yield chunk
+        self.cassette.add_llm(key, deltas, usage=usage, first_token=first_token or 0.0,
+                              duration=time.monotonic() - started)
+
+
+def _usage_dict(usage):
+    if usage is None:
+        return None
+    return {name: getattr(usage, name, None) for name in ("prompt_tokens", "completion_tokens", "total_tokens")}
+
+
+class RecordingLLMClient:
+    """OpenAI-style client wrapper that records each completion"""
+
+    def __init__(self, client, cassette):
+        self.chat = SimpleNamespace(completions=_RecordingCompletions(client.chat.completions, cassette))
+
+
+class _ReplayCompletions:
+    def __init__(self, cassette, latency, strict):
+        self.cassette = cassette
+        self.latency = latency
+        self.strict = strict
+        self.misses = []
+
+    def create(self, model, messages, stream=False, **params):
+        key = llm_key(model, messages)
+        entry = self.cassette.llm.get(key)
+        if entry is None:
+            self.misses.append(key)
+            if self.strict or self.cassette.default_llm is None:
+                raise FixtureMissing(f"LLM completion {key}")
+            entry = self.cassette.default_llm
+        usage = SimpleNamespace(**entry["usage"]) if entry["usage"] else None
+        if not stream:
+            self.latency.delay(self.latency.llm_first_token, entry["duration"])
+            message = SimpleNamespace(content="".join(entry["deltas"]))
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+        return self._replay_stream(entry, usage)
+
+    def _replay_stream(self, entry, usage):
+        deltas = entry["deltas"]
+        self.latency.delay(self.latency.llm_first_token, entry["first_token"])
+        per_token = (entry["duration"] - entry["first_token"]) / max(len(deltas) - 1, 1)
+        for index, delta in enumerate(deltas):
+            if index:
+                self.latency.delay(self.latency.llm_per_token, per_token)
+            yield _chunk(delta)
+        if usage is not None:
+            yield _chunk(usage=usage)
+
+
+class ReplayLLMClient:
+    """OpenAI-style client that streams recorded completions
+
+    Prompts that were never recorded get the cassette's default reply, or
+    FixtureMissing when strict or when there is none.
+    """
+
+    def __init__(self, cassette, latency=NO_LATENCY, strict=False):
+        self.completions = _ReplayCompletions(cassette, latency, strict)
+        self.chat = SimpleNamespace(completions=self.completions)
+
+    @property
+    def misses(self):
+        return self.completions.misses
+
+
+class RecordingTicker:
+    """yfinance Ticker wrapper that records info and history lookups"""
+
+    def __init__(self, ticker, cassette, factory):
+        self.ticker = ticker
+        self.cassette = cassette
+        self.stock = factory(ticker)
+
+    @property
+    def info(self):
+        info = self.stock.info
+        self.cassette.add_ticker(self.ticker, info=dict(info or {}))
+        return info
+
+    def history(self, **kwargs):
+        history = self.stock.history(**kwargs)
+        self.cassette.add_ticker(self.ticker, history=history, history_args=tuple(sorted(kwargs.items())))
+        return history
+
+
+class ReplayTicker:
+    """Stand-in for a yfinance Ticker serving recorded lookups"""
+
+    def __init__(self, ticker, cassette, latency=NO_LATENCY):
+        self.entry = cassette.tickers.get(ticker.upper(), {"info": None, "history": {}})
+        self.latency = latency
+
+    @property
+    def info(self):
+        self.latency.delay(self.latency.http)
+        return dict(self.entry["info"] or {})
+
+    def history(self, **kwargs):
+        self.latency.delay(self.latency.http)
+        recorded = self.entry["history"]
+        history = recorded.get(tuple(sorted(kwargs.items())))
+        if history is None and recorded:
+            history = next(iter(recorded.values()))
+        return history.copy() if history is not None else pd.DataFrame()
+
+
+@contextmanager
+def _installed(transport, llm_client, ticker_factory):
+    """Point the HTTP client, LLM client and market data at the given stand-ins, restoring them afterwards"""
+    previous_http = http_client.set_client(http_client.HttpClient(transport=transport))
+    previous_llm = pipeline.set_llm_client(llm_client)
+    previous_market = market_data.set_market_data(market_data.MarketData(ticker_factory=ticker_factory))
+    try:
+        yield
+    finally:
+        http_client.set_client(previous_http)
+        pipeline.set_llm_client(previous_llm)
+        market_data.set_market_data(previous_market)
+
+
+@contextmanager
+def recording(cassette, transport=None, llm_client=None, ticker_factory=None):
+    """Run the block against the live world, capturing everything into cassette"""
+    transport = RecordingTransport(transport or http_client.RequestsTransport(), cassette)
+    llm_client = RecordingLLMClient(llm_client or pipeline.get_llm_client(), cassette)
+    factory = ticker_factory or market_data.yahoo_ticker
+    with _installed(transport, llm_client, lambda ticker: RecordingTicker(ticker, cassette, factory)):
+        yield cassette
+
+
+@contextmanager
+def replaying(cassette, latency=NO_LATENCY, strict=False):
+    """Run the block offline against cassette; yields (transport, llm_client) for their miss lists"""
+    transport = ReplayTransport(cassette, latency, strict=strict)
+    llm_client = ReplayLLMClient(cassette, latency, strict=strict)
+    with _installed(transport, llm_client, lambda ticker: ReplayTicker(ticker, cassette, latency)):
+        yield transport, llm_client
@@ -0,0 +1,225 @@
+"""Persistent on-disk cache for research results
+
+Entries are keyed by (company_name, domain, ticker, source) and stored as
+compressed pickles in a single SQLite file, so they survive restarts and are
+shared by every session served by the process. Each source type has its own
+TTL, the file is kept under a byte budget by evicting the least recently used
+entries, and expired entries can be served while a background refresh runs.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "COMPANYBOT_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "companybot", "research.sqlite3"),
+)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# How long an expired entry may still be served while it is being refreshed
+DEFAULT_MAX_STALE = 7 * 24 * 3600
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+SOURCE_TTLS = {
+    "website": 7 * DAY,
+    "website_pages": 3 * DAY,
+    "logo": 30 * DAY,
+    "news": 30 * MINUTE,
+    "linkedin": 7 * DAY,
+    "twitter": 1 * DAY,
+    "reviews": 3 * DAY,
+    # Validators and text of single crawled pages, for conditional re-fetches
+    "page": 30 * DAY,
+    "source_hashes": 30 * DAY,
+    "summary": 30 * DAY,
+}
+DEFAULT_TTL = 1 * DAY
+
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_OPEN = (9, 30)
+MARKET_CLOSE = (16, 0)
+MARKET_OPEN_TTL = 15 * MINUTE
+
+
+def financial_ttl(now=None):
+    """TTL for market data: short while the US market is open, else until the next open"""
+    now = now or datetime.now(MARKET_TZ)
+    now = now.astimezone(MARKET_TZ)
+    open_today = now.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0, microsecond=0)
+    close_today = now.replace(hour=MARKET_CLOSE[0], minute=MARKET_CLOSE[1], second=0, microsecond=0)
+
+    if now.weekday() < 5 and open_today <= now < close_today:
+        return MARKET_OPEN_TTL
+
+    next_open = open_today if now < open_today else open_today + timedelta(days=1)
+    while next_open.weekday() >= 5:
+        next_open += timedelta(days=1)
+    return max(MARKET_OPEN_TTL, (next_open - now).total_seconds())
+
+
+def source_ttl(source):
+    """TTL in seconds for a source type"""
+    if source == "financial":
+        return financial_ttl()
+    return SOURCE_TTLS.get(source, DEFAULT_TTL)
+
+
+def cache_key(company_name, domain, ticker, source):
+    """Stable key for a (company_name, domain, ticker, source) tuple"""
+    parts = [
+        (company_name or "").strip().lower(),
+        (domain or "").strip().lower().rstrip("/"),
+        (ticker or "").strip().upper(),
+        source,
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResearchCache:
+    """SQLite-backed cache with per-source TTLs and LRU eviction"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, max_stale=DEFAULT_MAX_STALE,
+                 serve_stale=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_stale = max_stale
+        self.serve_stale = serve_stale
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    expires REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def get(self, key):
+        """Return (value, fresh) for a key, or None when missing or too stale"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires = row
+            if now > expires + self.max_stale:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return pickle.loads(zlib.decompress(value)), now <= expires
+
+    def set(self, key, source, value, ttl=None):
+        """Store a value and evict least recently used entries over the byte budget"""
+        blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        now = time.time()
+        ttl = source_ttl(source) if ttl is None else ttl
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, source, value, size, created, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, source, blob, len(blob), now, now + ttl, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def stats(self):
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": count, "bytes": size, "max_bytes": self.max_bytes}
+
+    def _refresh(self, key, source, fetch, cacheable):
+        try:
+            value = fetch()
+            if cacheable(value):
+                self.set(key, source, value)
+        except Exception:
+            logger.warning("Background refresh of %s failed", key, exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_fetch(self, company_name, domain, ticker, source, fetch, cacheable=bool, refresh=False):
+        """Return (value, state) for a source, fetching it on a miss
+
+        state is "hit", "stale" or "miss". Stale entries are returned as-is
+        while a single background refresh per key updates the cache.
+        """
+        key = cache_key(company_name, domain, ticker, source)
+        cached = None if refresh else self.get(key)
+
+        if cached is not None:
+            value, fresh = cached
+            if fresh:
+                return value, "hit"
+            if self.serve_stale:
+                with self._lock:
+                    start_refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start_refresh:
+                    threading.Thread(
+                        target=self._refresh, args=(key, source, fetch, cacheable), daemon=True
+                    ).start()
+                return value, "stale"
+
+        value = fetch()
+        if cacheable(value):
+            self.set(key, source, value)
+        return value, "miss"
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide research cache, opening it on first use"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResearchCache()
+        return _cache
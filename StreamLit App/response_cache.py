@@ -0,0 +1,180 @@
+"""Cache of LLM answers per company data version
+
+Summaries and chat answers depend only on the collected data and the
+question, so an answer is reused while both are unchanged. Entries are keyed
+on the data version (a hash of the company and everything that feeds the
+prompts) plus the normalized prompt. A question that differs only in case,
+punctuation, filler words or the company's own name can also be matched to
+an earlier one through a small token-overlap index; question words and
+negations count as terms, so "who founded it?" never answers "when was it
+founded?". Entries expire after a TTL, the cache is a bounded LRU shared by
+every session, and when a company is researched again, answers for its
+previous data versions are dropped.
+
+Chat answers are also keyed on a hash of the conversation before the
+question, since a follow-up such as "why?" or "and the year before?" means
+something different in every conversation. Only the same question asked
+after the same turns, which in practice is mostly an opening question,
+replays an earlier answer.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from retrieval import tokenize
+
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_ENTRIES = 1024
+NEAR_DUPLICATE_THRESHOLD = 0.9
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+# Retrieval stopwords that change what a question asks, kept as match terms
+KEPT_WORDS = frozenset("who what when where why how which not no never".split())
+
+
+def data_version(company_data, company=("", "", "")):
+    """Hash of a company and everything shown or prompted for it
+
+    company is (name, domain, ticker). It is part of the hash so two
+    companies whose sources all came back empty still get different
+    versions. The sources, website pages, price history version and fact
+    table make up the rest.
+    """
+    name, domain, ticker = company
+    digest = hashlib.sha256()
+    for part in (name.strip().lower(), domain.strip().lower().rstrip("/"), ticker.strip().upper()):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x1f")
+    for source in company_data.get("data_sources", []):
+        digest.update(source.encode("utf-8"))
+        digest.update(b"\x1e")
+    for page in company_data.get("website_pages", []):
+        digest.update(page["url"].encode("utf-8"))
+        digest.update(page["text"].encode("utf-8"))
+        digest.update(b"\x1e")
+    financial = company_data.get("financial")
+    if financial:
+        # The history version changes with every new price, which the sources do not show
+        digest.update(str(financial.get("version")).encode("utf-8"))
+        digest.update(b"\x1e")
+    digest.update(json.dumps(company_data.get("facts") or {}, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def conversation_context(chat_history):
+    """Hash of the turns before the last message of a chat history; "" when there are none"""
+    earlier = (chat_history or [])[:-1]
+    if not earlier:
+        return ""
+    digest = hashlib.sha256()
+    for message in earlier:
+        digest.update(message["role"].encode("utf-8"))
+        digest.update(b"\x1f")
+        digest.update(normalize_prompt(message["content"]).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()[:16]
+
+
+def normalize_prompt(text):
+    return " ".join(PUNCTUATION_RE.sub(" ", text.lower()).split())
+
+
+def _similarity(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class ResponseCache:
+    """Bounded LRU of answers keyed on (kind, company, data version, conversation context, normalized prompt)"""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, near_duplicates=True,
+                 threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.near_duplicates = near_duplicates
+        self.threshold = threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "near_hits": 0, "misses": 0, "stores": 0, "invalidated": 0}
+
+    @staticmethod
+    def _key(kind, company, version, prompt, context):
+        return (kind, company.strip().lower(), version, context, normalize_prompt(prompt))
+
+    @staticmethod
+    def _terms(company, prompt):
+        text = prompt.lower().replace("n't", " not")
+        kept = frozenset(word for word in normalize_prompt(text).split() if word in KEPT_WORDS)
+        return (frozenset(tokenize(text)) | kept) - frozenset(tokenize(company))
+
+    def get(self, kind, company, version, prompt, context=""):
+        """Cached answer text, or None; context is the conversation_context() the prompt was asked in"""
+        if not version:
+            return None
+        key = self._key(kind, company, version, prompt, context)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry["stored"] < self.ttl:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry["text"]
+
+            if self.near_duplicates:
+                terms = self._terms(company, prompt)
+                best, best_score = None, 0.0
+                for other_key, other in self._entries.items():
+                    if other_key[:4] != key[:4] or now - other["stored"] >= self.ttl:
+                        continue
+                    score = _similarity(terms, other["terms"])
+                    if score > best_score:
+                        best, best_score = other_key, score
+                if best is not None and best_score >= self.threshold:
+                    self._entries.move_to_end(best)
+                    self.counters["near_hits"] += 1
+                    return self._entries[best]["text"]
+
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, kind, company, version, prompt, text, context=""):
+        if not version or not text:
+            return
+        key = self._key(kind, company, version, prompt, context)
+        with self._lock:
+            self._entries[key] = {"text": text, "terms": self._terms(company, prompt), "stored": time.monotonic()}
+            self._entries.move_to_end(key)
+            self.counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, company, keep_version=None):
+        """Drop a company's answers, except those for keep_version"""
+        company = company.strip().lower()
+        with self._lock:
+            doomed = [key for key in self._entries if key[1] == company and key[2] != keep_version]
+            for key in doomed:
+                del self._entries[key]
+            self.counters["invalidated"] += len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide response cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
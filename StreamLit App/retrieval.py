@@ -0,0 +1,214 @@
+"""Chunked BM25 retrieval over collected company data
+
+The index is built once per research run from the data sources and each
+crawled website page, and each chat turn sends only the chunks that score best
+against the question instead of the whole collected text. Scoring is plain
+BM25 over an inverted index, so it works offline with no model downloads.
+Indexes are kept per data version, so a refresh that changed nothing reuses
+the index it already built. A comparison index holds several companies'
+chunks, each tagged with its company, and hands out the best chunks of
+every company in turn so no company is crowded out of a shared prompt.
+"""
+import math
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from itertools import zip_longest
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be but by do does for from has have how i in is it its of on or that the their "
+    "them they this to was what when where which who why will with you your about can did".split()
+)
+CHUNK_CHARS = 1200
+CHUNK_OVERLAP = 200
+DEFAULT_TOP_K = 8
+MAX_INDEXES = 32
+WEBSITE_SOURCE = "COMPANY WEBSITE CONTENT"
+
+
+def _stem(token):
+    """Cheap plural folding so products matches product"""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-3] + "y" if token.endswith("ies") else token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lowercase, plural-folded word tokens with stopwords removed"""
+    return [_stem(token) for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def chunk_text(text, source, chunk_chars=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    """Split text into paragraph-aligned chunks of roughly chunk_chars"""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n|\n", text) if p.strip()]
+    chunks = []
+    current = ""
+    for paragraph in paragraphs:
+        while len(paragraph) > chunk_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            cut = paragraph.rfind(" ", 0, chunk_chars)
+            cut = cut if cut > chunk_chars // 2 else chunk_chars
+            chunks.append(paragraph[:cut])
+            paragraph = paragraph[max(cut - overlap, 1):].lstrip()
+        if current and len(current) + len(paragraph) + 1 > chunk_chars:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            space = tail.find(" ")
+            current = tail[space + 1:] + "\n" + paragraph if space != -1 else paragraph
+        else:
+            current = f"{current}\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return [{"source": source, "text": chunk} for chunk in chunks]
+
+
+class BM25Index:
+    """Okapi BM25 over a list of {"source", "text"} chunks"""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.doc_lengths = []
+        self.postings = defaultdict(list)
+        for doc_id, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk["text"]))
+            self.doc_lengths.append(sum(counts.values()))
+            for token, count in counts.items():
+                self.postings[token].append((doc_id, count))
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if chunks else 0.0
+        total = len(chunks)
+        self.idf = {
+            token: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for token, docs in self.postings.items()
+        }
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def search(self, query, k=DEFAULT_TOP_K):
+        """Return up to k (score, chunk) pairs, best first"""
+        scores = defaultdict(float)
+        for token in set(tokenize(query)):
+            idf = self.idf.get(token)
+            if idf is None:
+                continue
+            for doc_id, count in self.postings[token]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_length or 1))
+                scores[doc_id] += idf * count * (self.k1 + 1) / (count + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, self.chunks[doc_id]) for doc_id, score in ranked]
+
+    def overview(self, k=DEFAULT_TOP_K):
+        """First chunk of each source, used when a question matches nothing"""
+        seen = set()
+        picked = []
+        for chunk in self.chunks:
+            if chunk["source"] not in seen:
+                seen.add(chunk["source"])
+                picked.append((0.0, chunk))
+        return picked[:k]
+
+    def context_for(self, query, k=DEFAULT_TOP_K):
+        """Prompt-ready text of the top-k chunks for a question"""
+        results = self.search(query, k) or self.overview(k)
+        return format_context(results)
+
+
+def format_context(results):
+    """Render retrieved chunks grouped under their source headings"""
+    grouped = defaultdict(list)
+    for _, chunk in results:
+        grouped[chunk["source"]].append(chunk["text"])
+    return "\n\n".join(f"{source}:\n" + "\n...\n".join(texts) for source, texts in grouped.items())
+
+
+def company_chunks(company_data):
+    """Chunks of the collected data sources and every crawled website page"""
+    chunks = []
+    if company_data.get("website_pages"):
+        for page in company_data["website_pages"]:
+            chunks.extend(chunk_text(page["text"], f"WEBSITE PAGE {page['url']}"))
+    elif company_data.get("website_content"):
+        chunks.extend(chunk_text(company_data["website_content"], WEBSITE_SOURCE))
+    for data_source in company_data.get("data_sources", []):
+        heading, _, body = data_source.partition("\n")
+        source = heading.rstrip(":")
+        if source == WEBSITE_SOURCE:
+            continue
+        chunks.extend(chunk_text(body, source))
+    return chunks
+
+
+def build_index(company_data):
+    """Chunk the collected data sources and every crawled website page into an index"""
+    return BM25Index(company_chunks(company_data))
+
+
+class ComparisonIndex(BM25Index):
+    """BM25 over several companies' chunks, each carrying a "company" tag
+
+    Results alternate between companies, each company's best chunk first,
+    so a budget that keeps the first results keeps some of every company.
+    """
+
+    def _balanced(self, results, k):
+        by_company = OrderedDict()
+        for result in results:
+            by_company.setdefault(result[1]["company"], []).append(result)
+        balanced = [result for turn in zip_longest(*by_company.values()) for result in turn if result is not None]
+        return balanced[:k]
+
+    def search(self, query, k=DEFAULT_TOP_K):
+        return self._balanced(super().search(query, len(self.chunks)), k)
+
+    def overview(self, k=DEFAULT_TOP_K):
+        return self._balanced(super().overview(len(self.chunks)), k)
+
+
+def build_comparison_index(companies):
+    """One index over [(company name, company data), ...], each chunk labelled with its company"""
+    chunks = []
+    for company_name, company_data in companies:
+        for chunk in company_chunks(company_data):
+            chunks.append({"source": f"[{company_name}] {chunk['source']}", "text": chunk["text"],
+                           "company": company_name})
+    return ComparisonIndex(chunks)
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _cached_index(key, build):
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = build()
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def get_index(company_data):
+    """Index for company data, built once per data version and shared by every session"""
+    version = company_data.get("data_version")
+    if not version:
+        return build_index(company_data)
+    return _cached_index(version, lambda: build_index(company_data))
+
+
+def get_comparison_index(companies):
+    """Comparison index for [(company name, company data), ...], built once per set of data versions"""
+    versions = [company_data.get("data_version") for _, company_data in companies]
+    if not all(versions):
+        return build_comparison_index(companies)
+    key = "compare:" + "|".join(f"{name}={version}" for (name, _), version in zip(companies, versions))
+    return _cached_index(key, lambda: build_comparison_index(companies))
@@ -0,0 +1,179 @@
+"""Deduplicated, briefly cached Google searches
+
+All per-company searches are described in one table, so the queries a
+research run will issue can be planned up front. Each source keeps its own
+targeted query; only searches whose URLs are identical collapse into one.
+Requests for the same results page are single-flight: concurrent callers,
+whether from one run or from many sessions, wait on one outbound request
+and share one parsed document. Raw pages and their parsed form are kept for
+a few minutes in a bounded LRU.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import quote_plus
+
+from http_client import get_client
+from metrics import record_parse
+from serp_parser import parse_serp
+
+SEARCH_BASE = "https://www.google.com/search"
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 256
+
+
+class SearchError(Exception):
+    """Raised when a search does not return a results page"""
+
+# search -> (query template, Google vertical)
+SEARCHES = {
+    "website": ("{company} official website", None),
+    "logo": ("{company} logo", "isch"),
+    "news": ("{company} news", "nws"),
+    "linkedin": ("site:linkedin.com {company} company", None),
+    "twitter": ("site:twitter.com {company} official", None),
+    "reviews": ("{company} reviews glassdoor indeed", None),
+}
+# source -> the search whose results page it reads
+SEARCH_SOURCES = {
+    "website": "website",
+    "logo": "logo",
+    "news": "news",
+    "linkedin": "linkedin",
+    "twitter": "twitter",
+    "reviews": "reviews",
+}
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+def search_url(query, vertical=None):
+    """Google search URL for a normalized query"""
+    url = f"{SEARCH_BASE}?q={quote_plus(normalize_query(query))}"
+    if vertical:
+        url += f"&tbm={vertical}"
+    return url
+
+
+def plan_searches(company_name, sources=None):
+    """Map each source to the search URL it reads; identical searches share a URL"""
+    plan = {}
+    for source in sources or SEARCH_SOURCES:
+        template, vertical = SEARCHES[SEARCH_SOURCES[source]]
+        plan[source] = search_url(template.format(company=company_name), vertical)
+    return plan
+
+
+def search_vertical(source):
+    """Google vertical ("nws", "isch" or None) of the search a source reads"""
+    return SEARCHES[SEARCH_SOURCES[source]][1]
+
+
+class SearchResult:
+    """A fetched results page: raw HTML plus its parsed records"""
+
+    def __init__(self, url, status_code, html, fetched_at):
+        self.url = url
+        self.status_code = status_code
+        self.html = html
+        self.fetched_at = fetched_at
+        self._page = None
+        self._lock = threading.Lock()
+
+    @property
+    def page(self):
+        """Parsed SerpPage, built once and shared by every extractor"""
+        with self._lock:
+            if self._page is None:
+                started = time.perf_counter()
+                self._page = parse_serp(self.html)
+                record_parse(time.perf_counter() - started)
+            return self._page
+
+
+class SearchPlanner:
+    """Single-flight search fetcher with a short-lived LRU of results pages"""
+
+    def __init__(self, client=None, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.client = client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "cache_hits": 0, "shared": 0}
+
+    def fetch(self, url, timeout=10):
+        """Return the SearchResult for a search URL, fetching it at most once at a time"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None and now - entry.fetched_at < self.ttl:
+                self._entries.move_to_end(url)
+                self.counters["cache_hits"] += 1
+                return entry
+            future = self._inflight.get(url)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[url] = future
+                self.counters["requests"] += 1
+            else:
+                self.counters["shared"] += 1
+
+        if not leader:
+            return future.result(timeout=timeout * 3)
+
+        try:
+            response = (self.client or get_client()).get(url, timeout=timeout)
+            result = SearchResult(url, response.status_code, response.text, time.monotonic())
+            if response.status_code == 200:
+                with self._lock:
+                    self._entries[url] = result
+                    self._entries.move_to_end(url)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+
+    def page(self, url, timeout=10):
+        """Parsed results page for a search URL"""
+        return self.fetch(url, timeout=timeout).page
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, cached_pages=len(self._entries))
+
+
+_planner = None
+_planner_lock = threading.Lock()
+
+
+def get_planner():
+    """Return the process-wide search planner"""
+    global _planner
+    with _planner_lock:
+        if _planner is None:
+            _planner = SearchPlanner()
+        return _planner
+
+
+def search_page(source, company_name, timeout=10):
+    """Parsed results page for one source's search about a company; raises SearchError on a non-200 response"""
+    result = get_planner().fetch(plan_searches(company_name, [source])[source], timeout=timeout)
+    if result.status_code != 200:
+        raise SearchError(f"{source} search returned HTTP {result.status_code}")
+    return result.page
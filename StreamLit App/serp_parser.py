@@ -0,0 +1,248 @@
+"""Single-pass parser for Google search result pages
+
+The fetchers used to run `soup.find_all("div")` and then search inside every
+div again, which is quadratic in page size because divs nest. This module
+walks the document once as a stream of start/end/text events and turns it
+into flat result records (url, title, snippet), plus every outbound link
+and image seen on the page.
+
+The fastest available backend is used: lxml, then selectolax (lexbor), then
+the standard library's html.parser. All three feed the same state machine,
+so they return the same records; benchmarks/bench_serp.py compares them.
+"""
+from html.parser import HTMLParser
+from urllib.parse import parse_qs, unquote, urlparse
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+SKIP_TAGS = frozenset(["script", "style", "noscript", "template"])
+BLOCK_TAGS = frozenset(["div", "p", "br", "li", "tr", "h1", "h2", "h3", "h4", "span", "td"])
+GOOGLE_BASE = "https://www.google.com"
+
+
+class SerpResult:
+    """One organic result: destination url, title and snippet text"""
+
+    __slots__ = ("url", "title", "snippet")
+
+    def __init__(self, url="", title="", snippet=""):
+        self.url = url
+        self.title = title
+        self.snippet = snippet
+
+    def to_dict(self):
+        return {"url": self.url, "title": self.title, "snippet": self.snippet}
+
+    def __repr__(self):
+        return f"SerpResult(url={self.url!r}, title={self.title!r})"
+
+
+class SerpPage:
+    """Everything extracted from one results page"""
+
+    def __init__(self, results=None, links=None, images=None):
+        self.results = results or []
+        self.links = links or []
+        self.images = images or []
+
+
+def result_url(href):
+    """Resolve a result href (including Google's /url?q= redirects) to its target"""
+    if not href:
+        return None
+    if href.startswith("/url?") or href.startswith(f"{GOOGLE_BASE}/url?"):
+        query = parse_qs(urlparse(href).query)
+        target = (query.get("q") or query.get("url") or [None])[0]
+        return unquote(target) if target else None
+    if href.startswith("http://") or href.startswith("https://"):
+        return href
+    return None
+
+
+def is_external(url):
+    """True for http(s) links that do not point back at Google"""
+    if not url or not url.startswith("http"):
+        return False
+    host = urlparse(url).netloc.lower()
+    return not (host == "google.com" or host.endswith(".google.com") or "google." in host.split(":")[0])
+
+
+def _clean(parts):
+    return " ".join(" ".join(parts).split())
+
+
+class _SerpBuilder:
+    """State machine fed by start/end/data events from any backend"""
+
+    def __init__(self):
+        self.results = []
+        self.links = []
+        self.images = []
+        self._current = None
+        self._title_parts = None
+        self._snippet_parts = []
+        self._skip_depth = 0
+        self._anchor_depth = 0
+        self._title_depth = 0
+
+    def _finish(self):
+        current = self._current
+        if current is not None:
+            current.snippet = _clean(self._snippet_parts)
+            if current.title or current.snippet:
+                self.results.append(current)
+        self._current = None
+        self._snippet_parts = []
+
+    def start(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if tag == "a":
+            self._anchor_depth += 1
+            target = result_url(attrs.get("href"))
+            if target and is_external(target):
+                self.links.append(target)
+                current = self._current
+                if current is not None and not current.url:
+                    current.url = target
+                elif current is None or (current.url != target and (current.title or self._snippet_parts)):
+                    self._finish()
+                    self._current = SerpResult(url=target)
+        elif tag == "h3":
+            self._title_depth += 1
+            if self._title_depth == 1:
+                if self._current is None or self._current.title:
+                    self._finish()
+                    self._current = SerpResult()
+                self._title_parts = []
+        elif tag == "img":
+            src = attrs.get("src") or attrs.get("data-src")
+            if src and src.startswith("http"):
+                self.images.append(src)
+        elif tag in BLOCK_TAGS and self._snippet_parts:
+            self._snippet_parts.append("")
+
+    def end(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "a":
+            self._anchor_depth = max(0, self._anchor_depth - 1)
+        elif tag == "h3" and self._title_depth:
+            self._title_depth -= 1
+            if self._title_depth == 0 and self._title_parts is not None:
+                self._current.title = _clean(self._title_parts)
+                self._title_parts = None
+
+    def data(self, text):
+        if self._skip_depth or not text:
+            return
+        if self._title_depth and self._title_parts is not None:
+            self._title_parts.append(text)
+        elif self._current is not None and not self._anchor_depth:
+            # Anchor text outside the title is the breadcrumb/cite line
+            self._snippet_parts.append(text)
+
+    def close(self):
+        self._finish()
+        return SerpPage(self.results, self.links, self.images)
+
+
+class StdlibAdapter(HTMLParser):
+    """Feeds html.parser events to a builder with start(tag, attrs), end(tag) and data(text)"""
+
+    def __init__(self, builder):
+        super().__init__(convert_charrefs=True)
+        self.builder = builder
+
+    def handle_starttag(self, tag, attrs):
+        self.builder.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.builder.start(tag, dict(attrs))
+        self.builder.end(tag)
+
+    def handle_endtag(self, tag):
+        self.builder.end(tag)
+
+    def handle_data(self, data):
+        self.builder.data(data)
+
+
+class LxmlTarget:
+    """lxml parser target that feeds its events to the same kind of builder"""
+
+    def __init__(self, builder):
+        self.builder = builder
+
+    def start(self, tag, attrib):
+        self.builder.start(tag, attrib)
+
+    def end(self, tag):
+        self.builder.end(tag)
+
+    def data(self, data):
+        self.builder.data(data)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return None
+
+
+def _parse_stdlib(html, builder):
+    parser = StdlibAdapter(builder)
+    parser.feed(html)
+    parser.close()
+
+
+def _parse_lxml(html, builder):
+    parser = etree.HTMLParser(target=LxmlTarget(builder), recover=True)
+    parser.feed(html)
+    parser.close()
+
+
+def _parse_selectolax(html, builder):
+    root = LexborHTMLParser(html).root
+    if root is None:
+        return
+    # Iterative walk so deeply nested pages cannot hit the recursion limit
+    stack = [(root, False)]
+    while stack:
+        node, closing = stack.pop()
+        if closing:
+            builder.end(node.tag)
+            continue
+        if node.tag == "-text":
+            builder.data(node.text_content)
+            continue
+        if node.tag.startswith("-") or node.tag.startswith("_"):
+            continue
+        builder.start(node.tag, node.attributes)
+        stack.append((node, True))
+        stack.extend((child, False) for child in reversed(list(node.iter(include_text=True))))
+
+
+BACKENDS = {"stdlib": _parse_stdlib}
+if etree is not None:
+    BACKENDS["lxml"] = _parse_lxml
+if LexborHTMLParser is not None:
+    BACKENDS["selectolax"] = _parse_selectolax
+DEFAULT_BACKEND = next(name for name in ("lxml", "selectolax", "stdlib") if name in BACKENDS)
+
+
+def parse_serp(html, backend=None):
+    """Parse a results page into a SerpPage in one pass over the document"""
+    builder = _SerpBuilder()
+    if html:
+        BACKENDS[backend or DEFAULT_BACKEND](html, builder)
+    return builder.close()
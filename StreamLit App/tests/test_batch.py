@@ -0,0 +1,32 @@
+"""Checkpointing and resume in batch.py"""
+import json
+
+import batch
+
+ROWS = [{"name": "Acme", "domain": "", "ticker": ""}, {"name": "Globex", "domain": "", "ticker": ""}]
+
+
+def stub_pipeline(monkeypatch, summaries):
+    monkeypatch.setattr(batch, "collect_company_data",
+                        lambda name, domain, ticker, use_cache=True: {"website_url": f"https://{name.lower()}.com"})
+    monkeypatch.setattr(batch, "generate_company_summary", lambda name, data: summaries[name])
+
+
+def records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_failed_summary_is_a_failure_and_retried_on_resume(tmp_path, monkeypatch):
+    output = str(tmp_path / "results.jsonl")
+    stub_pipeline(monkeypatch, {"Acme": "Acme makes anvils.", "Globex": f"{batch.SUMMARY_ERROR}rate limited"})
+    stats = batch.run_batch(ROWS, output, workers=2)
+    assert (stats.done, stats.failed) == (2, 1)
+    failed = next(record for record in records(output) if record["name"] == "Globex")
+    assert failed["status"] == "error" and failed["error"] == "rate limited" and "ai_summary" not in failed
+
+    stub_pipeline(monkeypatch, {"Acme": "unused", "Globex": "Globex makes everything."})
+    stats = batch.run_batch(ROWS, output, workers=2)
+    assert (stats.skipped, stats.done, stats.failed) == (1, 1, 0)
+    summaries = {record["name"]: record.get("ai_summary") for record in records(output)}
+    assert summaries == {"Acme": "Acme makes anvils.", "Globex": "Globex makes everything."}
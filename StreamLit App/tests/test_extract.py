@@ -0,0 +1,27 @@
+"""Boilerplate detection in extract.py"""
+import pytest
+
+from extract import extract_html, is_boilerplate
+
+
+@pytest.mark.parametrize("class_name", [
+    "site-nav", "main_menu", "footer-links", "cookie-banner", "has-cookie-banner", "share-buttons",
+    "social-share", "social", "modal", "overlay", "newsletter-signup",
+])
+def test_chrome_classes_are_boilerplate(class_name):
+    assert is_boilerplate("div", {"class": class_name}, True)
+
+
+@pytest.mark.parametrize("class_name", [
+    "hero-banner", "banner", "share-price", "social-impact", "overlay-text", "navigator",
+])
+def test_content_classes_are_kept(class_name):
+    assert not is_boilerplate("div", {"class": class_name}, True)
+
+
+def test_share_price_text_is_extracted():
+    html = (b'<html><body><div class="hero-banner"><h1>Acme</h1></div>'
+            b'<div id="share-price">ACME 101.5</div><div class="share-buttons">Tweet this</div></body></html>')
+    text = extract_html(html, "https://www.acme.com/").text
+    assert "Acme" in text and "ACME 101.5" in text
+    assert "Tweet this" not in text
@@ -0,0 +1,75 @@
+"""Lookup-question matching in facts.py"""
+import pytest
+
+from facts import answer_comparison_from_facts, answer_from_facts, match_intents
+
+FACTS = {
+    "employees": {"value": 5000, "type": "count", "source": "Yahoo Finance", "field": "fullTimeEmployees"},
+    "revenue": {"value": 3.4e9, "type": "money", "currency": "USD", "source": "Yahoo Finance",
+                "field": "totalRevenue"},
+    "market_cap": {"value": 2.1e10, "type": "money", "currency": "USD", "source": "Yahoo Finance",
+                   "field": "marketCap"},
+    "headquarters": {"value": "Austin, TX", "type": "text", "source": "Yahoo Finance", "field": "city"},
+    "founded": {"value": 2003, "type": "year", "source": "LinkedIn", "evidence": "Founded 2003"},
+    "website": {"value": "https://www.acme.com/", "type": "url", "source": "Company website"},
+}
+
+
+@pytest.mark.parametrize("question, names", [
+    ("How many employees do they have?", ["employees"]),
+    ("How many employees does Acme have?", ["employees"]),
+    ("How many people work at Acme Corp?", ["employees"]),
+    ("what is their market cap?", ["market_cap"]),
+    ("where are they headquartered?", ["headquarters"]),
+    ("When was Tesla founded?", ["founded"]),
+    ("What's Acme's revenue?", ["revenue"]),
+    ("What is their website?", ["website"]),
+    ("What industry are they in?", ["industry"]),
+    ("What is their revenue and market cap?", ["revenue", "market_cap"]),
+    ("What is Tesla's headcount, revenue and HQ?", ["employees", "revenue", "headquarters"]),
+])
+def test_lookup_questions_match(question, names):
+    assert match_intents(question) == names
+
+
+@pytest.mark.parametrize("question", [
+    "Who founded Tesla?",
+    "What does their website say about pricing?",
+    "How many employees do they have and what products do they sell?",
+    "Who are their biggest customers by sales?",
+    "Do they have a location in Europe?",
+    "What is their revenue growth?",
+    "What was revenue last year?",
+    "What products does this company offer?",
+])
+def test_other_questions_go_to_the_llm(question):
+    assert match_intents(question) == []
+    assert answer_from_facts("Acme", question, FACTS) is None
+
+
+def test_answer_cites_the_source():
+    answer = answer_from_facts("Acme", "How many employees do they have?", FACTS)
+    assert "**5,000**" in answer and "fullTimeEmployees" in answer
+
+
+def test_missing_fact_goes_to_the_llm():
+    assert answer_from_facts("Acme", "What sector is Acme in?", FACTS) is None
+
+
+@pytest.mark.parametrize("question, names", [
+    ("who has more employees?", ["employees"]),
+    ("Which company has the highest revenue?", ["revenue"]),
+    ("Which one is worth more?", ["market_cap"]),
+    ("Compare their market cap", ["market_cap"]),
+    ("Who founded these companies?", []),
+    ("Who has the better culture?", []),
+])
+def test_comparison_questions(question, names):
+    assert match_intents(question, comparing=True) == names
+
+
+def test_comparison_names_the_leader():
+    smaller = dict(FACTS, employees=dict(FACTS["employees"], value=120))
+    answer = answer_comparison_from_facts([("Acme", {"facts": FACTS}), ("Tiny", {"facts": smaller})],
+                                          "who has more employees?")
+    assert "Highest: Acme (5,000)" in answer
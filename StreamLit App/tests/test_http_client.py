@@ -0,0 +1,87 @@
+"""Retries and error wrapping in http_client.py, against a stub transport"""
+import pytest
+import requests
+
+from http_client import HttpClient, HttpResponse, RequestsTransport, TransportError
+
+
+class StubTransport:
+    """Plays back a script of responses and TransportErrors, one per attempt"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def send(self, method, url, headers, timeout, max_bytes):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return HttpResponse(url, outcome, content=b"body")
+
+    def close(self):
+        pass
+
+
+def client(*outcomes, retries=2):
+    return HttpClient(transport=StubTransport(*outcomes), retries=retries, backoff=0)
+
+
+def test_retry_statuses_are_retried():
+    http = client(503, 429, 200)
+    assert http.get("https://example.com/").status_code == 200
+    assert http.transport.calls == 3
+
+
+def test_last_retry_status_is_returned_when_retries_run_out():
+    http = client(503, 503, 503)
+    assert http.get("https://example.com/").status_code == 503
+    assert http.transport.calls == 3
+
+
+def test_retryable_transport_error_is_retried():
+    http = client(TransportError("reset"), 200)
+    assert http.get("https://example.com/").status_code == 200
+    assert http.transport.calls == 2
+
+
+def test_transport_error_is_raised_when_retries_run_out():
+    http = client(TransportError("reset"), TransportError("reset"), retries=1)
+    with pytest.raises(TransportError):
+        http.get("https://example.com/")
+    assert http.transport.calls == 2
+
+
+def test_non_retryable_transport_error_fails_at_once():
+    http = client(TransportError("bad url", retryable=False), 200)
+    with pytest.raises(TransportError):
+        http.get("https://example.com/")
+    assert http.transport.calls == 1
+
+
+def test_stream_retries_before_handing_over_the_body():
+    http = client(TransportError("reset"), 502, 200)
+    with http.stream("https://example.com/") as response:
+        assert response.status_code == 200
+        assert b"".join(response.iter_content()) == b"body"
+    assert http.transport.calls == 3
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (requests.ConnectionError("refused"), True),
+    (requests.Timeout("slow"), True),
+    (requests.exceptions.ChunkedEncodingError("cut"), True),
+    (requests.exceptions.InvalidURL("bad"), False),
+    (requests.exceptions.TooManyRedirects("loop"), False),
+    (requests.exceptions.ContentDecodingError("gzip"), False),
+])
+def test_requests_errors_become_transport_errors(monkeypatch, error, retryable):
+    def fail(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(requests.Session, "request", fail)
+    transport = RequestsTransport()
+    for call in (transport.send, transport.open):
+        with pytest.raises(TransportError) as raised:
+            call("GET", "https://example.com/", {}, 5, 1000)
+        assert raised.value.retryable is retryable
@@ -0,0 +1,43 @@
+"""Logo candidates in logos.py are fetched on the caller's span"""
+from io import BytesIO
+
+from PIL import Image
+
+import logos
+from http_client import HttpClient, HttpResponse
+from metrics import Span
+
+
+def png(size):
+    buffer = BytesIO()
+    Image.new("RGBA", (size, size), (200, 30, 30, 255)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class ImageTransport:
+    def __init__(self, images):
+        self.images = images
+
+    def send(self, method, url, headers, timeout, max_bytes):
+        if url not in self.images:
+            return HttpResponse(url, 404)
+        return HttpResponse(url, 200, {"Content-Type": "image/png"}, self.images[url])
+
+    def close(self):
+        pass
+
+
+def test_candidate_requests_are_recorded_on_the_callers_span(tmp_path, monkeypatch):
+    monkeypatch.setattr(logos, "LOGO_DIR", str(tmp_path))
+    client = HttpClient(transport=ImageTransport({
+        "https://acme.com/apple-touch-icon.png": png(180),
+        "https://acme.com/favicon.png": png(32),
+    }), retries=0)
+    candidates = [("apple-touch-icon", "https://acme.com/apple-touch-icon.png"),
+                  ("icon", "https://acme.com/favicon.png"),
+                  ("og:image", "https://acme.com/missing.png")]
+    span = Span("logo")
+    logo = span.run(logos.best_logo, candidates, client)
+    assert logo["url"] == "https://acme.com/apple-touch-icon.png"
+    assert span.requests == 3
+    assert span.statuses == {"200": 2, "404": 1}
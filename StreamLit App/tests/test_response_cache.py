@@ -0,0 +1,45 @@
+"""When response_cache.py replays a cached answer"""
+import pytest
+
+from response_cache import ResponseCache, conversation_context
+
+
+def history(*contents):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": content} for i, content in enumerate(contents)]
+
+
+def test_follow_up_is_keyed_on_the_turns_before_it():
+    cache = ResponseCache()
+    first = conversation_context(history("What was revenue in 2024?", "$3.4B.", "Why?"))
+    second = conversation_context(history("Who is the CEO?", "Wile E. Coyote.", "Why?"))
+    cache.put("chat", "Acme", "v1", "Why?", "Revenue grew on rocket sales.", first)
+    assert cache.get("chat", "Acme", "v1", "Why?", first) == "Revenue grew on rocket sales."
+    assert cache.get("chat", "Acme", "v1", "why", second) is None
+    assert cache.get("chat", "Acme", "v1", "Why?") is None
+
+
+def test_opening_question_matches_across_conversations():
+    cache = ResponseCache()
+    assert conversation_context(history("What does Acme make?")) == ""
+    cache.put("chat", "Acme", "v1", "What does Acme make?", "Anvils.", conversation_context([]))
+    assert cache.get("chat", "Acme", "v1", "what does acme make",
+                     conversation_context(history("What does Acme make?"))) == "Anvils."
+
+
+@pytest.mark.parametrize("asked, other", [
+    ("Who founded Tesla?", "When was Tesla founded?"),
+    ("Who is the CEO?", "Where is the CEO?"),
+    ("Why did revenue fall?", "How did revenue fall?"),
+    ("Is Tesla profitable?", "Is Tesla not profitable?"),
+    ("Does Tesla pay a dividend?", "Doesn't Tesla pay a dividend?"),
+])
+def test_different_questions_are_not_near_duplicates(asked, other):
+    cache = ResponseCache()
+    cache.put("chat", "Tesla", "v1", asked, "cached answer")
+    assert cache.get("chat", "Tesla", "v1", other) is None
+
+
+def test_rephrased_question_is_a_near_duplicate():
+    cache = ResponseCache()
+    cache.put("chat", "Tesla", "v1", "Who is the CEO of Tesla?", "Elon Musk.")
+    assert cache.get("chat", "Tesla", "v1", "who is Tesla CEO") == "Elon Musk."
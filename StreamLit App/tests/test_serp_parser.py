@@ -0,0 +1,90 @@
+"""Records parse_serp returns for the saved results pages, on every installed backend"""
+import os
+
+import pytest
+
+from serp_parser import BACKENDS, is_external, parse_serp, result_url
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend(request):
+    return request.param
+
+
+def test_result_url_decodes_google_redirects():
+    assert result_url("/url?q=https://www.acme.com/&sa=U&ved=x") == "https://www.acme.com/"
+    assert result_url("/url?q=https%3A%2F%2Facme.com%2Fa%3Fb%3D1&sa=U") == "https://acme.com/a?b=1"
+    assert result_url("https://www.google.com/url?url=https://acme.com/&sa=U") == "https://acme.com/"
+    assert result_url("https://acme.com/about") == "https://acme.com/about"
+    assert result_url("/search?q=acme&tbm=nws") is None
+    assert result_url("/url?sa=U") is None
+    assert result_url(None) is None
+
+
+def test_is_external():
+    assert is_external("https://www.acme.com/")
+    assert not is_external("https://www.google.com/search?q=acme")
+    assert not is_external("https://maps.google.co.uk/")
+    assert not is_external("/search?q=acme")
+
+
+def test_web_results(backend):
+    page = parse_serp(fixture("serp_web.html"), backend)
+    assert len(page.results) == 20
+    first = page.results[0]
+    assert first.url == "https://www.acme.com/"
+    assert first.title == "Acme Corporation | Official Site"
+    # The breadcrumb inside the result link is not part of the snippet
+    assert first.snippet.startswith("3 days ago · Employees products glassdoor partnership")
+    assert first.snippet.endswith("partnership innovation anvil.")
+    assert page.results[1].url == "https://www.linkedin.com/company/acme-0"
+    assert page.results[1].title == "Acme Corp | LinkedIn page 0"
+    assert page.results[1].snippet.startswith("3 days ago · Anvil revenue anvil benefits")
+    assert [result.url for result in page.results[4:6]] == ["https://twitter.com/acme0", "https://twitter.com/acme1"]
+    assert page.results[-1].url == "https://example7.com/acme"
+    # Links to other Google tabs are not results
+    assert all(is_external(url) for url in page.links)
+    assert page.links == [result.url for result in page.results]
+    assert page.images == []
+
+
+def test_news_results(backend):
+    page = parse_serp(fixture("serp_news.html"), backend)
+    assert [result.url for result in page.results] == [
+        f"https://news{i}.example.com/2026/acme-{i}" for i in range(20)]
+    assert page.results[0].title == "Acme announces Market shares products indeed review glassdoor."
+    assert page.results[-1].title == "Acme announces Growth market partnership quarterly rocket salary."
+    assert all(result.snippet.startswith("3 days ago · ") for result in page.results)
+
+
+def test_image_results(backend):
+    page = parse_serp(fixture("serp_images.html"), backend)
+    assert len(page.results) == 40
+    assert page.results[0].to_dict() == {"url": "https://img0.example.com/page", "title": "",
+                                         "snippet": "Acme logo 0"}
+    assert page.results[39].snippet == "Acme logo 39"
+    assert page.images[:2] == ["https://encrypted-tbn0.gstatic.com/images?q=tbn:0",
+                               "https://encrypted-tbn0.gstatic.com/images?q=tbn:1"]
+    assert page.images[-1] == "https://cdn.example.com/acme-logo.png"
+    assert len(page.images) == 41
+
+
+def test_scripts_and_styles_are_skipped(backend):
+    html = """<html><head><style>h3 {color: red}</style></head><body>
+        <div><a href="/url?q=https://acme.com/&amp;sa=U"><h3>Acme</h3></a>
+        <script>var x = "<h3>not a title</h3>";</script><div>Makes anvils.</div></div></body></html>"""
+    page = parse_serp(html, backend)
+    assert [result.to_dict() for result in page.results] == [
+        {"url": "https://acme.com/", "title": "Acme", "snippet": "Makes anvils."}]
+
+
+def test_empty_page(backend):
+    page = parse_serp("", backend)
+    assert (page.results, page.links, page.images) == ([], [], [])
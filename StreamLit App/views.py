@@ -0,0 +1,142 @@
+"""Display-ready views of company data, built once per data version
+
+Streamlit reruns the whole page script on every interaction. Without
+these views each rerun would rebuild the same things: the website text
+joined from its pages, price histories expanded from the company store, the
+fact and financial tables and the raw-source list. A view holds them ready
+to render and is shared by every session showing the same data version. The
+page script runs afresh each time, so the views are kept here rather than in
+it. Raw sources are split into pages of RAW_SOURCE_PAGE_CHARS, so the page
+only ever sends one page of one source.
+"""
+import threading
+from collections import OrderedDict
+
+from comparison import financial_rows, price_histories
+from facts import FACTS, format_provenance, format_value
+from market_data import comparison_chart_png, price_chart_png
+
+MAX_VIEWS = 32
+WEBSITE_PREVIEW_CHARS = 5000
+RAW_SOURCE_PAGE_CHARS = 4000
+
+_views = OrderedDict()
+_views_lock = threading.Lock()
+
+
+def _cached_view(key, build):
+    with _views_lock:
+        view = _views.get(key)
+        if view is not None:
+            _views.move_to_end(key)
+            return view
+    view = build()
+    with _views_lock:
+        _views[key] = view
+        while len(_views) > MAX_VIEWS:
+            _views.popitem(last=False)
+    return view
+
+
+def paginate(text, page_chars=RAW_SOURCE_PAGE_CHARS):
+    """Split text into pages of about page_chars, breaking at line ends where possible"""
+    pages = []
+    while len(text) > page_chars:
+        cut = text.rfind("\n", page_chars // 2, page_chars)
+        cut = cut + 1 if cut != -1 else page_chars
+        pages.append(text[:cut])
+        text = text[cut:]
+    return pages + [text]
+
+
+def raw_sources(data):
+    """[(label, pages), ...] for every data source, then every crawled website page"""
+    sources = []
+    for i, source in enumerate(data.get("data_sources", [])):
+        header = source.split("\n", 1)[0].rstrip(":")
+        sources.append((f"{i + 1}. {header.title()}", paginate(source)))
+    for page in data.get("website_pages", []):
+        # Pages of one site often share a title, so they are told apart by URL
+        sources.append((f"Website: {page['url']}", paginate(f"{page['title']}\n\n{page['text']}")))
+    return sources
+
+
+def _format_market_cap(market_cap):
+    if market_cap > 1_000_000_000:
+        return f"${market_cap/1_000_000_000:.2f}B"
+    if market_cap > 1_000_000:
+        return f"${market_cap/1_000_000:.2f}M"
+    return f"${market_cap:,.0f}"
+
+
+def financial_metrics(info):
+    """Three columns of (label, value) headline figures from a Yahoo Finance info dict"""
+    columns = [[], [], []]
+    if "marketCap" in info:
+        columns[0].append(("Market Cap", _format_market_cap(info["marketCap"])))
+    if "sector" in info:
+        columns[0].append(("Sector", info["sector"]))
+    if "currentPrice" in info:
+        columns[1].append(("Current Price", f"${info['currentPrice']:.2f}"))
+    if "industry" in info:
+        columns[1].append(("Industry", info["industry"]))
+    if info.get("fullTimeEmployees") is not None:
+        columns[2].append(("Employees", f"{info['fullTimeEmployees']:,}"))
+    return columns
+
+
+def build_company_view(data):
+    """Everything the company page shows that depends only on the data"""
+    import pandas as pd
+
+    website_content = data.get("website_content", "")
+    view = {
+        "version": data.get("data_version"),
+        "website_preview": website_content[:WEBSITE_PREVIEW_CHARS],
+        "website_truncated": len(website_content) > WEBSITE_PREVIEW_CHARS,
+        "facts": None,
+        "financial": None,
+        "raw_sources": raw_sources(data),
+    }
+    if data.get("facts"):
+        view["facts"] = pd.DataFrame([
+            {"Fact": FACTS[name][0], "Value": format_value(fact), "Source": format_provenance(fact)}
+            for name, fact in data["facts"].items()
+        ])
+    financial = data.get("financial")
+    if financial:
+        history = financial.get("history")
+        view["financial"] = {
+            "metrics": financial_metrics(financial["info"]),
+            "yahoo_link": "website" in financial["info"],
+            "chart": (price_chart_png(history, financial["version"])
+                      if history is not None and not history.empty else None),
+        }
+    return view
+
+
+def get_company_view(data):
+    """The company view for data, built once per data version"""
+    version = data.get("data_version")
+    if not version:
+        return build_company_view(data)
+    return _cached_view(version, lambda: build_company_view(data))
+
+
+def build_comparison_view(companies):
+    import pandas as pd
+
+    histories = price_histories(companies)
+    return {
+        "financials": pd.DataFrame(financial_rows(companies)).set_index("Company"),
+        "chart": comparison_chart_png(histories) if histories else None,
+    }
+
+
+def get_comparison_view(companies):
+    """Financial table and rebased price chart for [(company name, company data), ...], built once per set of versions"""
+    versions = [company_data.get("data_version") for _, company_data in companies]
+    if not all(versions):
+        return build_comparison_view(companies)
+    key = "compare:" + "|".join(f"{name}={version}" for (name, _), version in zip(companies, versions))
+    return _cached_view(key, lambda: build_comparison_view(companies))